@@ -23,6 +23,7 @@ from services.tools import (
     generate_answer,
     retrieve_laws,
 )
+from src.observability.tracing import current_trace_id, start_span
 
 logger = get_logger_agent(__name__)
 
@@ -102,15 +103,37 @@ async def ask_agent(request: AgentRequest):
     Returns:
         AgentResponse: Response with success status, completed step, data, and execution time
     """
+    # Root span of the request; steps and outbound calls become its children
+    with start_span(
+        "agent.request",
+        question_length=len(request.question),
+        top_k=request.top_k,
+        total_steps=request.total_steps,
+        timeout_sec=request.timeout_sec,
+    ) as span:
+        response = await _run_agent(request)
+        span.set_attributes(
+            {
+                "step_completed": response.step_completed,
+                "status_code": response.status_code,
+                "success": response.success,
+            }
+        )
+        return response
+
+
+async def _run_agent(request: AgentRequest):
     start_time = time.time()
     logger.info(
-        "Starting agent request with %d steps, timeout: %ds",
+        "Starting agent request with %d steps, timeout: %ds (trace %s)",
         request.total_steps,
         request.timeout_sec,
+        current_trace_id(),
     )
     logger.info("Question: %s", request.question)
 
     chunks = []
+    scores = []
     answer = ""
     formatted_answer = None
     step_completed = 0
@@ -122,14 +145,18 @@ async def ask_agent(request: AgentRequest):
             step_start = time.time()
 
             try:
-                chunks = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        retrieve_laws,
-                        RetrieveInput(question=request.question, top_k=request.top_k),
-                    ),
-                    timeout=request.timeout_sec,
-                )
-                chunks = chunks.chunks
+                with start_span("agent.retrieve", top_k=request.top_k) as span:
+                    retrieved = await asyncio.wait_for(
+                        retrieve_laws(
+                            RetrieveInput(
+                                question=request.question, top_k=request.top_k
+                            )
+                        ),
+                        timeout=request.timeout_sec,
+                    )
+                    span.set_attribute("chunk_count", len(retrieved.chunks))
+                chunks = retrieved.chunks
+                scores = retrieved.scores
                 step_completed = 1
                 step_time = time.time() - step_start
                 logger.info(
@@ -168,12 +195,16 @@ async def ask_agent(request: AgentRequest):
             step_start = time.time()
 
             try:
-                result = await asyncio.wait_for(
-                    generate_answer(
-                        GenerateInput(question=request.question, chunks=chunks)
-                    ),
-                    timeout=request.timeout_sec,
-                )
+                with start_span("agent.generate", chunk_count=len(chunks)) as span:
+                    result = await asyncio.wait_for(
+                        generate_answer(
+                            GenerateInput(
+                                question=request.question, chunks=chunks, scores=scores
+                            )
+                        ),
+                        timeout=request.timeout_sec,
+                    )
+                    span.set_attribute("answer_length", len(result.answer))
                 answer = result.answer
                 step_completed = 2
                 step_time = time.time() - step_start
@@ -220,12 +251,14 @@ async def ask_agent(request: AgentRequest):
             step_start = time.time()
 
             try:
-                formatted_result = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        format_citation, FormatInput(answer=answer, chunks=chunks)
-                    ),
-                    timeout=request.timeout_sec,
-                )
+                # to_thread copies the context, so the span follows the call
+                with start_span("agent.format", chunk_count=len(chunks)):
+                    formatted_result = await asyncio.wait_for(
+                        asyncio.to_thread(
+                            format_citation, FormatInput(answer=answer, chunks=chunks)
+                        ),
+                        timeout=request.timeout_sec,
+                    )
                 formatted_answer = formatted_result.formatted_answer
                 step_completed = 3
                 step_time = time.time() - step_start
@@ -10,13 +10,21 @@ from fastapi.responses import JSONResponse
 # Set up logging
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, str(project_root))
-from app import agent, rag, retrieve
 from configs.logger import get_logger_app, setup_logging
 
+# Configure logging once, before the app modules create their loggers
 setup_logging()
+
+from app import agent, metrics, rag, readiness, retrieve
+from src.cache.shared import CacheStatsMiddleware
+from src.concurrency.bulkhead import BulkheadFullError
+from src.concurrency.circuit_breaker import CircuitOpenError
+from src.observability.metrics import MetricsMiddleware, mark_error
+
 logger = get_logger_app()
 
-app = FastAPI()
+# Dependencies connect in the background once the server is up (see /ready)
+app = FastAPI(lifespan=readiness.lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -37,6 +45,16 @@ app.add_middleware(
 app.include_router(retrieve.router)
 app.include_router(rag.router)
 app.include_router(agent.router)
+app.include_router(readiness.router)
+
+# X-Cache header: shared result cache hits/lookups of the request (src/cache/shared.py)
+app.add_middleware(CacheStatsMiddleware)
+
+# Prometheus metrics: request counts, latency histograms and in-flight gauges
+# per endpoint, plus pipeline stage timings (src/observability/metrics.py)
+if os.getenv("ENABLE_METRICS", "true").lower() == "true":
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics.router)
 
 
 # Health check endpoint
@@ -55,17 +73,22 @@ async def app_root():
         "status": "running",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
             "docs": "/docs",
             "retrieve": "/retrieve",
+            "retrieve_batch": "/retrieve/batch",
             "rag": "/rag",
+            "rag_stream": "/rag/stream",
             "agent": "/agent",
+            "metrics": "/metrics",
         },
     }
 
 
 # Exception handler for validation error
 @app.exception_handler(RequestValidationError)
-async def validation_exception_handler(_: Request, exc: RequestValidationError):
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    mark_error(request, "validation_error")
     logger.info("An error occured: %s", exc.errors())
     errors = [
         {
@@ -86,8 +109,49 @@ async def validation_exception_handler(_: Request, exc: RequestValidationError):
     )
 
 
+# Exception handler for overloaded pipeline stages (see src/concurrency/bulkhead.py)
+@app.exception_handler(BulkheadFullError)
+async def overload_exception_handler(request: Request, exc: BulkheadFullError):
+    mark_error(request, "overloaded")
+    logger.info("Request rejected by %s bulkhead: %s", exc.stage, exc)
+    return JSONResponse(
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={
+            "error": {
+                "type": "overloaded",
+                "message": "The service is overloaded, please retry later",
+                "stage": exc.stage,
+                "retry_after": exc.retry_after,
+            }
+        },
+    )
+
+
+# Exception handler for an upstream whose circuit breaker is open and which has
+# no fallback (e.g. embedding API down and no BM25 index)
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_exception_handler(request: Request, exc: CircuitOpenError):
+    mark_error(request, "upstream_unavailable")
+    logger.info("Request failed fast: %s", exc)
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={
+            "error": {
+                "type": "upstream_unavailable",
+                "message": "A dependency is temporarily unavailable, please retry later",
+                "stage": exc.name,
+                "retry_after": exc.retry_after,
+            }
+        },
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
     port = int(os.getenv("PORT", "8000"))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
+    # The reloader imports the app twice (watcher + worker); dev only
+    reload = os.getenv("UVICORN_RELOAD", "true").lower() == "true"
+    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=reload)
@@ -0,0 +1,129 @@
+import os
+import sys
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, str(project_root))
+
+from configs.logger import get_logger
+from services import answer_cache as answer_cache_module
+from services.context import get_context_builder
+from services.llm import get_llm_gateway
+from services.routing import get_model_router
+from src.cache import shared as shared_cache_module
+from src.concurrency.bulkhead import DEFAULT_LIMITS, get_bulkhead
+from src.concurrency.circuit_breaker import get_circuit_breaker
+from src.concurrency.singleflight import get_single_flight
+from src.embedding import cache as embedding_cache_module
+from src.embedding import client as embedding_client_module
+from src.observability.metrics import REGISTRY
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+SINGLE_FLIGHT_GROUPS = ("embedding", "retrieval", "generation")
+CIRCUIT_STATES = ("closed", "half_open", "open")
+
+
+# Point-in-time fields of the component stats() dicts; every other numeric
+# field is a running total since process start and is exported as a counter
+GAUGE_FIELDS = frozenset(
+    {
+        "active",
+        "queued",
+        "queue_wait_p50",
+        "queue_wait_p99",
+        "in_flight",
+        "consecutive_failures",
+        "p50_seconds",
+        "p95_seconds",
+        "hedge_delay_ms",
+        "avg_batch_size",
+        "memory_size",
+        "size",
+        "hit_rate",
+    }
+)
+
+
+def _numeric(stats, name, labels=None):
+    """Turn the numeric fields of a stats() dict into counter and gauge samples."""
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        documentation = f"{name.replace('_', ' ')} {key}"
+        if key in GAUGE_FIELDS:
+            yield f"{name}_{key}", "gauge", documentation, labels, value
+        else:
+            yield f"{name}_{key}_total", "counter", documentation, labels, value
+
+
+def collect_components():
+    """Export the statistics of the pipeline components at scrape time."""
+    for stage in DEFAULT_LIMITS:
+        yield from _numeric(get_bulkhead(stage).stats(), "bulkhead", {"stage": stage})
+    for group in SINGLE_FLIGHT_GROUPS:
+        yield from _numeric(
+            get_single_flight(group).stats(), "single_flight", {"group": group}
+        )
+
+    breaker_stats = get_circuit_breaker("embedding_api").stats()
+    yield from _numeric(breaker_stats, "circuit", {"name": "embedding_api"})
+    for state in CIRCUIT_STATES:
+        yield (
+            "circuit_state",
+            "gauge",
+            "circuit breaker state (1 for the current state)",
+            {"name": "embedding_api", "state": state},
+            int(breaker_stats["state"] == state),
+        )
+
+    gateway_stats = get_llm_gateway().stats()
+    yield from _numeric(
+        {k: gateway_stats[k] for k in ("completed", "timeouts", "cancelled", "errors")},
+        "llm_gateway",
+    )
+    router_stats = get_model_router().stats()
+    yield from _numeric({"escalations": router_stats["escalations"]}, "model_router")
+    for tier, tier_stats in router_stats["tiers"].items():
+        yield from _numeric(tier_stats, "model_tier", {"tier": tier})
+    yield from _numeric(get_context_builder().stats(), "context")
+
+    # Clients and caches are only reported once created; a scrape must not
+    # start the batching thread or open the disk cache
+    # pylint: disable=protected-access
+    client = embedding_client_module._EMBEDDING_CLIENT
+    if client is not None:
+        yield from _numeric(client.stats(), "embedding_client")
+    embedding_cache = embedding_cache_module._EMBEDDING_CACHE
+    if embedding_cache is not None:
+        yield from _numeric(embedding_cache.stats(), "embedding_cache")
+    answer_cache = answer_cache_module._ANSWER_CACHE
+    if answer_cache is not None:
+        yield from _numeric(answer_cache.stats(), "answer_cache")
+    shared_cache = shared_cache_module._SHARED_CACHE
+    if shared_cache:
+        shared_stats = shared_cache.stats()
+        yield from _numeric(
+            {"evictions": shared_stats["evictions"]},
+            "shared_cache",
+            {"backend": shared_stats["backend"]},
+        )
+        for namespace, namespace_stats in shared_stats["namespaces"].items():
+            yield from _numeric(
+                namespace_stats, "shared_cache", {"namespace": namespace}
+            )
+
+
+REGISTRY.register_collector(collect_components)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(
+        REGISTRY.expose(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
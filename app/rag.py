@@ -1,67 +1,84 @@
 import asyncio
+import json
 import os
 import sys
 import time
 
-import google.generativeai as genai
 from dotenv import load_dotenv
 
 load_dotenv()
-genai.configure(api_key=os.getenv("Gemini_API_KEY"))  # type: ignore
 
 # from google.generativeai import generative_models
 # import fastapi
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+import anyio
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
-retrieving_time = 0
-prompting_time = 0
-llm_time = 0
-
 # Set up logging
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, str(project_root))
 
-from configs.logger import get_logger_app, setup_logging
-from src.store_vector.search_embeddings import search_relevant_embeddings
+from configs.logger import get_logger_app
+from services.answer_cache import lookup_answer, store_answer
+from services.context import build_context
+from services.llm import get_llm_gateway
+from services.routing import get_model_router
+from src.concurrency.bulkhead import BulkheadFullError
+from src.observability.metrics import observe_stage
+from src.store_vector.search_embeddings import search_relevant_embeddings_async
 
-setup_logging()
 # Sử dụng get_logger_app để ghi log vào app.log
 logger = get_logger_app(__name__)
 
 router = APIRouter()
 
+LLM_STREAM_TIMEOUT = float(os.getenv("LLM_STREAM_TIMEOUT", "60"))
+
 
 class QueryQuestion(BaseModel):
     question: str
 
 
-def get_relevant_sentences(question):
+async def get_relevant_chunks(question, n_results=5):
+    """Retrieve the chunks for a question, or None when retrieval fails."""
     logger.info("The question is %s", question)
     try:
-        relevant_embeddings = search_relevant_embeddings(question, 5)
-        relevant_sentences = []
-        for sentence in relevant_embeddings["documents"][0]:
-            relevant_sentences.append(sentence)
-        return relevant_sentences
+        return await search_relevant_embeddings_async(question, n_results)
     except (IndexError, KeyError, FileNotFoundError, ImportError, ValueError) as e:
         logger.info(
             "An error occurred during embedding retrieval: %s", e, exc_info=True
         )
-        return []
+        return None
 
 
-async def ask_LLM(relevant_sentences, question):
-    start_prompting_time = time.perf_counter()
-    if not relevant_sentences:
-        return "Không tìm thấy thông tin liên quan để trả lời câu hỏi của bạn."
-    # Tạo một chuỗi chứa tất cả các câu từ relevant_sentences
-    context = ""
-    for i, sentence in enumerate(relevant_sentences, 1):
-        context += f"Đoạn {i}: {sentence}\n\n"
+def unpack_chunks(relevant_embeddings):
+    """Return (documents, cosine similarities) of the first query's results."""
+    if relevant_embeddings is None:
+        return [], []
+    try:
+        return (
+            list(relevant_embeddings["documents"][0]),
+            list(relevant_embeddings["cosine_similarities"][0]),
+        )
+    except (IndexError, KeyError, TypeError):
+        return [], []
+
+
+async def get_relevant_sentences(question):
+    relevant_embeddings = await get_relevant_chunks(question, 5)
+    return unpack_chunks(relevant_embeddings)[0]
+
+
+def build_prompt(relevant_sentences, question):
+    # Gộp các đoạn đã được chọn trong giới hạn token (services/context.py)
+    with observe_stage("prompt_build"):
+        context_chunks = build_context(question, relevant_sentences).chunks
+        context = "".join(
+            f"Đoạn {i}: {sentence}\n\n" for i, sentence in enumerate(context_chunks, 1)
+        )
 
-    prompt = f"""Với vai trò là 1 trợ lý ảo pháp luật chuyên nghiệp, dựa trên các nội dung sau:
+    return f"""Với vai trò là 1 trợ lý ảo pháp luật chuyên nghiệp, dựa trên các nội dung sau:
         {context}
         Câu hỏi: {question}
         Vui lòng trả lời câu hỏi dựa trên thông tin được cung cấp ở trên.
@@ -72,31 +89,48 @@ async def ask_LLM(relevant_sentences, question):
         Trường hợp 3: Nếu câu hỏi linh tinh hoặc không liên quan đến pháp luật, trả lời: "Chào bạn, tôi đã sẵn sàng trả lời với vai trò là một trợ lý ảo pháp luật.Tuy nhiên, có vẻ như bạn chưa cung cấp câu hỏi cụ thể hoặc câu hỏi của bạn không liên quan đến pháp luật. Vui lòng đặt câu hỏi lại để tôi có thể trả lời."
         Trả lời ngắn gọn.
     """
-    end_propting_time = time.perf_counter()
-    prompting_time = end_propting_time - start_prompting_time
+
+
+async def ask_LLM(relevant_sentences, question, scores=None, timings=None):
+    """
+    Answer a question from its retrieved chunks.
+
+    Args:
+        relevant_sentences (list): Retrieved chunk contents, best first
+        question (str): Raw question
+        scores (list): Cosine similarities of the chunks, used for model routing
+        timings (dict): When given, "prompting_time" is written into it
+
+    Returns:
+        str: The answer, or a user-facing message when generation fails
+    """
+    start_prompting_time = time.perf_counter()
+    if not relevant_sentences:
+        return "Không tìm thấy thông tin liên quan để trả lời câu hỏi của bạn."
+    cached_answer, cache_key = await lookup_answer(question, relevant_sentences)
+    if cached_answer is not None:
+        return cached_answer
+    prompt = build_prompt(relevant_sentences, question)
+    if timings is not None:
+        timings["prompting_time"] = time.perf_counter() - start_prompting_time
     try:
-        # Sử dụng hàm riêng để chạy generate_content trong một executor
-        model = genai.GenerativeModel(model_name="gemini-2.5-pro")  # type: ignore
-
-        # Sử dụng loop.run_in_executor để chạy hàm đồng bộ trong một thread riêng
-        loop = asyncio.get_event_loop()
-        response = await asyncio.wait_for(
-            loop.run_in_executor(None, lambda: model.generate_content(prompt)),
-            timeout=60,
+        start_llm_time = time.perf_counter()
+        answer, _ = await get_model_router().generate(
+            prompt, question, scores, timeout=60
         )
-        return response.text
+        await store_answer(cache_key, answer, time.perf_counter() - start_llm_time)
+        return answer
     except asyncio.TimeoutError:
         return "Hệ thống đang bận vui lòng thử lại sau."
     except ConnectionError as e:
         logger.info("Network error: %s, retrying...", e)
         try:
-            model = genai.GenerativeModel(model_name="gemini-2.5-pro")  # type: ignore
-            loop = asyncio.get_event_loop()
-            response = await asyncio.wait_for(
-                loop.run_in_executor(None, lambda: model.generate_content(prompt)),
-                timeout=15,
+            start_llm_time = time.perf_counter()
+            answer, _ = await get_model_router().generate(
+                prompt, question, scores, timeout=15
             )
-            return response.text
+            await store_answer(cache_key, answer, time.perf_counter() - start_llm_time)
+            return answer
         except asyncio.TimeoutError:
             return "Hệ thống đang bận vui lòng thử lại sau."
         except ConnectionError:
@@ -108,13 +142,19 @@ async def ask_LLM(relevant_sentences, question):
 async def ask_model(request: QueryQuestion):
     try:
         start_retrieve_time = time.perf_counter()
-        relevant_sentences = get_relevant_sentences(request.question)
+        relevant_sentences, scores = unpack_chunks(
+            await get_relevant_chunks(request.question, 5)
+        )
         end_retrieve_time = time.perf_counter()
         retrieving_time = end_retrieve_time - start_retrieve_time
 
         start_ask_LLM_time = time.perf_counter()
-        answer = await ask_LLM(relevant_sentences, request.question)
+        timings = {"prompting_time": 0.0}
+        answer = await ask_LLM(
+            relevant_sentences, request.question, scores, timings=timings
+        )
         end_ask_LLM_time = time.perf_counter()
+        prompting_time = timings["prompting_time"]
         llm_time = end_ask_LLM_time - start_ask_LLM_time - prompting_time
 
         logger.info(
@@ -149,3 +189,124 @@ async def ask_model(request: QueryQuestion):
                 },
             },
         )
+
+
+def _sse(event, data):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_answer(request: Request, question, relevant_embeddings, start_time):
+    """Yield the SSE events of one streamed RAG answer."""
+    retrieving_time = time.perf_counter() - start_time
+    chunks = []
+    relevant_sentences = []
+    if relevant_embeddings is not None and relevant_embeddings["ids"]:
+        for i, chunk_id in enumerate(relevant_embeddings["ids"][0]):
+            chunks.append(
+                {
+                    "chunk_id": chunk_id,
+                    "metadatas": relevant_embeddings["metadatas"][0][i],
+                    "score": relevant_embeddings["cosine_similarities"][0][i],
+                }
+            )
+            relevant_sentences.append(relevant_embeddings["documents"][0][i])
+    yield _sse(
+        "context",
+        {"question": question, "context_count": len(chunks), "chunks": chunks},
+    )
+
+    start_llm_time = time.perf_counter()
+    first_token_time = None
+    answer = None
+    if not relevant_sentences:
+        answer = "Không tìm thấy thông tin liên quan để trả lời câu hỏi của bạn."
+        cache_key = None
+    else:
+        answer, cache_key = await lookup_answer(question, relevant_sentences)
+
+    if answer is not None:
+        first_token_time = time.perf_counter()
+        yield _sse("token", {"text": answer})
+    else:
+        # Tokens are already sent when a fast answer could be validated, so a
+        # stream stays on the routed tier without escalation
+        router = get_model_router()
+        tier, _ = router.choose_tier(
+            question, relevant_embeddings["cosine_similarities"][0]
+        )
+        upstream = get_llm_gateway().stream(
+            build_prompt(relevant_sentences, question), model_name=tier.model_name
+        )
+        deadline = start_llm_time + LLM_STREAM_TIMEOUT
+        pieces = []
+        try:
+            while True:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected, cancelling generation")
+                    return
+                try:
+                    piece = await asyncio.wait_for(
+                        upstream.__anext__(),
+                        timeout=max(deadline - time.perf_counter(), 0),
+                    )
+                except StopAsyncIteration:
+                    break
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                pieces.append(piece)
+                yield _sse("token", {"text": piece})
+        except asyncio.TimeoutError:
+            yield _sse("error", {"message": "Hệ thống đang bận vui lòng thử lại sau."})
+            return
+        except BulkheadFullError as e:
+            yield _sse(
+                "error",
+                {
+                    "message": "Hệ thống đang bận vui lòng thử lại sau.",
+                    "retry_after": e.retry_after,
+                },
+            )
+            return
+        except ConnectionError as e:
+            logger.info("Network error while streaming: %s", e)
+            yield _sse("error", {"message": "Lỗi mạng"})
+            return
+        finally:
+            # Runs on normal completion, errors and disconnects (Starlette
+            # cancels this generator); shielded so the upstream close is not
+            # cancelled in turn
+            with anyio.CancelScope(shield=True):
+                await upstream.aclose()
+        answer = "".join(pieces)
+        router.record_latency(tier, time.perf_counter() - start_llm_time)
+        await store_answer(cache_key, answer, time.perf_counter() - start_llm_time)
+
+    end_time = time.perf_counter()
+    timing = {
+        "retrieving_time": round(retrieving_time, 4),
+        "time_to_first_token": round((first_token_time or end_time) - start_time, 4),
+        "llm_time": round(end_time - start_llm_time, 4),
+        "total_time": round(end_time - start_time, 4),
+    }
+    logger.info("RAG stream done: %s", timing)
+    yield _sse("done", timing)
+
+
+@router.post("/rag/stream")
+async def ask_model_stream(request: QueryQuestion, raw_request: Request):
+    """
+    Streaming variant of /rag using Server-Sent Events.
+
+    Events, in order: ``context`` (retrieved chunk metadata), ``token`` (answer
+    text as it is generated), then ``done`` (timing) or ``error``.
+    """
+    # Retrieval runs before the response starts so that an overloaded stage
+    # can still answer with a proper 429/503 status
+    start_time = time.perf_counter()
+    relevant_embeddings = await get_relevant_chunks(request.question, 5)
+    return StreamingResponse(
+        _stream_answer(raw_request, request.question, relevant_embeddings, start_time),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,266 @@
+"""
+Startup lifecycle and readiness of the external dependencies.
+
+Nothing remote is contacted at import time or before the server binds its
+port: the lifespan starts one background task that connects every
+dependency concurrently, retrying failures with a capped backoff. Requests
+that arrive earlier still work, since each client is also created lazily
+on first use. ``/ready`` reports the state of each dependency and answers
+503 until the required ones are usable, while ``/health`` only says that
+the process is alive.
+
+Configuration:
+
+- READY_REQUIRED: dependencies that gate readiness
+  (default: "vector_store,embedding,query_cache")
+- READY_INIT_TIMEOUT: seconds allowed for one connection attempt
+- READY_RETRY_SEC / READY_RETRY_MAX_SEC: backoff between failed attempts
+- WARMUP_TOP_N: prime the query caches with this many of the most frequent
+  logged questions once retrieval is up (0 = off); see src/retrieval/warmup.py
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, str(project_root))
+
+from configs.logger import get_logger
+from services.llm import get_llm_backend
+from services.routing import get_model_router
+from src.embedding.client import get_embedding_client
+from src.retrieval.bm25 import get_bm25_index
+from src.retrieval.warmup import (
+    DEFAULT_LOG_FILES,
+    load_top_questions,
+    resolve_paths,
+    warm_query_caches,
+)
+from src.store_vector import search_embeddings
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+READY_REQUIRED = os.getenv("READY_REQUIRED", "vector_store,embedding,query_cache")
+READY_INIT_TIMEOUT = float(os.getenv("READY_INIT_TIMEOUT", "30"))
+READY_RETRY_SEC = float(os.getenv("READY_RETRY_SEC", "2"))
+READY_RETRY_MAX_SEC = float(os.getenv("READY_RETRY_MAX_SEC", "60"))
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "50"))
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "4"))
+# An exported query file (.jsonl / .txt) replaces the logs when set
+WARMUP_QUERY_FILE = os.getenv("WARMUP_QUERY_FILE", "")
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "120"))
+
+
+class Dependency:
+    """One external dependency and the state of its initialization."""
+
+    def __init__(self, name, init, required=False, after=(), timeout=None):
+        self.name = name
+        self.init = init
+        self.required = required
+        self.after = tuple(after)
+        self.timeout = timeout or READY_INIT_TIMEOUT
+        self.ready_event = asyncio.Event()
+        self.state = "pending"
+        self.attempts = 0
+        self.error = None
+        self.duration_ms = None
+        self._started_at = None
+
+    async def initialize(self):
+        """Connect, retrying with exponential backoff until it succeeds."""
+        if self.after:
+            self.state = "waiting"
+            await asyncio.gather(
+                *(
+                    d.ready_event.wait()
+                    for d in get_dependencies()
+                    if d.name in self.after
+                )
+            )
+        delay = READY_RETRY_SEC
+        while True:
+            self.state = "initializing"
+            self.attempts += 1
+            self._started_at = time.time()
+            try:
+                await asyncio.wait_for(self.init(), timeout=self.timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                self.state = "failed"
+                self.error = f"{type(e).__name__}: {e}"
+                logger.warning(
+                    "Dependency %s failed to initialize (attempt %d): %s; retrying in %.0fs",
+                    self.name,
+                    self.attempts,
+                    self.error,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, READY_RETRY_MAX_SEC)
+                continue
+            self.state = "ready"
+            self.error = None
+            self.duration_ms = round((time.time() - self._started_at) * 1000, 1)
+            self.ready_event.set()
+            logger.info(
+                "Dependency %s ready in %.1f ms (attempt %d)",
+                self.name,
+                self.duration_ms,
+                self.attempts,
+            )
+            return
+
+    def status(self):
+        return {
+            "state": self.state,
+            "required": self.required,
+            "attempts": self.attempts,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+        }
+
+
+async def _init_vector_store():
+    if search_embeddings.RETRIEVAL_BACKEND == "local":
+        await asyncio.to_thread(search_embeddings.get_collection)
+    else:
+        await search_embeddings.get_async_collection()
+        # First read of the collection version that keys cached results
+        await search_embeddings.get_collection_version_async()
+
+
+async def _init_embedding():
+    if search_embeddings.RETRIEVAL_MODE == "lexical":
+        return
+    await asyncio.to_thread(get_embedding_client().connect)
+
+
+async def _init_lexical_index():
+    index = await asyncio.to_thread(get_bm25_index)
+    if index is None and search_embeddings.RETRIEVAL_MODE == "lexical":
+        raise RuntimeError("RETRIEVAL_MODE=lexical but the BM25 index is not built")
+
+
+async def _init_llm():
+    router_ = get_model_router()
+    model_names = {
+        os.getenv("LLM_MODEL"),
+        router_.fast_tier.model_name,
+        router_.pro_tier.model_name,
+    }
+    for model_name in model_names:
+        backend = get_llm_backend(model_name)
+        if hasattr(backend, "connect"):
+            await asyncio.to_thread(backend.connect)
+
+
+async def _init_query_cache():
+    paths = (
+        resolve_paths(WARMUP_QUERY_FILE)
+        if WARMUP_QUERY_FILE
+        else resolve_paths(os.getenv("WARMUP_LOG_FILES", DEFAULT_LOG_FILES))
+    )
+    top_questions = await asyncio.to_thread(load_top_questions, paths, WARMUP_TOP_N)
+    questions = [question for question, _ in top_questions]
+    stats = await warm_query_caches(questions, WARMUP_CONCURRENCY)
+    if questions and not stats["succeeded"]:
+        raise RuntimeError(f"All {len(questions)} warm-up queries failed")
+
+
+_DEPENDENCIES = {}
+_DEPENDENCIES_LOCK = threading.Lock()
+
+
+def register_dependency(name, init, required=None, after=(), timeout=None):
+    """
+    Add a dependency to initialize at startup and report on /ready.
+
+    Args:
+        name (str): Name shown on /ready
+        init: Coroutine function that connects or fails with an exception
+        required (bool): Whether readiness waits for it; defaults to
+            membership in READY_REQUIRED
+        after (tuple): Names of dependencies that must be ready first
+        timeout (float): Seconds per attempt (default: READY_INIT_TIMEOUT)
+    """
+    if required is None:
+        required = name in {n.strip() for n in READY_REQUIRED.split(",")}
+    with _DEPENDENCIES_LOCK:
+        _DEPENDENCIES[name] = Dependency(name, init, required, after, timeout)
+
+
+def get_dependencies():
+    """Get the registered dependencies, registering the built-in ones first."""
+    with _DEPENDENCIES_LOCK:
+        empty = not _DEPENDENCIES
+    if empty:
+        register_dependency("vector_store", _init_vector_store)
+        register_dependency("embedding", _init_embedding)
+        if (
+            search_embeddings.RETRIEVAL_MODE != "vector"
+            or search_embeddings.EMBEDDING_LATENCY_BUDGET_MS > 0
+        ):
+            register_dependency("lexical_index", _init_lexical_index)
+        register_dependency("llm", _init_llm)
+        if WARMUP_TOP_N > 0:
+            register_dependency(
+                "query_cache",
+                _init_query_cache,
+                after=("vector_store", "embedding"),
+                timeout=WARMUP_TIMEOUT,
+            )
+    with _DEPENDENCIES_LOCK:
+        return list(_DEPENDENCIES.values())
+
+
+def is_ready():
+    """True once every required dependency has initialized."""
+    return all(d.state == "ready" for d in get_dependencies() if d.required)
+
+
+async def initialize_dependencies():
+    """Initialize all dependencies concurrently."""
+    await asyncio.gather(*(d.initialize() for d in get_dependencies()))
+    logger.info("All dependencies initialized")
+
+
+@asynccontextmanager
+async def lifespan(app):  # pylint: disable=unused-argument
+    """
+    Start dependency initialization in the background and serve immediately.
+
+    On shutdown, initialization still in progress is cancelled.
+    """
+    task = asyncio.create_task(initialize_dependencies())
+    logger.info("Server started, initializing dependencies in the background")
+    try:
+        yield
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        logger.info("Server shutting down...")
+
+
+@router.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once retrieval can serve requests, 503 before."""
+    ready = is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "dependencies": {d.name: d.status() for d in get_dependencies()},
+        },
+    )
@@ -1,54 +1,144 @@
+import asyncio
+import json
 import os
 import signal
 import sys
 import time
+from typing import Literal
 
 import fastapi
 from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib encoder
+    orjson = None
+
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, str(project_root))
 
-from configs.logger import get_logger, setup_logging
-from src.store_vector.search_embeddings import search_relevant_embeddings
+from configs.logger import get_logger
+from src.concurrency.bulkhead import BulkheadFullError
+from src.concurrency.circuit_breaker import CircuitOpenError
+from src.observability.metrics import observe_stage
+from src.store_vector.search_embeddings import (
+    search_relevant_embeddings_async,
+    search_relevant_embeddings_batch_async,
+)
 
-setup_logging()
 logger = get_logger(__name__)
 
 router = APIRouter()
 
+# Batches larger than this are streamed back as NDJSON
+BATCH_STREAM_THRESHOLD = int(os.getenv("RETRIEVE_BATCH_STREAM_THRESHOLD", "100"))
+# When streaming, questions are embedded and queried this many at a time
+BATCH_CHUNK_SIZE = int(os.getenv("RETRIEVE_BATCH_CHUNK_SIZE", "64"))
+
+RetrieveField = Literal["ids", "scores", "metadata", "content", "embeddings"]
+DEFAULT_FIELDS = ("ids", "scores", "metadata", "content")
+# Chroma include entry behind each response field (ids and distances always come back)
+FIELD_INCLUDES = {
+    "metadata": "metadatas",
+    "content": "documents",
+    "embeddings": "embeddings",
+}
+
 
 class QueryRequest(BaseModel):
     question: str
     top_k: int = Field(default=5, description="Number of top results to return", ge=1)
+    fields: list[RetrieveField] | None = Field(
+        default=None,
+        min_length=1,
+        description="Fields returned per chunk (ids, scores, metadata, content, "
+        "embeddings); defaults to all but embeddings",
+    )
+
+    @property
+    def selected_fields(self):
+        return tuple(self.fields) if self.fields else DEFAULT_FIELDS
+
+
+class BatchQueryRequest(BaseModel):
+    items: list[QueryRequest] = Field(
+        min_length=1, max_length=5000, description="Questions with their own top_k"
+    )
+    stream: bool | None = Field(
+        default=None,
+        description="Stream NDJSON; defaults to true for large batches",
+    )
+
+
+def chroma_include(fields):
+    """Chroma fields to fetch for the requested response fields."""
+    return [FIELD_INCLUDES[field] for field in fields if field in FIELD_INCLUDES]
+
+
+def format_chunks(relevant_embeddings, query_index=0, fields=DEFAULT_FIELDS):
+    """Shape one query's search results into the /retrieve response items."""
+    result = []
+    for i, chunk_id in enumerate(relevant_embeddings["ids"][query_index]):
+        data = {}
+        if "ids" in fields:
+            data["chunk_id"] = chunk_id
+        if "scores" in fields:
+            data["distance"] = relevant_embeddings["distances"][query_index][i]
+        if "metadata" in fields:
+            data["metadatas"] = relevant_embeddings["metadatas"][query_index][i]
+        if "scores" in fields:
+            data["score"] = relevant_embeddings["cosine_similarities"][query_index][i]
+        if "content" in fields:
+            data["content"] = relevant_embeddings["documents"][query_index][i]
+        if "embeddings" in fields:
+            embeddings = relevant_embeddings["embeddings"]
+            embedding = embeddings[query_index][i] if embeddings is not None else None
+            # Chroma returns numpy arrays
+            data["embedding"] = (
+                embedding.tolist() if hasattr(embedding, "tolist") else embedding
+            )
+        result.append(data)
+    return result
+
+
+def _dumps(content):
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False).encode("utf-8")
+
+
+def json_response(content):
+    """
+    Serialize a response body with orjson (stdlib json when it is missing).
+
+    Returning a Response skips FastAPI's jsonable_encoder pass, which walks
+    every chunk and metadata value before encoding.
+    """
+    with observe_stage("serialize"):
+        body = _dumps(content)
+    return Response(content=body, media_type="application/json")
 
 
 @router.post("/retrieve")
-def retrieve_embeddings(request: QueryRequest):
+async def retrieve_embeddings(request: QueryRequest):
     logger.info("The question is %s", request.question)
     logger.info("The number of returning chunks is %d", request.top_k)
     start_time = time.time()
     try:
-        relevant_embeddings = search_relevant_embeddings(
-            request.question, request.top_k
+        fields = request.selected_fields
+        relevant_embeddings = await search_relevant_embeddings_async(
+            request.question, request.top_k, include=chroma_include(fields)
         )
-        result = []
-        for i, chunk_id in enumerate(relevant_embeddings["ids"][0]):
-            data = {}
-            data["chunk_id"] = chunk_id
-            data["distance"] = relevant_embeddings["distances"][0][i]
-            data["metadatas"] = relevant_embeddings["metadatas"][0][i]
-            data["score"] = relevant_embeddings["cosine_similarities"][0][i]
-            data["content"] = relevant_embeddings["documents"][0][i]
-            result.append(data)
+        with observe_stage("format"):
+            result = format_chunks(relevant_embeddings, fields=fields)
         if not result:
-            return JSONResponse(status_code=200, content=[])
+            return json_response([])
         logger.info("Found %s valid chunk", len(result))
         end_time = time.time()
-        logger.info(f"All time: {start_time-end_time}")
-        return result
+        logger.info("All time: %.4f", end_time - start_time)
+        return json_response(result)
     except (IndexError, KeyError, FileNotFoundError, ImportError, ValueError) as e:
         logger.info(
             "An error occurred during embedding retrieval: %s", e, exc_info=True
@@ -64,14 +154,124 @@ def retrieve_embeddings(request: QueryRequest):
         )
 
 
+def _item_error(error):
+    """Error entry of one batch question, typed like the app's error responses."""
+    if isinstance(error, BulkheadFullError):
+        return {
+            "type": "overloaded",
+            "message": "The service is overloaded, please retry later",
+            "retry_after": error.retry_after,
+        }
+    if isinstance(error, CircuitOpenError):
+        return {
+            "type": "upstream_unavailable",
+            "message": "A dependency is temporarily unavailable, please retry later",
+            "retry_after": error.retry_after,
+        }
+    if isinstance(error, (ConnectionError, asyncio.TimeoutError)):
+        return {
+            "type": "upstream_unavailable",
+            "message": "A dependency did not respond, please retry later",
+        }
+    return {
+        "type": "internal_error",
+        "message": "An error occurred while processing this question",
+    }
+
+
+def _batch_line(index, item, result):
+    line = {"index": index, "question": item.question}
+    if isinstance(result, BaseException):
+        line["error"] = _item_error(result)
+    else:
+        line["results"] = result
+    return line
+
+
+async def _search_batch(items):
+    # One collection query serves every item, so fetch the union of their fields
+    include = sorted(
+        {name for item in items for name in chroma_include(item.selected_fields)}
+    )
+    results = await search_relevant_embeddings_batch_async(
+        [item.question for item in items], [item.top_k for item in items], include
+    )
+    with observe_stage("format"):
+        # Failed questions keep their exception, see _batch_line
+        return [
+            (
+                relevant_embeddings
+                if isinstance(relevant_embeddings, BaseException)
+                else format_chunks(relevant_embeddings, fields=item.selected_fields)
+            )
+            for item, relevant_embeddings in zip(items, results)
+        ]
+
+
+async def _stream_batch(items):
+    for start in range(0, len(items), BATCH_CHUNK_SIZE):
+        chunk = items[start : start + BATCH_CHUNK_SIZE]
+        try:
+            results = await _search_batch(chunk)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # The 200 status is already sent: report the chunk's questions as
+            # failed instead of cutting the NDJSON body short
+            logger.warning(
+                "Batch retrieval failed for items %d-%d: %s",
+                start,
+                start + len(chunk) - 1,
+                e,
+                exc_info=True,
+            )
+            results = [e] * len(chunk)
+        for offset, (item, result) in enumerate(zip(chunk, results)):
+            yield _dumps(_batch_line(start + offset, item, result)) + b"\n"
+
+
+@router.post("/retrieve/batch")
+async def retrieve_embeddings_batch(request: BatchQueryRequest):
+    """
+    Retrieve chunks for many questions in one request.
+
+    Questions are embedded together and the collection is queried once per
+    batch. Results keep the input order; large batches (or stream=true) are
+    returned as NDJSON, one line per question.
+    """
+    logger.info("Batch retrieval of %d questions", len(request.items))
+    stream = request.stream
+    if stream is None:
+        stream = len(request.items) > BATCH_STREAM_THRESHOLD
+    if stream:
+        return StreamingResponse(
+            _stream_batch(request.items), media_type="application/x-ndjson"
+        )
+
+    start_time = time.time()
+    try:
+        results = await _search_batch(request.items)
+        logger.info("Batch retrieval took %.4fs", time.time() - start_time)
+        return json_response(
+            [
+                _batch_line(i, item, result)
+                for i, (item, result) in enumerate(zip(request.items, results))
+            ]
+        )
+    except (IndexError, KeyError, FileNotFoundError, ImportError, ValueError) as e:
+        logger.info("An error occurred during batch retrieval: %s", e, exc_info=True)
+        return JSONResponse(
+            status_code=500,
+            content={
+                "error": {
+                    "type": "internal_error",
+                    "message": "An error occurred while processing your request",
+                }
+            },
+        )
+
+
 def shutdown():
     os.kill(os.getpid(), signal.SIGTERM)
     return fastapi.Response(status_code=200, content="Server shutting down...")
 
 
-@router.on_event("shutdown")
-def on_shutdown():
-    print("Server shutting down...")
-
-
 router.add_api_route("/shutdown", shutdown, methods=["GET"])
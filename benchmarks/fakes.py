@@ -0,0 +1,231 @@
+"""
+Offline stand-ins for the embedding API, the vector store and the LLM.
+
+They plug into the real extension points (the embedding client's upstream
+call, the module-level Chroma collections, ``register_llm_backend``), so
+batching, caching, single-flight, bulkheads and routing all run as in
+production; only the network calls are replaced by sleeps drawn from a
+configurable latency distribution.
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, str(root))
+
+EMBEDDING_DIM = 1024
+
+
+class LatencyModel:
+    """
+    Latency distribution parsed from a spec string (milliseconds).
+
+    - ``fixed:80``
+    - ``uniform:50,150``
+    - ``lognormal:80,0.5`` (median, sigma); long tail like real APIs
+    - ``bimodal:60,1500,0.02`` (fast, slow, probability of slow)
+    """
+
+    def __init__(self, spec, seed=None):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+        if self.kind not in ("fixed", "uniform", "lognormal", "bimodal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self._random = random.Random(seed)
+
+    def sample(self):
+        """Return one latency in seconds."""
+        p = self.params
+        if self.kind == "fixed":
+            ms = p[0]
+        elif self.kind == "uniform":
+            ms = self._random.uniform(p[0], p[1])
+        elif self.kind == "lognormal":
+            ms = p[0] * self._random.lognormvariate(0, p[1] if len(p) > 1 else 0.5)
+        else:
+            ms = p[1] if self._random.random() < p[2] else p[0]
+        return max(ms, 0.0) / 1000
+
+
+def fake_vector(text):
+    """Deterministic unit vector for a text."""
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:4], "little")
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM)
+    return (vector / np.linalg.norm(vector)).astype(np.float32).tolist()
+
+
+def make_fake_embedding_client(latency, error_rate=0.0, seed=None):
+    """
+    Build an EmbeddingClient whose upstream call sleeps instead of calling Gradio.
+
+    One latency sample is drawn per batch, as for a real batched request.
+    """
+    # pylint: disable=import-outside-toplevel
+    from src.embedding.client import EmbeddingClient
+
+    failures = random.Random(seed)
+
+    class FakeEmbeddingClient(EmbeddingClient):
+        def _get_client(self):
+            return None
+
+        def _embed_batch(self, texts):
+            time.sleep(latency.sample())
+            if failures.random() < error_rate:
+                raise ConnectionError("fake embedding API error")
+            return [fake_vector(text) for text in texts]
+
+    return FakeEmbeddingClient(
+        max_batch_size=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "16")),
+        max_wait_ms=float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "10")),
+        max_concurrent_batches=int(os.getenv("EMBEDDING_MAX_CONCURRENT_BATCHES", "4")),
+    )
+
+
+class FakeCollection:
+    """Chroma-compatible collection returning synthetic law articles."""
+
+    def __init__(self, latency, documents=None):
+        self.latency = latency
+        self.documents = documents or [
+            f"Điều {i}. Quyền và nghĩa vụ của các bên được quy định tại điều {i}. "
+            f"Các bên có trách nhiệm thực hiện đúng quy định của pháp luật."
+            for i in range(1, 201)
+        ]
+        self.metadata = {"hnsw:space": "cosine"}
+
+    def count(self):
+        return len(self.documents)
+
+    def _results(self, query_embeddings, n_results, include=None):
+        include = include or ["metadatas", "documents", "distances"]
+        single = not (query_embeddings and isinstance(query_embeddings[0], list))
+        queries = [query_embeddings] if single else query_embeddings
+        results = {
+            "ids": [],
+            "distances": [],
+            "metadatas": [],
+            "documents": [],
+            "embeddings": [] if "embeddings" in include else None,
+        }
+        for query in queries:
+            start = int(abs(query[0]) * 1e6) % len(self.documents)
+            picked = [(start + i * 7) % len(self.documents) for i in range(n_results)]
+            results["ids"].append([f"fake-{i}" for i in picked])
+            results["distances"].append(
+                [0.2 + 0.05 * rank for rank in range(n_results)]
+            )
+            results["metadatas"].append(
+                [
+                    {
+                        "law_title": "Bộ luật Dân sự",
+                        "chapter_title": "Chương I",
+                        "section_title": f"Điều {i + 1}",
+                    }
+                    for i in picked
+                ]
+            )
+            results["documents"].append([self.documents[i] for i in picked])
+            if "embeddings" in include:
+                results["embeddings"].append(
+                    np.asarray([fake_vector(self.documents[i]) for i in picked])
+                )
+        # Like Chroma, fields that were not requested are not returned
+        for key in ("distances", "metadatas", "documents"):
+            if key not in include:
+                results[key] = None
+        return results
+
+    def query(self, query_embeddings=None, n_results=5, include=None, **kwargs):
+        time.sleep(self.latency.sample())
+        return self._results(query_embeddings, n_results, include)
+
+
+class AsyncFakeCollection(FakeCollection):
+    """Async counterpart, standing in for Chroma's AsyncCollection."""
+
+    async def query(self, query_embeddings=None, n_results=5, include=None, **kwargs):
+        await asyncio.sleep(self.latency.sample())
+        return self._results(query_embeddings, n_results, include)
+
+    async def count(self):
+        return len(self.documents)
+
+
+class FakeLLMBackend:
+    """LLM backend with a time to first token and a per-token delay."""
+
+    def __init__(self, latency, token_delay=0.005, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.answer = (
+            "Theo Chương I Điều 1 Bộ luật Dân sự, nội dung quy định về quyền và "
+            "nghĩa vụ của các bên trong quan hệ dân sự."
+        )
+
+    def _maybe_fail(self):
+        if self._random.random() < self.error_rate:
+            raise ConnectionError("fake LLM error")
+
+    async def generate(self, prompt):
+        await asyncio.sleep(
+            self.latency.sample() + self.token_delay * len(self.answer.split())
+        )
+        self._maybe_fail()
+        return self.answer
+
+    async def stream(self, prompt):
+        await asyncio.sleep(self.latency.sample())
+        self._maybe_fail()
+        for token in self.answer.split(" "):
+            await asyncio.sleep(self.token_delay)
+            yield token + " "
+
+
+def install_fakes(
+    embed_latency,
+    vector_latency,
+    llm_latency,
+    llm_token_delay=0.005,
+    error_rate=0.0,
+    seed=None,
+):
+    """
+    Replace every external service of the app with an offline stand-in.
+
+    Must run after the app modules are imported and before the first request.
+    """
+    # pylint: disable=import-outside-toplevel,protected-access
+    from services.llm import DEFAULT_MODEL_NAME, register_llm_backend
+    from services.routing import get_model_router
+    from src.embedding import client as embedding_client_module
+    from src.store_vector import search_embeddings
+
+    embedding_client_module._EMBEDDING_CLIENT = make_fake_embedding_client(
+        embed_latency, error_rate, seed
+    )
+    search_embeddings._collection = FakeCollection(vector_latency)
+    search_embeddings._async_collection = AsyncFakeCollection(vector_latency)
+
+    router = get_model_router()
+    model_names = {
+        os.getenv("LLM_MODEL", DEFAULT_MODEL_NAME),
+        router.fast_tier.model_name,
+        router.pro_tier.model_name,
+    }
+    for model_name in model_names:
+        register_llm_backend(
+            model_name,
+            FakeLLMBackend(llm_latency, llm_token_delay, error_rate, seed),
+        )
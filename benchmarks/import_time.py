@@ -0,0 +1,180 @@
+"""
+Import-time profile of the app and a cold-start budget check.
+
+Imports a module (``app.main`` by default) in fresh interpreters with
+``python -X importtime``, prints a per-module breakdown (self and
+cumulative time, median over the runs) and the total per top-level
+package, and fails when:
+
+- the total import time is over the budget (--budget-ms or
+  IMPORT_TIME_BUDGET_MS), or
+- a module that must stay deferred until first use (--forbid, by default
+  chromadb, gradio_client, google.generativeai and numpy) was imported.
+
+Examples:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 7 --top 40 --budget-ms 1500
+    python benchmarks/import_time.py --module services.tools --output imports.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy SDKs that the app only needs once it talks to the outside world, and
+# numpy, which only the BM25/local indexes and the semantic answer cache use
+DEFAULT_FORBIDDEN = "chromadb,gradio_client,google.generativeai,numpy"
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        list: (module, self_us, cumulative_us) in import order
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        head, cumulative_us, name = line.split("|")
+        rows.append((name.strip(), int(head.split(":")[1]), int(cumulative_us)))
+    return rows
+
+
+def profile_once(module):
+    """Import ``module`` in a fresh interpreter and return the parsed timings."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def profile(module, runs):
+    """
+    Profile ``runs`` cold imports (after one run that fills the bytecode cache).
+
+    Returns:
+        dict: total_ms, per-module and per-package medians, imported modules
+    """
+    profile_once(module)
+    samples = [profile_once(module) for _ in range(runs)]
+
+    self_us = defaultdict(list)
+    cumulative_us = defaultdict(list)
+    totals = []
+    for rows in samples:
+        # Self times of all modules add up to the whole import
+        totals.append(sum(self_ for _, self_, _ in rows))
+        for name, self_, cumulative in rows:
+            self_us[name].append(self_)
+            cumulative_us[name].append(cumulative)
+
+    modules = {
+        name: {
+            "self_ms": round(statistics.median(self_us[name]) / 1000, 3),
+            "cumulative_ms": round(statistics.median(cumulative_us[name]) / 1000, 3),
+        }
+        for name in self_us
+    }
+    packages = defaultdict(float)
+    for name, timing in modules.items():
+        packages[name.split(".")[0]] += timing["self_ms"]
+    return {
+        "module": module,
+        "runs": runs,
+        "total_ms": round(statistics.median(totals) / 1000, 3),
+        "modules": modules,
+        "packages": {
+            name: round(ms, 3)
+            for name, ms in sorted(packages.items(), key=lambda item: -item[1])
+        },
+    }
+
+
+def print_report(report, top):
+    print(
+        f"Import of {report['module']}: {report['total_ms']:.1f} ms "
+        f"(median of {report['runs']} runs, {len(report['modules'])} modules)\n"
+    )
+    print(f"{'module':50} {'self ms':>9} {'cumul. ms':>10}")
+    slowest = sorted(
+        report["modules"].items(), key=lambda item: -item[1]["cumulative_ms"]
+    )
+    for name, timing in slowest[:top]:
+        print(
+            f"{name[:50]:50} {timing['self_ms']:9.1f} {timing['cumulative_ms']:10.1f}"
+        )
+    print(f"\n{'package':50} {'self ms':>9}")
+    for name, ms in list(report["packages"].items())[:top]:
+        print(f"{name[:50]:50} {ms:9.1f}")
+
+
+def check(report, budget_ms, forbidden):
+    """Return the list of violated constraints."""
+    failures = []
+    if budget_ms and report["total_ms"] > budget_ms:
+        failures.append(
+            f"total import time {report['total_ms']:.1f} ms > budget {budget_ms:.1f} ms"
+        )
+    for name in forbidden:
+        if name in report["modules"]:
+            failures.append(f"{name} is imported at startup")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--module", default="app.main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5, help="Cold imports to run")
+    parser.add_argument("--top", type=int, default=25, help="Rows to print")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "0")),
+        help="Fail above this total import time (0 = no budget)",
+    )
+    parser.add_argument(
+        "--forbid",
+        default=os.getenv("IMPORT_FORBIDDEN_MODULES", DEFAULT_FORBIDDEN),
+        help="Comma-separated modules that must not be imported at startup",
+    )
+    parser.add_argument("--output", help="Write the profile as JSON")
+    args = parser.parse_args(argv)
+
+    report = profile(args.module, args.runs)
+    print_report(report, args.top)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nProfile written to {args.output}")
+
+    forbidden = [name.strip() for name in args.forbid.split(",") if name.strip()]
+    failures = check(report, args.budget_ms, forbidden)
+    if failures:
+        print(f"\nImport budget check failed: {'; '.join(failures)}")
+        return 1
+    if args.budget_ms:
+        print(f"\nWithin the import budget ({args.budget_ms:.0f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,485 @@
+"""
+Load test and latency benchmark for /retrieve, /rag and /agent.
+
+Replays a JSONL question corpus against the FastAPI app in-process (httpx
+ASGI transport), with the embedding API, the vector store and the LLM
+replaced by offline stand-ins (benchmarks/fakes.py) whose latency follows
+the configured distributions. Reports per-endpoint and per-stage latency
+percentiles, throughput, and error/timeout/rejection rates, and writes them
+as JSON so two runs (e.g. two commits) can be compared with --compare.
+
+Examples:
+    python benchmarks/run.py --endpoints retrieve,rag,agent --concurrency 32 \\
+        --requests 500 --output benchmarks/results/head.json
+    python benchmarks/run.py --rate 50 --duration 30 --llm-latency lognormal:800,0.6
+    python benchmarks/run.py --output new.json --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, str(root))
+
+DEFAULT_CORPUS = os.path.join(root, "benchmarks", "questions.jsonl")
+ENDPOINTS = {
+    "retrieve": "/retrieve",
+    "rag": "/rag",
+    "agent": "/agent",
+}
+# Compared by --compare; a higher value is worse for all of them
+REGRESSION_KEYS = ("p50_ms", "p95_ms", "p99_ms", "error_rate", "timeout_rate")
+
+
+def load_corpus(path):
+    """Read questions from a JSONL file ({"question": ..., "top_k": ...} per line)."""
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                item = json.loads(line)
+                if item.get("question"):
+                    items.append(item)
+    if not items:
+        raise ValueError(f"No questions in {path}")
+    return items
+
+
+def build_payload(endpoint, item):
+    if endpoint == "rag":
+        return {"question": item["question"]}
+    payload = {"question": item["question"], "top_k": int(item.get("top_k", 5))}
+    if endpoint == "retrieve" and item.get("fields"):
+        payload["fields"] = item["fields"]
+    return payload
+
+
+def percentiles(values):
+    """Summary statistics in milliseconds."""
+    if not values:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0}
+    array = np.asarray(values) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(array, 50)), 3),
+        "p95_ms": round(float(np.percentile(array, 95)), 3),
+        "p99_ms": round(float(np.percentile(array, 99)), 3),
+        "mean_ms": round(float(array.mean()), 3),
+        "max_ms": round(float(array.max()), 3),
+    }
+
+
+class StageRecorder:
+    """Collect raw per-stage durations from the app's stage histogram."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.enabled = False
+
+    def install(self):
+        # pylint: disable=import-outside-toplevel
+        from src.observability.metrics import STAGE_LATENCY
+
+        observe = STAGE_LATENCY.observe
+
+        def recording_observe(value, **labels):
+            if self.enabled:
+                self.samples[labels.get("stage", "")].append(value)
+            observe(value, **labels)
+
+        STAGE_LATENCY.observe = recording_observe
+
+
+class Outcome:
+    def __init__(self):
+        self.latencies = []
+        self.response_bytes = []
+        self.statuses = defaultdict(int)
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def record(self, status, latency, response_bytes=0):
+        self.statuses[str(status)] += 1
+        if status == 200:
+            self.latencies.append(latency)
+            self.response_bytes.append(response_bytes)
+        elif status == "timeout" or status == 408:
+            self.timeouts += 1
+        elif status in (429, 503):
+            self.rejected += 1
+        else:
+            self.errors += 1
+
+    def summary(self, elapsed):
+        count = sum(self.statuses.values())
+        summary = {
+            "requests": count,
+            "ok": len(self.latencies),
+            "throughput_rps": round(len(self.latencies) / elapsed, 3) if elapsed else 0,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "timeout_rate": round(self.timeouts / count, 4) if count else 0.0,
+            "rejected_rate": round(self.rejected / count, 4) if count else 0.0,
+            "mean_response_bytes": (
+                round(sum(self.response_bytes) / len(self.response_bytes), 1)
+                if self.response_bytes
+                else 0.0
+            ),
+            "statuses": dict(self.statuses),
+        }
+        summary.update(percentiles(self.latencies))
+        return summary
+
+
+async def send(client, endpoint, item, timeout):
+    """Send one request; returns (status code or "timeout"/"error", seconds, body bytes)."""
+    start_time = time.perf_counter()
+    response_bytes = 0
+    try:
+        response = await asyncio.wait_for(
+            client.post(ENDPOINTS[endpoint], json=build_payload(endpoint, item)),
+            timeout=timeout,
+        )
+        status = response.status_code
+        response_bytes = len(response.content)
+        # /agent reports step timeouts and failures in the body
+        if endpoint == "agent" and status == 200:
+            status = response.json().get("status_code", 200)
+    except asyncio.TimeoutError:
+        status = "timeout"
+    except Exception:  # pylint: disable=broad-except
+        status = "error"
+    return status, time.perf_counter() - start_time, response_bytes
+
+
+def schedule(args, corpus):
+    """Yield (endpoint, item) pairs in replay order."""
+    rng = random.Random(args.seed)
+    endpoints = args.endpoints
+    index = 0
+    while True:
+        item = dict(corpus[index % len(corpus)])
+        if args.vary:
+            # Defeat caching and coalescing: every request is a new question
+            item["question"] = f"{item['question']} ({index})"
+        if args.fields:
+            item["fields"] = args.fields
+        yield rng.choice(endpoints), item
+        index += 1
+
+
+async def run_load(client, args, corpus, outcomes):
+    """
+    Replay the corpus.
+
+    Closed loop (--rate 0): ``concurrency`` virtual users each send their next
+    request as soon as the previous one finishes. Open loop (--rate > 0):
+    requests arrive as a Poisson process whatever the response times, with at
+    most ``concurrency`` in flight; latency is measured from the scheduled
+    arrival, so client-side queueing under overload is counted too.
+    """
+    requests = schedule(args, corpus)
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    remaining = [None if args.duration else args.requests]
+
+    def take():
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        if remaining[0] is not None:
+            if remaining[0] <= 0:
+                return None
+            remaining[0] -= 1
+        return next(requests)
+
+    async def record(endpoint, item, arrival):
+        status, _, response_bytes = await send(client, endpoint, item, args.timeout)
+        outcomes[endpoint].record(status, time.perf_counter() - arrival, response_bytes)
+
+    if args.rate <= 0:
+
+        async def user():
+            while (request := take()) is not None:
+                await record(*request, time.perf_counter())
+
+        await asyncio.gather(*(user() for _ in range(args.concurrency)))
+        return
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    rng = random.Random(args.seed)
+
+    async def capped(endpoint, item, arrival):
+        async with semaphore:
+            await record(endpoint, item, arrival)
+
+    tasks = []
+    arrival = time.perf_counter()
+    while (request := take()) is not None:
+        arrival += rng.expovariate(args.rate)
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(capped(*request, arrival)))
+    await asyncio.gather(*tasks)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_environment(args):
+    """Environment for the app under test; must run before the app is imported."""
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    os.environ.setdefault("x-chromadb-token", "benchmark")
+    os.environ.setdefault("EMBEDDING_CACHE_DISK", "false")
+    # Nothing persists between runs: the in-process stand-in or no shared cache
+    os.environ["SHARED_CACHE_BACKEND"] = "memory" if args.with_caches else "none"
+    if not args.with_caches:
+        os.environ["ENABLE_EMBEDDING_CACHE"] = "false"
+        os.environ["ENABLE_ANSWER_CACHE"] = "false"
+
+
+async def benchmark(args):
+    configure_environment(args)
+    # pylint: disable=import-outside-toplevel
+    import logging
+
+    import httpx
+
+    from app.main import app
+    from benchmarks.fakes import LatencyModel, install_fakes
+
+    logging.disable(getattr(logging, args.log_level.upper()) - 1)
+    install_fakes(
+        embed_latency=LatencyModel(args.embed_latency, args.seed),
+        vector_latency=LatencyModel(args.vector_latency, args.seed),
+        llm_latency=LatencyModel(args.llm_latency, args.seed),
+        llm_token_delay=args.llm_token_delay / 1000,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    stages = StageRecorder()
+    stages.install()
+    corpus = load_corpus(args.corpus)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark", timeout=None
+    ) as client:
+        if args.warmup:
+            warmup_args = argparse.Namespace(**vars(args))
+            warmup_args.requests, warmup_args.duration, warmup_args.rate = (
+                args.warmup,
+                0,
+                0,
+            )
+            await run_load(client, warmup_args, corpus, defaultdict(Outcome))
+
+        outcomes = defaultdict(Outcome)
+        stages.enabled = True
+        start_time = time.perf_counter()
+        await run_load(client, args, corpus, outcomes)
+        elapsed = time.perf_counter() - start_time
+        stages.enabled = False
+
+    overall = Outcome()
+    for outcome in outcomes.values():
+        overall.latencies.extend(outcome.latencies)
+        overall.response_bytes.extend(outcome.response_bytes)
+        overall.errors += outcome.errors
+        overall.timeouts += outcome.timeouts
+        overall.rejected += outcome.rejected
+        for status, count in outcome.statuses.items():
+            overall.statuses[status] += count
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "elapsed_seconds": round(elapsed, 3),
+            "config": {
+                k: v for k, v in vars(args).items() if k not in ("output", "compare")
+            },
+        },
+        "overall": overall.summary(elapsed),
+        "endpoints": {
+            endpoint: outcomes[endpoint].summary(elapsed) for endpoint in args.endpoints
+        },
+        "stages": {
+            stage: dict(count=len(values), **percentiles(values))
+            for stage, values in sorted(stages.samples.items())
+        },
+    }
+
+
+def compare(current, baseline, tolerance):
+    """
+    Print the change of each metric against a baseline run.
+
+    Returns:
+        list: Regressions as "section.name.key" strings
+    """
+    regressions = []
+    print(f"\nComparison with baseline {baseline['meta'].get('commit')}:")
+    changed = {
+        key: (baseline["meta"]["config"].get(key), value)
+        for key, value in current["meta"]["config"].items()
+        if baseline["meta"]["config"].get(key) != value
+    }
+    if changed:
+        print(f"  warning: the runs use different settings: {changed}")
+    for section in ("endpoints", "stages"):
+        for name, stats in current[section].items():
+            base = baseline[section].get(name)
+            if not base:
+                continue
+            for key in REGRESSION_KEYS + ("throughput_rps",):
+                if key not in stats or key not in base:
+                    continue
+                new, old = stats[key], base[key]
+                change = (new - old) / old if old else (1.0 if new else 0.0)
+                if key == "throughput_rps":
+                    worse = change < -tolerance
+                elif key.endswith("_ms"):
+                    # Sub-millisecond moves are noise whatever their ratio
+                    worse = change > tolerance and new - old > 0.5
+                else:
+                    worse = new > old + 0.001
+                flag = "  REGRESSION" if worse else ""
+                print(f"  {section}.{name}.{key}: {old} -> {new} ({change:+.1%}){flag}")
+                if worse:
+                    regressions.append(f"{section}.{name}.{key}")
+    return regressions
+
+
+def print_summary(results):
+    print(
+        f"\n{'endpoint':<12}{'req':>7}{'rps':>9}{'p50':>10}{'p95':>10}"
+        f"{'p99':>10}{'err%':>7}{'tmo%':>7}{'rej%':>7}"
+    )
+    rows = dict(results["endpoints"], overall=results["overall"])
+    for name, s in rows.items():
+        print(
+            f"{name:<12}{s['requests']:>7}{s['throughput_rps']:>9.1f}"
+            f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+            f"{s['error_rate'] * 100:>7.1f}{s['timeout_rate'] * 100:>7.1f}"
+            f"{s['rejected_rate'] * 100:>7.1f}"
+        )
+    print(f"\n{'stage':<14}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, s in results["stages"].items():
+        print(
+            f"{name:<14}{s['count']:>7}{s['p50_ms']:>10.1f}"
+            f"{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark /retrieve, /rag and /agent with offline backends"
+    )
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL questions")
+    parser.add_argument(
+        "--endpoints",
+        default="retrieve,rag,agent",
+        type=lambda s: [e.strip() for e in s.split(",") if e.strip()],
+        help="Comma-separated endpoints, picked at random per request",
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0.0,
+        help="Open-loop arrival rate in req/s (Poisson); 0 = closed loop",
+    )
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument(
+        "--duration", type=float, default=0, help="Seconds; overrides --requests"
+    )
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument(
+        "--timeout", type=float, default=30, help="Client timeout per request"
+    )
+    parser.add_argument("--embed-latency", default="lognormal:80,0.4")
+    parser.add_argument("--vector-latency", default="lognormal:40,0.3")
+    parser.add_argument("--llm-latency", default="lognormal:600,0.5")
+    parser.add_argument(
+        "--llm-token-delay", type=float, default=5, help="Milliseconds per token"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Probability that a fake upstream call fails",
+    )
+    parser.add_argument(
+        "--fields",
+        type=lambda s: [f.strip() for f in s.split(",") if f.strip()],
+        help="Fields requested from /retrieve, e.g. ids,scores (default: all)",
+    )
+    parser.add_argument(
+        "--vary",
+        action="store_true",
+        help="Make every question unique (no cache hits or coalescing)",
+    )
+    parser.add_argument(
+        "--with-caches",
+        action="store_true",
+        help="Keep the embedding and answer caches enabled",
+    )
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Relative latency/throughput change tolerated by --compare",
+    )
+    args = parser.parse_args(argv)
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = asyncio.run(benchmark(args))
+    print_summary(results)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
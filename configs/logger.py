@@ -3,13 +3,262 @@
 Simple centralized logging configuration for the AI Legal Assistant project.
 """
 
+import atexit
+import json
 import logging
 import logging.config
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
 import yaml
 
+# Payload fields (message arguments, the final message) are cut to this size
+MAX_FIELD_CHARS = 2000
+
+
+def _env_flag(name, default):
+    return os.getenv(name, default).lower() == "true"
+
+
+# Message arguments that can grow without bound (numbers.Number and other
+# objects are left alone)
+_CAPPED_TYPES = (bytes, bytearray, list, tuple, dict, set, frozenset)
+
+
+def _cap(text, limit):
+    if limit and len(text) > limit:
+        return f"{text[:limit]}...(+{len(text) - limit} chars)"
+    return text
+
+
+def _current_trace_id():
+    # Không import OpenTelemetry ở đây: nếu tracing chưa được nạp thì không có span nào
+    trace = sys.modules.get("opentelemetry.trace")
+    if trace is None:
+        return None
+    context = trace.get_current_span().get_span_context()
+    if not context.is_valid or not context.trace_flags.sampled:
+        return None
+    return f"{context.trace_id:032x}"
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "func": record.funcName,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            data["trace_id"] = trace_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class LogDispatcher:
+    """
+    Background writer for log records.
+
+    Records are put on a bounded queue by the logging thread and written by a
+    single daemon thread, so request handlers never wait on disk. When the
+    queue is full the record is dropped (and counted) rather than blocking;
+    the number of dropped records is logged once the queue drains.
+    """
+
+    def __init__(self, max_size=10000):
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._dropped = 0
+        self._thread = threading.Thread(
+            target=self._run, name="log-dispatcher", daemon=True
+        )
+        self._thread.start()
+
+    def put(self, handlers, record):
+        try:
+            self._queue.put_nowait((handlers, record))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    def stats(self):
+        """Return queued and dropped record counts."""
+        with self._lock:
+            return {"queued": self._queue.qsize(), "dropped": self._dropped}
+
+    def _write(self, handlers, record):
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                try:
+                    handler.handle(record)
+                except Exception:  # pylint: disable=broad-except
+                    handler.handleError(record)
+
+    def _run(self):
+        reported = 0
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._write(*item)
+            with self._lock:
+                dropped = self._dropped
+            if dropped > reported and self._queue.empty():
+                handlers, _ = item
+                self._write(
+                    handlers,
+                    logging.makeLogRecord(
+                        {
+                            "name": __name__,
+                            "levelno": logging.WARNING,
+                            "levelname": "WARNING",
+                            "msg": f"Log queue full, dropped {dropped - reported} records",
+                        }
+                    ),
+                )
+                reported = dropped
+
+    def close(self, timeout=2.0):
+        """Flush the queue (best effort) and stop the writer thread."""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+class AsyncQueueHandler(logging.Handler):
+    """
+    Hand records for ``handlers`` over to the LogDispatcher.
+
+    The message is formatted in the calling thread (so later changes to the
+    arguments do not leak into the log), with text and container arguments and
+    the result capped at ``max_field_chars``; numbers and other objects are
+    passed to the format string unchanged. Records below WARNING are kept with the
+    probability configured for their logger (LOG_SAMPLE_RATES).
+    """
+
+    def __init__(self, handlers, dispatcher, max_field_chars=MAX_FIELD_CHARS):
+        super().__init__()
+        self.handlers = tuple(handlers)
+        self.dispatcher = dispatcher
+        self.max_field_chars = max_field_chars
+        self.sample_rates = _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+        self._rate_by_logger = {}
+
+    def _sample_rate(self, name):
+        rate = self._rate_by_logger.get(name)
+        if rate is None:
+            # The most specific configured prefix wins ("app.rag" over "app")
+            rate = 1.0
+            for prefix in sorted(self.sample_rates, key=len, reverse=True):
+                if name == prefix or name.startswith(prefix + "."):
+                    rate = self.sample_rates[prefix]
+                    break
+            self._rate_by_logger[name] = rate
+        return rate
+
+    def prepare(self, record):
+        limit = self.max_field_chars
+
+        def cap(value):
+            if isinstance(value, str):
+                return _cap(value, limit)
+            # Only oversized values are replaced, so %d/%.4f/%r keep working
+            if isinstance(value, _CAPPED_TYPES):
+                text = str(value)
+                return _cap(text, limit) if limit and len(text) > limit else value
+            return value
+
+        if isinstance(record.args, dict):
+            record.args = {key: cap(value) for key, value in record.args.items()}
+        elif record.args:
+            record.args = tuple(cap(value) for value in record.args)
+        record.msg = _cap(record.getMessage(), limit * 2)
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.trace_id = _current_trace_id()
+        return record
+
+    def emit(self, record):
+        if record.levelno < logging.WARNING:
+            rate = self._sample_rate(record.name)
+            if rate < 1.0 and random.random() >= rate:
+                return
+        try:
+            self.dispatcher.put(self.handlers, self.prepare(record))
+        except Exception:  # pylint: disable=broad-except
+            self.handleError(record)
+
+
+def _parse_sample_rates(value):
+    """Parse "services.tools=0.1,app.rag=0.5" into {logger prefix: rate}."""
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+_DISPATCHER = None
+_DISPATCHER_LOCK = threading.Lock()
+
+
+def get_log_dispatcher():
+    """Get the process-wide background log writer."""
+    # pylint: disable=global-statement
+    global _DISPATCHER
+    with _DISPATCHER_LOCK:
+        if _DISPATCHER is None:
+            _DISPATCHER = LogDispatcher(int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+            atexit.register(_DISPATCHER.close)
+        return _DISPATCHER
+
+
+def wrap_async(handlers):
+    """
+    Route handlers through the background writer (unless ASYNC_LOGGING=false).
+
+    Returns:
+        list: Handlers to attach to a logger
+    """
+    handlers = list(handlers)
+    if not handlers or not _env_flag("ASYNC_LOGGING", "true"):
+        return handlers
+    return [
+        AsyncQueueHandler(
+            handlers,
+            get_log_dispatcher(),
+            int(os.getenv("LOG_MAX_FIELD_CHARS", str(MAX_FIELD_CHARS))),
+        )
+    ]
+
+
+def _make_file_formatter():
+    if os.getenv("LOG_FORMAT", "json").lower() == "json":
+        return JsonFormatter()
+    return logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
 
 class LoggerManager:
     """Manages logging configuration for the application."""
@@ -58,7 +307,12 @@ class LoggerManager:
 
                 # Update file handler paths to use absolute paths
                 self._update_handler_paths(config, project_root)
+                if os.getenv("LOG_FORMAT", "json").lower() != "json":
+                    for handler_config in config.get("handlers", {}).values():
+                        if handler_config.get("formatter") == "json":
+                            handler_config["formatter"] = "standard"
                 logging.config.dictConfig(config)
+                self._install_async_handlers(config)
             else:
                 # Fallback to basic config
                 logging.basicConfig(
@@ -75,6 +329,18 @@ class LoggerManager:
             logging.error("Failed to setup logging: %s", e)
             return False
 
+    def _install_async_handlers(self, config):
+        """Move the configured handlers of each logger behind the background writer."""
+        loggers = [logging.getLogger()] + [
+            logging.getLogger(name) for name in config.get("loggers", {})
+        ]
+        for logger in loggers:
+            handlers = list(logger.handlers)
+            for handler in handlers:
+                logger.removeHandler(handler)
+            for handler in wrap_async(handlers):
+                logger.addHandler(handler)
+
     def reset_logging(self):
         """Reset the setup flag for testing purposes."""
         self._setup_done = False
@@ -143,9 +409,7 @@ def get_logger_app(name="app"):
         logs_dir.mkdir(exist_ok=True)
 
         # Tạo một formatter
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        )
+        formatter = _make_file_formatter()
 
         # Tạo một rotating file handler cho app.log
         app_log_path = str(logs_dir / "app.log")
@@ -160,8 +424,8 @@ def get_logger_app(name="app"):
         handler.setLevel(logging.INFO)
         handler.setFormatter(formatter)
 
-        # Lưu trữ handler như một singleton
-        _APP_LOG_HANDLER = handler
+        # Lưu trữ handler như một singleton (ghi qua luồng nền, không chặn request)
+        _APP_LOG_HANDLER = wrap_async([handler])[0]
         _APP_LOG_PATH = app_log_path
 
     # Get the logger with the specified name
@@ -177,8 +441,11 @@ def get_logger_app(name="app"):
     # Kiểm tra xem logger này đã có app handler chưa
     # bằng cách kiểm tra baseFilename của tất cả các handlers
     app_handler_exists = any(
-        isinstance(handler, logging.FileHandler)
-        and getattr(handler, "baseFilename", "") == _APP_LOG_PATH
+        handler is _APP_LOG_HANDLER
+        or (
+            isinstance(handler, logging.FileHandler)
+            and getattr(handler, "baseFilename", "") == _APP_LOG_PATH
+        )
         for handler in logger.handlers
     )
 
@@ -216,9 +483,7 @@ def get_logger_agent(name="agent"):
         logs_dir.mkdir(exist_ok=True)
 
         # Tạo một formatter
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        )
+        formatter = _make_file_formatter()
 
         # Tạo một rotating file handler cho agent.log
         agent_log_path = str(logs_dir / "agent.log")
@@ -233,8 +498,8 @@ def get_logger_agent(name="agent"):
         handler.setLevel(logging.INFO)
         handler.setFormatter(formatter)
 
-        # Lưu trữ handler như một singleton
-        _AGENT_LOG_HANDLER = handler
+        # Lưu trữ handler như một singleton (ghi qua luồng nền, không chặn request)
+        _AGENT_LOG_HANDLER = wrap_async([handler])[0]
         _AGENT_LOG_PATH = agent_log_path
 
     # Get the logger with the specified name
@@ -250,8 +515,11 @@ def get_logger_agent(name="agent"):
     # Kiểm tra xem logger này đã có agent handler chưa
     # bằng cách kiểm tra baseFilename của tất cả các handlers
     agent_handler_exists = any(
-        isinstance(handler, logging.FileHandler)
-        and getattr(handler, "baseFilename", "") == _AGENT_LOG_PATH
+        handler is _AGENT_LOG_HANDLER
+        or (
+            isinstance(handler, logging.FileHandler)
+            and getattr(handler, "baseFilename", "") == _AGENT_LOG_PATH
+        )
         for handler in logger.handlers
     )
 
@@ -4,9 +4,14 @@ Script warm up ChromaDB Cloud và API embedding trước khi start API server
 - Kiểm tra kết nối ChromaDB Cloud
 - Test API embedding service
 - Verify authentication và collection access
+- Prime query caches với các câu hỏi thường gặp nhất trong logs (hoặc file
+  câu hỏi export), chạy song song có giới hạn
 """
 
+import argparse
+import asyncio
 import logging
+import os
 import sys
 import time
 from pathlib import Path
@@ -117,6 +122,90 @@ def warmup_sentence_transformer(logger):
         return False
 
 
+async def warmup_query_caches(logger, args):
+    """
+    Run the most frequent historical questions through embedding and retrieval
+
+    Embeddings land in the SQLite tier of the embedding cache, which the
+    server processes read on startup.
+
+    Args:
+        logger: Logger instance for output
+        args: Parsed command line arguments
+
+    Returns:
+        bool: True unless every warm-up query failed
+    """
+    # pylint: disable=import-outside-toplevel
+    from src.retrieval.warmup import (
+        load_top_questions,
+        resolve_paths,
+        warm_query_caches,
+    )
+
+    paths = resolve_paths(args.queries or args.logs)
+    top_questions = load_top_questions(paths, args.top_n, args.min_count)
+    if not top_questions:
+        logger.info("ℹ️ No historical questions found in %s", paths)
+        return True
+    logger.info(
+        "🔥 Priming caches with %d questions (most frequent seen %d times)...",
+        len(top_questions),
+        top_questions[0][1],
+    )
+    stats = await warm_query_caches(
+        [question for question, _ in top_questions], args.concurrency, args.top_k
+    )
+    logger.info(
+        "✅ Cache priming: %d/%d questions in %.2f seconds",
+        stats["succeeded"],
+        stats["questions"],
+        stats["elapsed_s"],
+    )
+    return stats["succeeded"] > 0
+
+
+async def run_warmup(logger, args):
+    """Connectivity checks concurrently, then cache priming once they pass"""
+    results = await asyncio.gather(
+        asyncio.to_thread(warmup_sentence_transformer, logger),
+        asyncio.to_thread(warmup_chromadb, logger),
+    )
+    success = all(results)
+    if success and args.top_n > 0:
+        success = await warmup_query_caches(logger, args)
+    return success
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Warm up AI Legal Assistant")
+    parser.add_argument(
+        "--top-n",
+        type=int,
+        default=int(os.getenv("WARMUP_TOP_N", "50")),
+        help="Number of frequent questions to prime (0 = connectivity only)",
+    )
+    parser.add_argument(
+        "--logs",
+        default=os.getenv("WARMUP_LOG_FILES", "logs/app.log*,logs/agent.log*"),
+        help="Comma-separated log files (globs) to mine questions from",
+    )
+    parser.add_argument(
+        "--queries",
+        default=os.getenv("WARMUP_QUERY_FILE", ""),
+        help="Exported query file (.jsonl or .txt) used instead of the logs",
+    )
+    parser.add_argument("--min-count", type=int, default=1)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.getenv("WARMUP_CONCURRENCY", "4")),
+        help="Maximum warm-up queries in flight",
+    )
+    parser.add_argument("--top-k", type=int, default=5)
+    return parser.parse_args(argv)
+
+
 def main():
     """
     Main warm up function - chỉ warm up trước khi start
@@ -124,21 +213,11 @@ def main():
     # Setup path and logging
     setup_path()
     logger = setup_logging()
+    args = parse_args()
 
     logger.info("🚀 Starting AI Legal Assistant warm up sequence...")
 
-    success = True
-
-    # Warm up API embedding first
-    if not warmup_sentence_transformer(logger):
-        success = False
-
-    # Small delay between tests
-    time.sleep(1)
-
-    # Warm up ChromaDB Cloud connection
-    if not warmup_chromadb(logger):
-        success = False
+    success = asyncio.run(run_warmup(logger, args))
 
     if success:
         logger.info("🎉 Warm up completed successfully!")
@@ -0,0 +1,235 @@
+"""
+Semantic answer cache for /rag and /agent.
+
+Each entry stores the question embedding, a fingerprint of the retrieved
+chunks and the LLM answer. A new question reuses a cached answer when its
+embedding is within ``similarity_threshold`` (cosine) of an entry AND the
+retrieved chunk sets overlap by at least ``min_chunk_overlap`` (Jaccard), so
+rephrasings of the same legal question skip the Gemini call.
+
+Answers are also written to the "answer" namespace of the shared result cache
+(src/cache/shared.py), keyed by the normalized question, the chunk set and
+the collection version, so a question answered by one worker process is
+served by all the others without an LLM call.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger_app
+from src.cache.shared import get_shared_cache
+from src.embedding.cache import normalize_query
+from src.store_vector.search_embeddings import (
+    get_collection_version_async,
+    peek_query_embedding,
+)
+
+logger = get_logger_app(__name__)
+
+
+def chunk_fingerprints(chunks):
+    """Stable ids for retrieved chunks, computed from their content."""
+    return frozenset(
+        hashlib.sha1(chunk.encode("utf-8")).hexdigest() for chunk in chunks
+    )
+
+
+class SemanticAnswerCache:
+    """Bounded LRU of (embedding, chunk set, answer) entries."""
+
+    def __init__(
+        self,
+        max_entries=500,
+        similarity_threshold=0.95,
+        min_chunk_overlap=0.6,
+        ttl_seconds=24 * 3600,
+    ):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.min_chunk_overlap = min_chunk_overlap
+        self.ttl_seconds = ttl_seconds
+        self.version = None
+        self._entries = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "lookups": 0,
+            "hits": 0,
+            "stores": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "saved_llm_seconds": 0.0,
+        }
+
+    def check_version(self, version):
+        """Drop every entry when the collection behind retrieval has changed."""
+        with self._lock:
+            if self.version is not None and version != self.version:
+                self._entries.clear()
+                self._stats["invalidations"] += 1
+                logger.info("Answer cache invalidated (collection %s)", version)
+            self.version = version
+
+    def lookup(self, embedding, chunk_ids):
+        """
+        Find a cached answer for a semantically equivalent question.
+
+        Args:
+            embedding (list): Question embedding
+            chunk_ids (frozenset): Fingerprints of the retrieved chunks
+
+        Returns:
+            str | None: Cached answer or None
+        """
+        # numpy is only needed once the semantic cache is used (cold start)
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        now = time.time()
+        with self._lock:
+            self._stats["lookups"] += 1
+            expired = [
+                key
+                for key, entry in self._entries.items()
+                if now - entry["created_at"] > self.ttl_seconds
+            ]
+            for key in expired:
+                del self._entries[key]
+            if not self._entries:
+                return None
+            keys = list(self._entries)
+            matrix = np.stack([self._entries[key]["embedding"] for key in keys])
+            similarities = matrix @ query
+            for i in np.argsort(-similarities):
+                if similarities[i] < self.similarity_threshold:
+                    break
+                entry = self._entries[keys[i]]
+                union = entry["chunk_ids"] | chunk_ids
+                overlap = (
+                    len(entry["chunk_ids"] & chunk_ids) / len(union) if union else 0
+                )
+                if overlap >= self.min_chunk_overlap:
+                    self._entries.move_to_end(keys[i])
+                    self._stats["hits"] += 1
+                    self._stats["saved_llm_seconds"] += entry["llm_seconds"]
+                    return entry["answer"]
+        return None
+
+    def store(self, embedding, chunk_ids, answer, llm_seconds):
+        """Cache an answer produced by the LLM."""
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        with self._lock:
+            self._entries[self._next_key] = {
+                "embedding": vector,
+                "chunk_ids": chunk_ids,
+                "answer": answer,
+                "llm_seconds": llm_seconds,
+                "created_at": time.time(),
+            }
+            self._next_key += 1
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self):
+        """Return hit rate, saved LLM seconds and eviction counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["hit_rate"] = (
+            stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        )
+        return stats
+
+
+_ANSWER_CACHE = None
+_ANSWER_CACHE_LOCK = threading.Lock()
+
+
+def get_answer_cache():
+    """Get the process-wide answer cache, or None when ENABLE_ANSWER_CACHE is false."""
+    # pylint: disable=global-statement
+    global _ANSWER_CACHE
+    if os.getenv("ENABLE_ANSWER_CACHE", "true").lower() != "true":
+        return None
+    with _ANSWER_CACHE_LOCK:
+        if _ANSWER_CACHE is None:
+            _ANSWER_CACHE = SemanticAnswerCache(
+                max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "500")),
+                similarity_threshold=float(
+                    os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")
+                ),
+                min_chunk_overlap=float(os.getenv("ANSWER_CACHE_MIN_OVERLAP", "0.6")),
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "86400")),
+            )
+        return _ANSWER_CACHE
+
+
+async def lookup_answer(question, chunks):
+    """
+    Look up a cached answer for a question and its retrieved chunks.
+
+    The shared cache is read in a worker thread, off the event loop.
+
+    Returns:
+        tuple: (answer or None, cache key to pass to store_answer or None)
+    """
+    cache = get_answer_cache()
+    if cache is None:
+        return None, None
+    version = await get_collection_version_async()
+    cache.check_version(version)
+    fingerprints = chunk_fingerprints(chunks)
+    # Retrieval just embedded the question, so this is a memory hit; without
+    # an embedding (citation lookup, BM25, shared retrieval hit) only the
+    # exact-question lookup in the shared cache applies
+    embedding = peek_query_embedding(question)
+    answer = None
+    if embedding is not None:
+        answer = cache.lookup(embedding, fingerprints)
+        if answer is not None:
+            logger.info("Semantic answer cache hit: %s", cache.stats())
+    shared_parts = [normalize_query(question), sorted(fingerprints)]
+    shared = get_shared_cache()
+    if answer is None and shared is not None:
+        entry = await shared.aget("answer", shared_parts, version)
+        if entry is not None:
+            answer = entry["answer"]
+            logger.info("Shared answer cache hit")
+            if embedding is not None:
+                # Rephrasings are matched in this process from now on
+                cache.store(embedding, fingerprints, answer, entry["llm_seconds"])
+    return answer, (embedding, fingerprints, shared_parts, version)
+
+
+async def store_answer(key, answer, llm_seconds):
+    """Store an answer under a key returned by lookup_answer."""
+    cache = get_answer_cache()
+    if cache is None or key is None:
+        return
+    embedding, fingerprints, shared_parts, version = key
+    if embedding is not None:
+        cache.store(embedding, fingerprints, answer, llm_seconds)
+    shared = get_shared_cache()
+    if shared is not None:
+        await shared.aset(
+            "answer",
+            shared_parts,
+            {"answer": answer, "llm_seconds": llm_seconds},
+            version,
+        )
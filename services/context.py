@@ -0,0 +1,250 @@
+"""
+Token-budgeted context assembly for answer generation.
+
+Retrieved chunks are turned into the prompt context in three steps:
+
+1. near-duplicate chunks (word shingle Jaccard >= ``dedup_threshold``) and
+   sentences repeated by overlapping chunks are dropped,
+2. when the rest is over ``token_budget``, sentences are ranked by lexical
+   relevance to the question (BM25 tokens, diacritic-insensitive) plus a
+   prior for the chunk rank and the chunk heading,
+3. the best sentences are kept until the budget is reached and put back in
+   their original order.
+
+Tokens are counted with tiktoken; when its encoding file is not available
+(offline machines) a character-based estimate is used instead.
+"""
+
+import math
+import os
+import re
+import sys
+import threading
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger_app
+from src.retrieval.bm25 import tokenize
+from src.retrieval.citation import fold_text
+
+logger = get_logger_app(__name__)
+
+_SENTENCE_RE = re.compile(r"(?<=[.;:!?])\s+(?=\S)|\n+")
+# Fragments that belong to the next sentence: "Điều 29.", "1.", "a)"
+_PREFIX_RE = re.compile(r"^(?:(?:điều|chương|mục)\s+\w+|\w{1,3})[.)]$", re.IGNORECASE)
+_ENCODING = None
+_ENCODING_LOADED = False
+_ENCODING_LOCK = threading.Lock()
+
+
+def _get_encoding():
+    # pylint: disable=global-statement
+    global _ENCODING, _ENCODING_LOADED
+    if _ENCODING_LOADED:
+        return _ENCODING
+    with _ENCODING_LOCK:
+        if not _ENCODING_LOADED:
+            try:
+                # pylint: disable=import-outside-toplevel
+                import tiktoken
+
+                _ENCODING = tiktoken.get_encoding(
+                    os.getenv("CONTEXT_TOKEN_ENCODING", "cl100k_base")
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("tiktoken unavailable (%s), estimating tokens", e)
+            _ENCODING_LOADED = True
+    return _ENCODING
+
+
+def count_tokens(text):
+    """Count prompt tokens of a text."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        # Vietnamese averages about 3 characters per cl100k token
+        return math.ceil(len(text) / 3)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_sentences(text):
+    """Split a chunk into sentences and numbered clauses."""
+    sentences = []
+    prefix = ""
+    for part in _SENTENCE_RE.split(text or ""):
+        part = part.strip()
+        if not part:
+            continue
+        if _PREFIX_RE.match(part):
+            prefix = f"{prefix} {part}".strip()
+            continue
+        sentences.append(f"{prefix} {part}".strip())
+        prefix = ""
+    if prefix:
+        sentences.append(prefix)
+    return sentences
+
+
+def _shingles(text, size=3):
+    words = fold_text(text).split()
+    return {tuple(words[i : i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+
+def _jaccard(a, b):
+    union = a | b
+    return len(a & b) / len(union) if union else 1.0
+
+
+@dataclass
+class ContextResult:
+    chunks: list
+    original_tokens: int
+    context_tokens: int
+    dropped_chunks: int = 0
+    dropped_sentences: int = 0
+
+    @property
+    def tokens_saved(self):
+        return self.original_tokens - self.context_tokens
+
+
+class ContextBuilder:
+    """Deduplicate and trim retrieved chunks to a token budget."""
+
+    def __init__(self, token_budget=1500, dedup_threshold=0.8, enabled=True):
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "original_tokens": 0, "context_tokens": 0}
+
+    def _dedup_chunks(self, chunks):
+        kept = []
+        kept_shingles = []
+        for chunk in chunks:
+            shingles = _shingles(chunk)
+            if any(
+                _jaccard(shingles, other) >= self.dedup_threshold
+                for other in kept_shingles
+            ):
+                continue
+            kept.append(chunk)
+            kept_shingles.append(shingles)
+        return kept
+
+    def build(self, question, chunks):
+        """
+        Assemble the context for a question.
+
+        Args:
+            question (str): Raw question
+            chunks (list): Retrieved chunk contents, best first
+
+        Returns:
+            ContextResult: Selected chunks (possibly shortened) and token counts
+        """
+        original_tokens = sum(count_tokens(chunk) for chunk in chunks)
+        if not self.enabled or not chunks:
+            return ContextResult(list(chunks), original_tokens, original_tokens)
+
+        unique_chunks = self._dedup_chunks(chunks)
+        # Overlapping chunks repeat sentences at their boundaries
+        seen = set()
+        sentences = []  # (chunk index, position, text)
+        for chunk_index, chunk in enumerate(unique_chunks):
+            for position, sentence in enumerate(split_sentences(chunk)):
+                key = fold_text(sentence)
+                if key in seen:
+                    continue
+                seen.add(key)
+                sentences.append((chunk_index, position, sentence))
+        total_sentences = sum(len(split_sentences(chunk)) for chunk in chunks)
+        sentence_tokens = [count_tokens(s[2]) for s in sentences]
+
+        if sum(sentence_tokens) <= self.token_budget:
+            selected = set(range(len(sentences)))
+        else:
+            query_terms = set(tokenize(question)) | set(tokenize(fold_text(question)))
+            scores = []
+            for chunk_index, position, sentence in sentences:
+                terms = set(tokenize(sentence)) | set(tokenize(fold_text(sentence)))
+                overlap = len(query_terms & terms) / (len(query_terms) or 1)
+                # Higher-ranked chunks and chunk headings ("Điều 29. ...") first
+                prior = 0.3 / (1 + chunk_index) + (0.3 if position == 0 else 0.0)
+                scores.append(overlap + prior)
+            selected = set()
+            used = 0
+            for i in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+                if used + sentence_tokens[i] > self.token_budget:
+                    continue
+                selected.add(i)
+                used += sentence_tokens[i]
+
+        grouped = {}
+        for i in sorted(selected):
+            grouped.setdefault(sentences[i][0], []).append(sentences[i][2])
+        context_chunks = []
+        for chunk_index in sorted(grouped):
+            chunk = unique_chunks[chunk_index]
+            # Untouched chunks keep their original layout
+            if len(grouped[chunk_index]) == len(split_sentences(chunk)):
+                context_chunks.append(chunk)
+            else:
+                context_chunks.append(" ".join(grouped[chunk_index]))
+        result = ContextResult(
+            chunks=context_chunks,
+            original_tokens=original_tokens,
+            context_tokens=sum(count_tokens(chunk) for chunk in context_chunks),
+            dropped_chunks=len(chunks) - len(context_chunks),
+            dropped_sentences=total_sentences - len(selected),
+        )
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["original_tokens"] += result.original_tokens
+            self._stats["context_tokens"] += result.context_tokens
+        logger.info(
+            "Context: %d -> %d tokens (saved %d), dropped %d chunks, %d sentences",
+            result.original_tokens,
+            result.context_tokens,
+            result.tokens_saved,
+            result.dropped_chunks,
+            result.dropped_sentences,
+        )
+        return result
+
+    def stats(self):
+        """Return total original, context and saved tokens."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["tokens_saved"] = stats["original_tokens"] - stats["context_tokens"]
+        return stats
+
+
+_CONTEXT_BUILDER = None
+_CONTEXT_BUILDER_LOCK = threading.Lock()
+
+
+def get_context_builder():
+    """Get the process-wide context builder configured from the environment."""
+    # pylint: disable=global-statement
+    global _CONTEXT_BUILDER
+    with _CONTEXT_BUILDER_LOCK:
+        if _CONTEXT_BUILDER is None:
+            _CONTEXT_BUILDER = ContextBuilder(
+                token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500")),
+                dedup_threshold=float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8")),
+                enabled=os.getenv("ENABLE_CONTEXT_COMPRESSION", "true").lower()
+                == "true",
+            )
+        return _CONTEXT_BUILDER
+
+
+def build_context(question, chunks):
+    """Assemble the prompt context for a question; see ContextBuilder.build."""
+    return get_context_builder().build(question, chunks)
@@ -0,0 +1,260 @@
+"""
+LLM gateway used for answer generation.
+
+Backends expose the same two coroutines, so endpoints do not depend on
+google.generativeai directly and a local fake can stand in during tests and
+benchmarks:
+
+- ``generate(prompt) -> str``
+- ``stream(prompt)`` -> async iterator of text pieces
+
+Endpoints call them through ``LLMGateway``, which reuses one backend (and one
+model instance) per model name, admits generations through the "llm" bulkhead
+(concurrency cap plus bounded queue, see src/concurrency/bulkhead.py), and
+cancels the native async call when the caller gives up, instead of leaving a
+blocking call running in a thread.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger_app
+from services.context import count_tokens
+from src.concurrency.bulkhead import BulkheadFullError, get_bulkhead
+from src.concurrency.singleflight import get_single_flight
+from src.embedding.cache import normalize_query
+from src.observability.metrics import observe_stage
+from src.observability.tracing import start_span
+
+logger = get_logger_app(__name__)
+
+DEFAULT_MODEL_NAME = "gemini-2.5-pro"
+
+
+class GeminiBackend:
+    """Gemini through google.generativeai's native async API."""
+
+    def __init__(self, model_name=DEFAULT_MODEL_NAME):
+        self.model_name = model_name
+        self._model = None
+
+    def _get_model(self):
+        if self._model is None:
+            # pylint: disable=import-outside-toplevel
+            import google.generativeai as genai
+
+            genai.configure(api_key=os.getenv("Gemini_API_KEY"))  # type: ignore
+            self._model = genai.GenerativeModel(model_name=self.model_name)  # type: ignore
+        return self._model
+
+    def connect(self):
+        """Import and configure the SDK now instead of on the first request."""
+        self._get_model()
+
+    async def generate(self, prompt):
+        response = await self._get_model().generate_content_async(prompt)
+        return response.text
+
+    async def stream(self, prompt):
+        response = await self._get_model().generate_content_async(prompt, stream=True)
+        try:
+            async for chunk in response:
+                if chunk.parts:
+                    yield chunk.text
+        finally:
+            # Cancel the upstream gRPC stream when the consumer stops early
+            # (client disconnected); otherwise Gemini keeps generating.
+            iterator = getattr(response, "_iterator", None)
+            if iterator is not None and hasattr(iterator, "cancel"):
+                iterator.cancel()
+
+
+class FakeStreamingBackend:
+    """Deterministic local model for tests and benchmarks."""
+
+    def __init__(
+        self, answer="Theo điều ..., nội dung ...", token_delay=0.01, model_name="fake"
+    ):
+        self.answer = answer
+        self.token_delay = token_delay
+        self.model_name = model_name
+
+    async def generate(self, prompt):
+        await asyncio.sleep(self.token_delay * len(self.answer.split()))
+        return self.answer
+
+    async def stream(self, prompt):
+        for token in self.answer.split(" "):
+            await asyncio.sleep(self.token_delay)
+            yield token + " "
+
+
+_BACKENDS = {}
+_BACKENDS_LOCK = threading.Lock()
+
+
+def register_llm_backend(model_name, backend):
+    """Serve ``model_name`` with a custom backend (e.g. a local stub in tests)."""
+    with _BACKENDS_LOCK:
+        _BACKENDS[model_name] = backend
+
+
+def get_llm_backend(model_name=None):
+    """
+    Get a shared backend for a model name.
+
+    LLM_BACKEND=fake selects FakeStreamingBackend (no network, no API key).
+    """
+    model_name = model_name or os.getenv("LLM_MODEL", DEFAULT_MODEL_NAME)
+    with _BACKENDS_LOCK:
+        if model_name not in _BACKENDS:
+            if os.getenv("LLM_BACKEND", "gemini").lower() == "fake":
+                _BACKENDS[model_name] = FakeStreamingBackend(
+                    token_delay=float(os.getenv("FAKE_LLM_TOKEN_DELAY", "0.01")),
+                    model_name=model_name,
+                )
+            else:
+                _BACKENDS[model_name] = GeminiBackend(model_name)
+            logger.info(
+                "LLM backend %s ready for %s",
+                type(_BACKENDS[model_name]).__name__,
+                model_name,
+            )
+    return _BACKENDS[model_name]
+
+
+class LLMGateway:
+    """Concurrency-limited entry point for every LLM call."""
+
+    def __init__(self, bulkhead, timeout=60.0):
+        self.bulkhead = bulkhead
+        self.timeout = timeout
+        self._stats = {
+            "requests": 0,
+            "completed": 0,
+            "timeouts": 0,
+            "cancelled": 0,
+            "errors": 0,
+        }
+
+    async def generate(self, prompt, timeout=None, model_name=None):
+        """
+        Generate a full answer.
+
+        Args:
+            prompt (str): Prompt text
+            timeout (float): Seconds for queueing plus generation (default: gateway timeout)
+            model_name (str): Model to use (default: LLM_MODEL)
+
+        Returns:
+            str: Generated text
+
+        Raises:
+            BulkheadFullError: When the queue is full or the wait for a slot times out
+            asyncio.TimeoutError: When the deadline passes; the upstream call is cancelled
+        """
+        model_name = model_name or os.getenv("LLM_MODEL", DEFAULT_MODEL_NAME)
+        # Prompts in flight that differ only in case or whitespace share one
+        # generation; the first caller's deadline applies to it
+        return await get_single_flight("generation").do(
+            (model_name, normalize_query(prompt)),
+            self._generate,
+            prompt,
+            timeout,
+            model_name,
+        )
+
+    async def _generate(self, prompt, timeout, model_name):
+        backend = get_llm_backend(model_name)
+        deadline = time.perf_counter() + (timeout or self.timeout)
+        self._stats["requests"] += 1
+        try:
+            with (
+                observe_stage("llm"),
+                start_span("llm.generate", model=model_name) as span,
+            ):
+                async with self.bulkhead.slot(
+                    timeout=min(
+                        self.bulkhead.queue_timeout, deadline - time.perf_counter()
+                    )
+                ):
+                    text = await asyncio.wait_for(
+                        backend.generate(prompt),
+                        timeout=max(deadline - time.perf_counter(), 0),
+                    )
+                if span.is_recording():
+                    # Counted only for sampled requests
+                    span.set_attributes(
+                        {
+                            "prompt_tokens": count_tokens(prompt),
+                            "output_tokens": count_tokens(text),
+                        }
+                    )
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            logger.info("LLM generation timed out: %s", self.stats())
+            raise
+        except asyncio.CancelledError:
+            self._stats["cancelled"] += 1
+            raise
+        except BulkheadFullError:
+            raise
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        self._stats["completed"] += 1
+        return text
+
+    async def stream(self, prompt, model_name=None):
+        """
+        Stream an answer; the slot is held until the stream is exhausted or closed.
+
+        Closing the returned async generator (or cancelling its consumer)
+        cancels the upstream generation.
+        """
+        backend = get_llm_backend(model_name)
+        self._stats["requests"] += 1
+        try:
+            with observe_stage("llm"):
+                async with self.bulkhead.slot():
+                    upstream = backend.stream(prompt)
+                    try:
+                        async for piece in upstream:
+                            yield piece
+                    finally:
+                        await upstream.aclose()
+        except (asyncio.CancelledError, GeneratorExit):
+            self._stats["cancelled"] += 1
+            raise
+        self._stats["completed"] += 1
+
+    def stats(self):
+        """Return outcome counters plus the LLM bulkhead's queue statistics."""
+        stats = dict(self._stats)
+        stats.update(self.bulkhead.stats())
+        return stats
+
+
+_LLM_GATEWAY = None
+_LLM_GATEWAY_LOCK = threading.Lock()
+
+
+def get_llm_gateway():
+    """Get the process-wide LLM gateway configured from the environment."""
+    # pylint: disable=global-statement
+    global _LLM_GATEWAY
+    with _LLM_GATEWAY_LOCK:
+        if _LLM_GATEWAY is None:
+            _LLM_GATEWAY = LLMGateway(
+                get_bulkhead("llm"), timeout=float(os.getenv("LLM_TIMEOUT", "60"))
+            )
+        return _LLM_GATEWAY
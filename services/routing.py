@@ -0,0 +1,222 @@
+"""
+Latency-aware routing between a fast and a pro Gemini tier.
+
+Each request gets an "easiness" score from cheap features of the question and
+its retrieval results:
+
+- top cosine similarity of the retrieved chunks,
+- gap between the first and second similarity,
+- question length in words,
+- whether the question cites an article explicitly ("Điều 29 luật ...").
+
+Easy requests (typically an article quoted back) go to the fast tier; the
+answer is checked by ``validate_answer`` and escalated to the pro tier when
+it fails. Tier model names come from the environment, and any of them can be
+served by a stub backend through ``services.llm.register_llm_backend``.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger_app
+from services.llm import get_llm_gateway
+from src.observability.metrics import percentile
+from src.retrieval.citation import parse_citation
+
+logger = get_logger_app(__name__)
+
+NOT_FOUND_ANSWER = "Không tìm thấy thông tin liên quan"
+MAX_ANSWER_CHARS = 4000
+# Similarities at which a fast "not found" answer is considered suspicious
+STRONG_MATCH_SCORE = 0.75
+
+
+@dataclass
+class ModelTier:
+    name: str
+    model_name: str
+
+
+def routing_features(question, scores):
+    """
+    Compute routing features for a request.
+
+    Args:
+        question (str): Raw question
+        scores (list): Cosine similarities of the retrieved chunks, best first
+
+    Returns:
+        dict: top_score, score_gap, question_words, has_citation
+    """
+    scores = sorted((float(s) for s in scores or []), reverse=True)
+    return {
+        "top_score": scores[0] if scores else 0.0,
+        "score_gap": scores[0] - scores[1] if len(scores) > 1 else 0.0,
+        "question_words": len(question.split()),
+        "has_citation": parse_citation(question) is not None,
+    }
+
+
+def _clip01(value):
+    return min(max(value, 0.0), 1.0)
+
+
+def easiness_score(features):
+    """Score in [0, 1]; higher means the fast tier is likely good enough."""
+    # A citation alone stays below the default 0.5 threshold: the cited article
+    # must also be retrieved with some confidence
+    score = 0.35 if features["has_citation"] else 0.0
+    score += 0.4 * _clip01((features["top_score"] - 0.5) / 0.3)
+    score += 0.25 * _clip01(features["score_gap"] / 0.1)
+    if features["question_words"] > 25:
+        score -= 0.2
+    return _clip01(score)
+
+
+def validate_answer(answer, features):
+    """
+    Cheap sanity check of a fast-tier answer.
+
+    Rejects empty or runaway answers, "not found" answers despite a strong
+    retrieval match, and answers to a cited article that never mention an
+    article.
+    """
+    text = (answer or "").strip()
+    if not text or len(text) > MAX_ANSWER_CHARS:
+        return False
+    if NOT_FOUND_ANSWER in text and features["top_score"] >= STRONG_MATCH_SCORE:
+        return False
+    if features["has_citation"] and "điều" not in text.lower():
+        return False
+    return True
+
+
+class ModelRouter:
+    """Pick a tier per request, escalate failed fast answers, keep per-tier stats."""
+
+    def __init__(self, fast_tier, pro_tier, threshold=0.5, enabled=True):
+        self.fast_tier = fast_tier
+        self.pro_tier = pro_tier
+        self.threshold = threshold
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._latencies = {
+            tier.name: deque(maxlen=1000) for tier in (fast_tier, pro_tier)
+        }
+        self._stats = {
+            tier.name: {"requests": 0, "errors": 0, "seconds": 0.0}
+            for tier in (fast_tier, pro_tier)
+        }
+        self._escalations = 0
+
+    def choose_tier(self, question, scores):
+        """Return (tier, features) for a request."""
+        features = routing_features(question, scores)
+        features["easiness"] = easiness_score(features)
+        if self.enabled and features["easiness"] >= self.threshold:
+            return self.fast_tier, features
+        return self.pro_tier, features
+
+    def record_latency(self, tier, seconds, error=False):
+        """Count one generation on a tier."""
+        with self._lock:
+            stats = self._stats[tier.name]
+            stats["requests"] += 1
+            stats["seconds"] += seconds
+            stats["errors"] += int(error)
+            self._latencies[tier.name].append(seconds)
+
+    async def _generate_on(self, tier, prompt, deadline):
+        start_time = time.perf_counter()
+        try:
+            answer = await get_llm_gateway().generate(
+                prompt,
+                timeout=max(deadline - start_time, 0.001),
+                model_name=tier.model_name,
+            )
+        except BaseException:
+            self.record_latency(tier, time.perf_counter() - start_time, error=True)
+            raise
+        self.record_latency(tier, time.perf_counter() - start_time)
+        return answer
+
+    async def generate(self, prompt, question, scores, timeout=60):
+        """
+        Generate an answer on the routed tier.
+
+        Args:
+            prompt (str): Prompt text
+            question (str): Raw question (for routing features)
+            scores (list): Cosine similarities of the retrieved chunks
+            timeout (float): Deadline in seconds shared by both tiers
+
+        Returns:
+            tuple: (answer, name of the tier that produced it)
+        """
+        deadline = time.perf_counter() + timeout
+        tier, features = self.choose_tier(question, scores)
+        answer = await self._generate_on(tier, prompt, deadline)
+        if tier is self.fast_tier and not validate_answer(answer, features):
+            with self._lock:
+                self._escalations += 1
+            logger.info("Fast answer failed validation, escalating: %s", features)
+            tier = self.pro_tier
+            answer = await self._generate_on(tier, prompt, deadline)
+        logger.info(
+            "Answered on %s tier (easiness=%.2f)", tier.name, features["easiness"]
+        )
+        return answer, tier.name
+
+    def stats(self):
+        """Return per-tier request counts, latency percentiles and escalations."""
+        with self._lock:
+            result = {"escalations": self._escalations, "tiers": {}}
+            for name, stats in self._stats.items():
+                latencies = list(self._latencies[name])
+                tier_stats = dict(stats)
+                tier_stats["p50_seconds"] = percentile(latencies, 50)
+                tier_stats["p95_seconds"] = percentile(latencies, 95)
+                result["tiers"][name] = tier_stats
+        return result
+
+
+_MODEL_ROUTER = None
+_MODEL_ROUTER_LOCK = threading.Lock()
+
+
+def get_model_router():
+    """Get the process-wide model router configured from the environment."""
+    # pylint: disable=global-statement
+    global _MODEL_ROUTER
+    with _MODEL_ROUTER_LOCK:
+        if _MODEL_ROUTER is None:
+            _MODEL_ROUTER = ModelRouter(
+                fast_tier=ModelTier(
+                    "fast", os.getenv("LLM_FAST_MODEL", "gemini-2.5-flash")
+                ),
+                pro_tier=ModelTier(
+                    "pro",
+                    os.getenv(
+                        "LLM_PRO_MODEL", os.getenv("LLM_MODEL", "gemini-2.5-pro")
+                    ),
+                ),
+                threshold=float(os.getenv("LLM_ROUTING_THRESHOLD", "0.5")),
+                enabled=os.getenv("ENABLE_MODEL_ROUTING", "true").lower() == "true",
+            )
+            logger.info(
+                "Model router ready (fast=%s, pro=%s, threshold=%.2f)",
+                _MODEL_ROUTER.fast_tier.model_name,
+                _MODEL_ROUTER.pro_tier.model_name,
+                _MODEL_ROUTER.threshold,
+            )
+        return _MODEL_ROUTER
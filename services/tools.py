@@ -1,21 +1,24 @@
 import asyncio
 import os
 import sys
+import time
 
-import google.generativeai as genai
 from dotenv import load_dotenv
 
 load_dotenv()
-genai.configure(api_key=os.getenv("Gemini_API_KEY"))  # type: ignore
 from pydantic import BaseModel
 
 root = os.getcwd()
 sys.path.insert(0, str(root))
-from configs.logger import get_logger_app, setup_logging
+from configs.logger import get_logger_app
 
-setup_logging()
 logger = get_logger_app(__name__)
-from src.store_vector.search_embeddings import search_relevant_embeddings
+from services.answer_cache import lookup_answer, store_answer
+from services.context import build_context
+from services.routing import get_model_router
+from src.observability.metrics import observe_stage
+from src.observability.tracing import start_span
+from src.store_vector.search_embeddings import search_relevant_embeddings_async
 
 
 class RetrieveInput(BaseModel):
@@ -25,11 +28,13 @@ class RetrieveInput(BaseModel):
 
 class RetrieveOutput(BaseModel):
     chunks: list[str]
+    scores: list[float] = []
 
 
 class GenerateInput(BaseModel):
     question: str
     chunks: list[str]
+    scores: list[float] = []
 
 
 class GenerateOutput(BaseModel):
@@ -45,17 +50,24 @@ class FormatOutput(BaseModel):
     formatted_answer: str
 
 
-def retrieve_laws(data: RetrieveInput) -> RetrieveOutput:
+async def retrieve_laws(data: RetrieveInput) -> RetrieveOutput:
     try:
         logger.info("Question: %s, number of chunks: %d", data.question, data.top_k)
-        relevant_embeddings = search_relevant_embeddings(data.question, data.top_k)
+        relevant_embeddings = await search_relevant_embeddings_async(
+            data.question, data.top_k
+        )
         # relevant_embeddings["documents"] trả về nested list, cần flatten nó
         chunks = (
             relevant_embeddings["documents"][0]
             if relevant_embeddings["documents"]
             else []
         )
-        return RetrieveOutput(chunks=chunks)
+        scores = (
+            relevant_embeddings["cosine_similarities"][0]
+            if relevant_embeddings["cosine_similarities"]
+            else []
+        )
+        return RetrieveOutput(chunks=chunks, scores=scores)
     except (ValueError, KeyError, ImportError, OSError) as e:
         logger.error("An error occurred: %s", e)
         return RetrieveOutput(chunks=[])
@@ -106,15 +118,32 @@ def retrieve_laws(data: RetrieveInput) -> RetrieveOutput:
 
 async def generate_answer(data: GenerateInput) -> GenerateOutput:
     relevant_sentences = data.chunks
-    logger.info("Question: %s, chunks: %s", data.question, data.chunks)
+    logger.info("Question: %s, %d chunks", data.question, len(data.chunks))
+    logger.debug("Chunks: %s", data.chunks)
     if not relevant_sentences:
         return GenerateOutput(
             answer="Không tìm thấy thông tin liên quan để trả lời câu hỏi của bạn."
         )
-    # Tạo một chuỗi chứa tất cả các câu từ relevant_sentences
-    context = ""
-    for i, sentence in enumerate(relevant_sentences, 1):
-        context += f"Đoạn {i}: {sentence}\n"
+    cached_answer, cache_key = await lookup_answer(data.question, relevant_sentences)
+    if cached_answer is not None:
+        return GenerateOutput(answer=cached_answer)
+    # Gộp các đoạn đã được chọn trong giới hạn token (services/context.py)
+    with (
+        observe_stage("prompt_build"),
+        start_span("prompt.build", chunk_count=len(relevant_sentences)) as span,
+    ):
+        context_result = build_context(data.question, relevant_sentences)
+        span.set_attributes(
+            {
+                "original_tokens": context_result.original_tokens,
+                "context_tokens": context_result.context_tokens,
+                "context_chunk_count": len(context_result.chunks),
+            }
+        )
+        context_chunks = context_result.chunks
+        context = "".join(
+            f"Đoạn {i}: {sentence}\n" for i, sentence in enumerate(context_chunks, 1)
+        )
 
     prompt = f"""Với vai trò là 1 trợ lý ảo pháp luật, dựa trên các nội dung sau:
         {context}
@@ -128,29 +157,25 @@ async def generate_answer(data: GenerateInput) -> GenerateOutput:
         Trả lời ngắn gọn.
     """
     try:
-        # Sử dụng hàm riêng để chạy generate_content trong một executor
-        model = genai.GenerativeModel(model_name="gemini-2.5-pro")  # type: ignore
-
-        # Sử dụng loop.run_in_executor để chạy hàm đồng bộ trong một thread riêng
-        loop = asyncio.get_event_loop()
-        response = await asyncio.wait_for(
-            loop.run_in_executor(None, lambda: model.generate_content(prompt)),
-            timeout=60,
+        start_llm_time = time.perf_counter()
+        answer, _ = await get_model_router().generate(
+            prompt, data.question, data.scores, timeout=60
         )
-        logger.info("The answer from LLM is %s", response.text)
-        return GenerateOutput(answer=response.text)
+        logger.info("The answer from LLM has %d characters", len(answer))
+        logger.debug("The answer from LLM is %s", answer)
+        await store_answer(cache_key, answer, time.perf_counter() - start_llm_time)
+        return GenerateOutput(answer=answer)
     except asyncio.TimeoutError:
         return GenerateOutput(answer="Hệ thống đang bận vui lòng thử lại sau.")
     except ConnectionError as e:
         logger.info("Network error: %s, retrying...", e)
         try:
-            model = genai.GenerativeModel(model_name="gemini-2.5-pro")  # type: ignore
-            loop = asyncio.get_event_loop()
-            response = await asyncio.wait_for(
-                loop.run_in_executor(None, lambda: model.generate_content(prompt)),
-                timeout=15,
+            start_llm_time = time.perf_counter()
+            answer, _ = await get_model_router().generate(
+                prompt, data.question, data.scores, timeout=15
             )
-            return GenerateOutput(answer=response.text)
+            await store_answer(cache_key, answer, time.perf_counter() - start_llm_time)
+            return GenerateOutput(answer=answer)
         except asyncio.TimeoutError:
             return GenerateOutput(answer="Hệ thống đang bận vui lòng thử lại sau.")
         except ConnectionError:
@@ -162,11 +187,15 @@ def format_citation(data: FormatInput) -> FormatOutput:
     try:
         answer = data.answer
         chunks = data.chunks
-        context = ""
-        for i, sentence in enumerate(chunks, 1):
-            context += f"Đoạn {i}: {sentence}\n"
-        new_answer = f"{answer}\nNguồn:\n{context}"
-        logger.info("The formatted answer is \n%s", new_answer)
+        with (
+            observe_stage("format"),
+            start_span("format.citation", chunk_count=len(chunks)),
+        ):
+            context = ""
+            for i, sentence in enumerate(chunks, 1):
+                context += f"Đoạn {i}: {sentence}\n"
+            new_answer = f"{answer}\nNguồn:\n{context}"
+        logger.debug("The formatted answer is \n%s", new_answer)
         return FormatOutput(formatted_answer=new_answer)
     except (ValueError, OSError, ImportError, KeyError) as e:
         logger.error("An error occurred: %s", e)
@@ -174,14 +203,16 @@ def format_citation(data: FormatInput) -> FormatOutput:
 
 
 if __name__ == "__main__":
-    chunks = retrieve_laws(
-        RetrieveInput(question="Chương II điều 29 luật hàng hải nói gì?", top_k=5)
-    )
 
     async def main():
+        chunks = await retrieve_laws(
+            RetrieveInput(question="Chương II điều 29 luật hàng hải nói gì?", top_k=5)
+        )
         res = await generate_answer(
             GenerateInput(
-                question="Chương II điều 29 luật hàng hải nói gì?", chunks=chunks.chunks
+                question="Chương II điều 29 luật hàng hải nói gì?",
+                chunks=chunks.chunks,
+                scores=chunks.scores,
             )
         )
         answer = format_citation(FormatInput(answer=res.answer, chunks=chunks.chunks))
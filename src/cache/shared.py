@@ -0,0 +1,405 @@
+"""
+Result cache shared by the worker processes of a deployment.
+
+Each uvicorn worker keeps its own in-process caches, so with N workers a
+question can be embedded, searched and answered N times before every worker
+has seen it. This layer sits underneath those caches:
+
+- "sqlite" (default): one SQLite file in WAL mode; readers never block the
+  writer, so all workers on a host read and fill the same entries
+- "redis": a Redis server shared across hosts (needs the ``redis`` package);
+  size is bounded by the server's maxmemory policy (use allkeys-lru)
+- "memory": in-process stand-in with the networked backend's behaviour,
+  for development, tests and benchmarks
+- "none": disabled
+
+Entries live in namespaces ("embedding", "retrieval", "answer"), each with
+its own TTL (SHARED_CACHE_TTL_<NAMESPACE>). A key hashes the namespace, a
+version and the lookup parts; retrieval results and answers use the
+collection identity (get_collection_version) as version, so re-indexing
+never serves stale results. The SQLite and memory backends evict the least
+recently used entries above SHARED_CACHE_MAX_ENTRIES.
+
+Hits and misses are counted per namespace for the process (exported on
+/metrics) and per request (``X-Cache`` response header, see
+CacheStatsMiddleware).
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib encoder
+    orjson = None
+
+logger = get_logger(__name__)
+
+SHARED_CACHE_PATH = "data/cache/shared.sqlite3"
+# The embedding tier passes its own TTL (EMBEDDING_CACHE_DISK_TTL)
+DEFAULT_TTLS = {"retrieval": 3600, "answer": 24 * 3600}
+# accessed_at is refreshed at most this often per entry, so that hits on hot
+# keys do not turn every read into a write
+ACCESS_RESOLUTION_SECONDS = 60
+
+
+def _encode(value):
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        value,
+        ensure_ascii=False,
+        default=lambda v: v.tolist() if hasattr(v, "tolist") else str(v),
+    ).encode("utf-8")
+
+
+def _decode(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class SQLiteBackend:
+    """Entries in a WAL-mode SQLite file shared by every process on the host."""
+
+    def __init__(self, path, max_entries=50000, evict_every=200):
+        self.path = path
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connect()
+
+    def _connect(self):
+        # One connection per thread; SQLite serializes writers across processes
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)"
+            )
+            db.commit()
+            self._local.db = db
+        return db
+
+    def get(self, key, now):
+        db = self._connect()
+        row = db.execute(
+            "SELECT value, expires_at, accessed_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        if now - row[2] > ACCESS_RESOLUTION_SECONDS:
+            db.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            db.commit()
+        return row[0]
+
+    def set(self, key, value, ttl, now):
+        db = self._connect()
+        db.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?)",
+            (key, value, now + ttl, now),
+        )
+        db.commit()
+        with self._writes_lock:
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        return self.evict(now) if evict else 0
+
+    def evict(self, now):
+        """Delete expired entries, then the least recently used above max_entries."""
+        db = self._connect()
+        removed = db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,)).rowcount
+        over = self.size() - self.max_entries
+        if over > 0:
+            removed += db.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (over,),
+            ).rowcount
+        db.commit()
+        return removed
+
+    def size(self):
+        return self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def clear(self):
+        db = self._connect()
+        db.execute("DELETE FROM cache")
+        db.commit()
+
+
+class MemoryBackend:
+    """In-process LRU with TTLs; stand-in for the networked backend."""
+
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl, now):
+        with self._lock:
+            self._entries[key] = (value, now + ttl)
+            self._entries.move_to_end(key)
+            removed = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                removed += 1
+            return removed
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """Redis shared by several hosts; Redis itself expires and evicts entries."""
+
+    def __init__(self, url, prefix="ai-legal-assistant:"):
+        # pylint: disable=import-outside-toplevel
+        import redis
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(
+            url, socket_timeout=0.5, socket_connect_timeout=1
+        )
+
+    def get(self, key, now):  # pylint: disable=unused-argument
+        return self._client.get(self.prefix + key)
+
+    def set(self, key, value, ttl, now):  # pylint: disable=unused-argument
+        self._client.set(self.prefix + key, value, ex=max(int(ttl), 1))
+        return 0
+
+    def size(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + "*"))
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self.prefix + "*"):
+            self._client.delete(key)
+
+
+_REQUEST_STATS = contextvars.ContextVar("shared_cache_request_stats", default=None)
+
+
+class SharedCache:
+    """Namespaced, versioned get/set over a backend, with hit statistics."""
+
+    def __init__(self, backend, ttls=None):
+        self.backend = backend
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._lock = threading.Lock()
+        self._stats = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "stores": 0, "errors": 0}
+        )
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(namespace, parts, version=""):
+        """Hash the lookup parts (JSON-serializable) under a namespace and version."""
+        raw = json.dumps([version, parts], ensure_ascii=False, default=str)
+        return f"{namespace}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+    def _count(self, namespace, field):
+        with self._lock:
+            self._stats[namespace][field] += 1
+        request_stats = _REQUEST_STATS.get()
+        if request_stats is not None and field in ("hits", "misses"):
+            counts = request_stats.setdefault(namespace, [0, 0])
+            counts[0] += field == "hits"
+            counts[1] += 1
+
+    def get(self, namespace, parts, version=""):
+        """
+        Look up a value.
+
+        Args:
+            namespace (str): "embedding", "retrieval", "answer", ...
+            parts: JSON-serializable lookup key
+            version (str): Identity of the data the value was computed from
+
+        Returns:
+            The cached value, or None on a miss or backend error
+        """
+        try:
+            data = self.backend.get(
+                self.make_key(namespace, parts, version), time.time()
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("Shared cache read failed (%s): %s", namespace, e)
+            self._count(namespace, "errors")
+            return None
+        if data is None:
+            self._count(namespace, "misses")
+            return None
+        self._count(namespace, "hits")
+        return _decode(data)
+
+    def set(self, namespace, parts, value, version="", ttl=None):
+        """Store a JSON-serializable value; errors are logged, never raised."""
+        ttl = ttl if ttl is not None else self.ttls.get(namespace, 3600)
+        try:
+            removed = self.backend.set(
+                self.make_key(namespace, parts, version),
+                _encode(value),
+                ttl,
+                time.time(),
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("Shared cache write failed (%s): %s", namespace, e)
+            self._count(namespace, "errors")
+            return
+        self._count(namespace, "stores")
+        if removed:
+            with self._lock:
+                self._evictions += removed
+
+    async def aget(self, namespace, parts, version=""):
+        """Async get; backend I/O runs in a worker thread."""
+        return await asyncio.to_thread(self.get, namespace, parts, version)
+
+    async def aset(self, namespace, parts, value, version="", ttl=None):
+        """Async set; backend I/O runs in a worker thread."""
+        await asyncio.to_thread(self.set, namespace, parts, value, version, ttl)
+
+    def stats(self):
+        """Per-namespace hits, misses, stores, errors and hit rate, plus evictions."""
+        with self._lock:
+            namespaces = {name: dict(counts) for name, counts in self._stats.items()}
+            evictions = self._evictions
+        for counts in namespaces.values():
+            lookups = counts["hits"] + counts["misses"]
+            counts["hit_rate"] = counts["hits"] / lookups if lookups else 0.0
+        return {
+            "backend": type(self.backend).__name__,
+            "evictions": evictions,
+            "namespaces": namespaces,
+        }
+
+    def clear(self):
+        self.backend.clear()
+
+
+class CacheStatsMiddleware:
+    """
+    ASGI middleware adding the request's shared cache hits to the response.
+
+    The header reads ``X-Cache: retrieval=1/1, answer=0/1`` (hits/lookups per
+    namespace); it is omitted when the request did no lookup.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_stats = {}
+        token = _REQUEST_STATS.set(request_stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and request_stats:
+                value = ", ".join(
+                    f"{name}={hits}/{lookups}"
+                    for name, (hits, lookups) in request_stats.items()
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-cache", value.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _REQUEST_STATS.reset(token)
+
+
+_SHARED_CACHE = None
+_SHARED_CACHE_LOCK = threading.Lock()
+
+
+def _build_backend(kind):
+    max_entries = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "50000"))
+    if kind == "sqlite":
+        path = os.getenv("SHARED_CACHE_PATH", SHARED_CACHE_PATH)
+        if not os.path.isabs(path):
+            path = os.path.join(root, path)
+        return SQLiteBackend(path, max_entries)
+    if kind == "redis":
+        return RedisBackend(os.getenv("SHARED_CACHE_URL", "redis://localhost:6379/0"))
+    if kind == "memory":
+        return MemoryBackend(max_entries)
+    raise ValueError(f"Unknown SHARED_CACHE_BACKEND: {kind}")
+
+
+def get_shared_cache():
+    """
+    Get the process-wide shared cache configured from environment variables.
+
+    Returns None when SHARED_CACHE_BACKEND is "none" or the backend cannot
+    be opened (the request path then runs without it).
+    """
+    # pylint: disable=global-statement
+    global _SHARED_CACHE
+    if _SHARED_CACHE is not None:
+        return _SHARED_CACHE or None
+    with _SHARED_CACHE_LOCK:
+        if _SHARED_CACHE is None:
+            kind = os.getenv("SHARED_CACHE_BACKEND", "sqlite").strip().lower()
+            if kind == "none":
+                _SHARED_CACHE = False
+                return None
+            ttls = {
+                namespace: float(
+                    os.getenv(f"SHARED_CACHE_TTL_{namespace.upper()}", default)
+                )
+                for namespace, default in DEFAULT_TTLS.items()
+            }
+            try:
+                _SHARED_CACHE = SharedCache(_build_backend(kind), ttls)
+            except (ImportError, OSError, sqlite3.Error, ValueError) as e:
+                logger.warning("Shared cache disabled: %s", e)
+                _SHARED_CACHE = False
+                return None
+            logger.info("Shared cache ready (backend=%s, ttls=%s)", kind, ttls)
+    return _SHARED_CACHE or None
@@ -0,0 +1,201 @@
+"""
+Per-stage bulkheads (admission control) for asyncio code.
+
+Each pipeline stage (embedding, vector query, LLM) gets a concurrency cap and
+a bounded FIFO queue. When the queue is full a request is rejected at once
+(HTTP 429), and a request that waits longer than the queue timeout gives up
+(HTTP 503); both carry a Retry-After estimate. Under overload the worker
+therefore sheds load early instead of letting every request slow down to a
+timeout together.
+"""
+
+import asyncio
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger
+from src.observability.metrics import percentile
+
+logger = get_logger(__name__)
+
+# (concurrency, queue depth, queue timeout in seconds)
+DEFAULT_LIMITS = {
+    "embedding": (16, 64, 5.0),
+    "vector_query": (16, 64, 5.0),
+    "llm": (8, 64, 30.0),
+}
+
+
+class BulkheadFullError(Exception):
+    """A stage rejected the request; maps to 429 (queue full) or 503 (waited too long)."""
+
+    def __init__(self, stage, status_code, retry_after, message):
+        super().__init__(message)
+        self.stage = stage
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Bulkhead:
+    """Concurrency cap plus bounded FIFO queue for one stage."""
+
+    def __init__(self, name, max_concurrent=16, max_queue=64, queue_timeout=5.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self._service_seconds = None  # moving average of slot hold time
+        self._waits = deque(maxlen=1000)
+        self._stats = {
+            "admitted": 0,
+            "rejected_full": 0,
+            "rejected_timeout": 0,
+            "queue_wait_seconds": 0.0,
+        }
+
+    def retry_after(self):
+        """Seconds until a slot is likely free, for the Retry-After header."""
+        service = self._service_seconds or 1.0
+        return max(
+            1, math.ceil(service * (len(self._waiters) + 1) / self.max_concurrent)
+        )
+
+    def _reject(self, status_code, reason):
+        key = "rejected_full" if status_code == 429 else "rejected_timeout"
+        with self._lock:
+            self._stats[key] += 1
+        logger.warning(
+            "Bulkhead %s rejected a request (%s): %d active, %d queued",
+            self.name,
+            reason,
+            self._active,
+            len(self._waiters),
+        )
+        return BulkheadFullError(
+            self.name, status_code, self.retry_after(), f"{self.name} {reason}"
+        )
+
+    def _record_wait(self, seconds):
+        with self._lock:
+            self._stats["admitted"] += 1
+            self._stats["queue_wait_seconds"] += seconds
+            self._waits.append(seconds)
+
+    async def acquire(self, timeout=None):
+        """
+        Take a slot, waiting in the queue if needed.
+
+        Args:
+            timeout (float): Maximum queue wait (default: queue_timeout)
+
+        Returns:
+            float: Seconds spent in the queue
+
+        Raises:
+            BulkheadFullError: 429 when the queue is full, 503 when the wait times out
+        """
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            self._record_wait(0.0)
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(429, "queue full")
+
+        start_time = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        timeout = self.queue_timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(waiter, timeout=max(timeout, 0))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject(503, "queue wait timed out") from None
+            raise
+        waited = time.perf_counter() - start_time
+        self._record_wait(waited)
+        return waited
+
+    def release(self):
+        """Free a slot, handing it straight to the oldest live waiter."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, timeout=None):
+        """Hold a slot for the duration of the block."""
+        await self.acquire(timeout)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            held = time.perf_counter() - start_time
+            self._service_seconds = (
+                held
+                if self._service_seconds is None
+                else 0.9 * self._service_seconds + 0.1 * held
+            )
+            self.release()
+
+    def stats(self):
+        """Return active/queued counts, rejections and queue wait percentiles."""
+        with self._lock:
+            stats = dict(self._stats)
+            waits = list(self._waits)
+        stats["active"] = self._active
+        stats["queued"] = len(self._waiters)
+        stats["queue_wait_p50"] = percentile(waits, 50)
+        stats["queue_wait_p99"] = percentile(waits, 99)
+        return stats
+
+
+_BULKHEADS = {}
+_BULKHEADS_LOCK = threading.Lock()
+
+
+def get_bulkhead(stage):
+    """
+    Get the process-wide bulkhead of a stage.
+
+    Limits come from BULKHEAD_<STAGE>_CONCURRENCY, BULKHEAD_<STAGE>_QUEUE and
+    BULKHEAD_<STAGE>_QUEUE_TIMEOUT (e.g. BULKHEAD_VECTOR_QUERY_QUEUE).
+    """
+    with _BULKHEADS_LOCK:
+        if stage not in _BULKHEADS:
+            concurrency, queue, queue_timeout = DEFAULT_LIMITS.get(
+                stage, DEFAULT_LIMITS["embedding"]
+            )
+            prefix = f"BULKHEAD_{stage.upper()}"
+            _BULKHEADS[stage] = Bulkhead(
+                stage,
+                max_concurrent=int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+                max_queue=int(os.getenv(f"{prefix}_QUEUE", queue)),
+                queue_timeout=float(
+                    os.getenv(f"{prefix}_QUEUE_TIMEOUT", queue_timeout)
+                ),
+            )
+            logger.info(
+                "Bulkhead %s ready (concurrency=%d, queue=%d)",
+                stage,
+                _BULKHEADS[stage].max_concurrent,
+                _BULKHEADS[stage].max_queue,
+            )
+        return _BULKHEADS[stage]
@@ -0,0 +1,133 @@
+"""
+Circuit breaker for flaky upstream services (the embedding API).
+
+After ``failure_threshold`` consecutive failures the breaker opens and calls
+fail fast with CircuitOpenError, so callers go straight to their fallback
+(embedding cache, BM25) instead of waiting on timeouts. After
+``reset_timeout`` seconds one probe call is let through (half-open): success
+closes the breaker, failure opens it again.
+"""
+
+import os
+import sys
+import threading
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """The breaker is open; ``retry_after`` is the time until the next probe."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit {name} is open")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe."""
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"opens": 0, "short_circuited": 0, "failures": 0}
+
+    def retry_after(self):
+        """Seconds until the next probe is allowed."""
+        return max(1, int(self._opened_at + self.reset_timeout - time.monotonic()) + 1)
+
+    def before_call(self):
+        """
+        Admit a call or fail fast.
+
+        Raises:
+            CircuitOpenError: When the breaker is open (or a probe is already running)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and now - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            # A probe whose caller gave up without reporting must not block forever
+            probe_lost = now - self._probe_started_at >= self.reset_timeout
+            if self.state == HALF_OPEN and (not self._probe_in_flight or probe_lost):
+                self._probe_in_flight = True
+                self._probe_started_at = now
+                logger.info("Circuit %s half-open, sending a probe", self.name)
+                return
+            self._stats["short_circuited"] += 1
+        raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self):
+        """Close the breaker after a successful call."""
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("Circuit %s closed", self.name)
+            self.state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """Count a failed call, opening the breaker at the threshold."""
+        with self._lock:
+            self._failures += 1
+            self._stats["failures"] += 1
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self._failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+                self._stats["opens"] += 1
+                logger.warning(
+                    "Circuit %s opened after %d consecutive failures",
+                    self.name,
+                    self._failures,
+                )
+
+    def stats(self):
+        """Return state, consecutive failures, opens and short-circuited calls."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["state"] = self.state
+            stats["consecutive_failures"] = self._failures
+        return stats
+
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_circuit_breaker(name):
+    """
+    Get the process-wide breaker for an upstream.
+
+    Configured with CIRCUIT_<NAME>_FAILURES and CIRCUIT_<NAME>_RESET_SECONDS.
+    """
+    with _BREAKERS_LOCK:
+        if name not in _BREAKERS:
+            prefix = f"CIRCUIT_{name.upper()}"
+            _BREAKERS[name] = CircuitBreaker(
+                name,
+                failure_threshold=int(os.getenv(f"{prefix}_FAILURES", "5")),
+                reset_timeout=float(os.getenv(f"{prefix}_RESET_SECONDS", "30")),
+            )
+        return _BREAKERS[name]
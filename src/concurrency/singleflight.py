@@ -0,0 +1,102 @@
+"""
+Single-flight request coalescing for asyncio code.
+
+Concurrent calls with the same key share one in-progress task instead of
+starting duplicate upstream work (embedding API, Chroma query, Gemini call).
+Each caller awaits the shared task through ``asyncio.shield``, so one caller
+giving up does not cancel the work for the others; the task is cancelled only
+when every caller waiting on it has gone away.
+
+Results are shared between callers and must be treated as read-only.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key."""
+
+    def __init__(self, name, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self._calls = {}  # key -> [task, number of waiting callers]
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "leaders": 0, "coalesced": 0, "cancelled": 0}
+
+    async def do(self, key, coro_fn, *args, **kwargs):
+        """
+        Run ``coro_fn(*args, **kwargs)`` once for all concurrent callers of ``key``.
+
+        Args:
+            key (hashable): Identity of the request
+            coro_fn (callable): Coroutine function doing the actual work
+
+        Returns:
+            Any: Result of the shared call (exceptions are shared too)
+        """
+        if not self.enabled:
+            return await coro_fn(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._stats["calls"] += 1
+            entry = self._calls.get(key)
+            if entry is None or entry[0].get_loop() is not loop:
+                task = loop.create_task(coro_fn(*args, **kwargs))
+                entry = [task, 0]
+                self._calls[key] = entry
+                task.add_done_callback(lambda t: self._forget(key, t))
+                self._stats["leaders"] += 1
+            else:
+                self._stats["coalesced"] += 1
+            entry[1] += 1
+        task = entry[0]
+        try:
+            return await asyncio.shield(task)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                abandoned = entry[1] == 0 and not task.done()
+                if abandoned:
+                    self._stats["cancelled"] += 1
+            if abandoned:
+                task.cancel()
+
+    def _forget(self, key, task):
+        with self._lock:
+            entry = self._calls.get(key)
+            if entry is not None and entry[0] is task:
+                del self._calls[key]
+
+    def stats(self):
+        """Return call, leader, coalesced and cancelled counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+_FLIGHTS = {}
+_FLIGHTS_LOCK = threading.Lock()
+
+
+def get_single_flight(name):
+    """
+    Get the process-wide single-flight group of a stage.
+
+    SINGLE_FLIGHT=false disables coalescing for every stage.
+    """
+    with _FLIGHTS_LOCK:
+        if name not in _FLIGHTS:
+            _FLIGHTS[name] = SingleFlight(
+                name, enabled=os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+            )
+        return _FLIGHTS[name]
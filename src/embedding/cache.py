@@ -0,0 +1,303 @@
+"""
+Two-tier cache for query embeddings.
+
+Tier 1 is an in-process LRU (bounded size + TTL), tier 2 is a SQLite file on
+disk so embeddings survive restarts. When the shared result cache is enabled
+(src/cache/shared.py), tier 2 is its "embedding" namespace instead, so every
+worker process reuses vectors computed by the others. Keys are built from the normalized
+question text (Unicode NFC, collapsed whitespace, casefold) and the embedding
+endpoint, so switching model never serves stale vectors.
+"""
+
+import asyncio
+import base64
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+load_dotenv()
+from configs.logger import get_logger
+from src.cache.shared import get_shared_cache
+
+logger = get_logger(__name__)
+
+EMBEDDING_CACHE_PATH = os.path.join(root, "data/cache/embeddings.sqlite3")
+
+
+def normalize_query(text):
+    """
+    Normalize a question so trivially different spellings share a cache key.
+
+    Args:
+        text (str): Raw question text
+
+    Returns:
+        str: NFC-normalized, whitespace-collapsed, casefolded text
+    """
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.split()).casefold()
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class EmbeddingCache:
+    """In-process LRU in front of a persistent SQLite store."""
+
+    def __init__(
+        self,
+        max_size=1000,
+        ttl_seconds=3600,
+        db_path=EMBEDDING_CACHE_PATH,
+        disk_ttl_seconds=30 * 24 * 3600,
+        namespace="",
+        shared=None,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.disk_ttl_seconds = disk_ttl_seconds
+        self.namespace = namespace
+        self._memory = OrderedDict()
+        # Guards the memory tier only; disk I/O happens outside it so memory
+        # hits never wait for a disk round-trip
+        self._lock = threading.Lock()
+        # The private SQLite connection is shared by the worker threads
+        self._db_lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._db = None
+        # Shared cache replacing the private SQLite tier
+        self.shared = shared
+        if db_path and shared is None:
+            self._db = self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        try:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            db = sqlite3.connect(db_path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            db.commit()
+            return db
+        except sqlite3.Error as e:
+            logger.warning("Disk embedding cache disabled: %s", e)
+            return None
+
+    def make_key(self, text):
+        """Build the cache key for a question."""
+        raw = f"{self.namespace}\x00{normalize_query(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text):
+        """
+        Look up an embedding, checking memory first and then disk.
+
+        Args:
+            text (str): Question text
+
+        Returns:
+            list | None: Cached embedding or None on miss
+        """
+        key = self.make_key(text)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                vector, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return vector
+                del self._memory[key]
+
+        vector = self._disk_get(key, now)
+        with self._lock:
+            if vector is not None:
+                self._stats["disk_hits"] += 1
+                self._memory_set(key, vector, now)
+                return vector
+            self._stats["misses"] += 1
+            return None
+
+    def peek(self, text):
+        """Return an embedding from the memory tier without touching disk or stats."""
+        key = self.make_key(text)
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is None or time.time() - entry[1] > self.ttl_seconds:
+            return None
+        return entry[0]
+
+    def set(self, text, vector):
+        """Store an embedding in both tiers."""
+        key = self.make_key(text)
+        now = time.time()
+        vector = [float(x) for x in vector]
+        with self._lock:
+            self._memory_set(key, vector, now)
+        self._disk_set(key, vector, now)
+
+    def get_or_compute(self, text, compute_fn):
+        """
+        Return a cached embedding or compute and store it.
+
+        Args:
+            text (str): Question text
+            compute_fn (callable): Called with ``text`` on a miss
+
+        Returns:
+            list: Embedding vector
+        """
+        vector = self.get(text)
+        if vector is not None:
+            return vector
+        vector = compute_fn(text)
+        if vector:
+            self.set(text, vector)
+        return vector
+
+    async def aget_or_compute(self, text, acompute_fn):
+        """
+        Async variant of get_or_compute; disk access runs in a worker thread.
+
+        Args:
+            text (str): Question text
+            acompute_fn (callable): Coroutine function called with ``text`` on a miss
+
+        Returns:
+            list: Embedding vector
+        """
+        vector = await asyncio.to_thread(self.get, text)
+        if vector is not None:
+            return vector
+        vector = await acompute_fn(text)
+        if vector:
+            await asyncio.to_thread(self.set, text, vector)
+        return vector
+
+    def stats(self):
+        """Return hit/miss counters and tier sizes."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_size"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        )
+        return stats
+
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def _memory_set(self, key, vector, now):
+        self._memory[key] = (vector, now)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _disk_get(self, key, now):
+        if self.shared is not None:
+            data = self.shared.get("embedding", [key])
+            return array("f", base64.b64decode(data)).tolist() if data else None
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Disk embedding cache read failed: %s", e)
+            return None
+        if row is None:
+            return None
+        if now - row[1] > self.disk_ttl_seconds:
+            return None
+        return array("f", row[0]).tolist()
+
+    def _disk_set(self, key, vector, now):
+        if self.shared is not None:
+            # float32 bytes as base64: a third of the size of a JSON float list
+            data = base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+            self.shared.set("embedding", [key], data, ttl=self.disk_ttl_seconds)
+            return
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, created_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, array("f", vector).tobytes(), now),
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning("Disk embedding cache write failed: %s", e)
+
+
+_EMBEDDING_CACHE = None
+_EMBEDDING_CACHE_LOCK = threading.Lock()
+
+
+def get_embedding_cache(namespace=""):
+    """
+    Get the process-wide embedding cache configured from environment variables.
+
+    Returns None when ``ENABLE_EMBEDDING_CACHE`` is false.
+    """
+    # pylint: disable=global-statement
+    global _EMBEDDING_CACHE
+    if not _env_bool("ENABLE_EMBEDDING_CACHE", True):
+        return None
+    with _EMBEDDING_CACHE_LOCK:
+        if _EMBEDDING_CACHE is None:
+            db_path = os.getenv("EMBEDDING_CACHE_PATH", EMBEDDING_CACHE_PATH)
+            shared = None
+            if not _env_bool("EMBEDDING_CACHE_DISK", True):
+                db_path = None
+            else:
+                shared = get_shared_cache()
+                if shared is not None:
+                    db_path = None
+                elif not os.path.isabs(db_path):
+                    db_path = os.path.join(root, db_path)
+            _EMBEDDING_CACHE = EmbeddingCache(
+                max_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "1000")),
+                ttl_seconds=float(os.getenv("EMBEDDING_CACHE_TTL", "3600")),
+                db_path=db_path,
+                disk_ttl_seconds=float(
+                    os.getenv("EMBEDDING_CACHE_DISK_TTL", str(30 * 24 * 3600))
+                ),
+                namespace=namespace,
+                shared=shared,
+            )
+            logger.info(
+                "Embedding cache ready (size=%d, ttl=%.0fs, disk=%s)",
+                _EMBEDDING_CACHE.max_size,
+                _EMBEDDING_CACHE.ttl_seconds,
+                "shared cache" if shared is not None else db_path,
+            )
+        return _EMBEDDING_CACHE
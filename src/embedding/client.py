@@ -0,0 +1,385 @@
+"""
+Long-lived, micro-batching client for the bge-m3 Gradio embedding space.
+
+Queries that arrive within a short window (``max_wait_ms``) or until
+``max_batch_size`` items are collected are sent together, and each caller
+gets its own vector back through a future. The underlying
+``gradio_client.Client`` is created once and reused, so the handshake and
+schema fetch are paid only on the first call (or after a failure).
+
+How a batch reaches the upstream depends on ``batch_mode``:
+
+- "concurrent" (default): one job per distinct text, submitted concurrently
+  on the shared connection. The public bge-m3 space only exposes the
+  single-text ``/predict`` endpoint, so this saves the per-call handshake and
+  deduplicates texts, but not the per-text upstream calls.
+- "endpoint": the whole batch in one call to ``batch_api_name``, for spaces
+  that expose an endpoint taking a list of texts.
+
+Up to ``max_concurrent_batches`` batches are in flight at once, which lets
+``embed_hedged``/``aembed_hedged`` send a duplicate request when the first
+one is slower than the recent p95 latency; the first answer wins.
+"""
+
+import asyncio
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+load_dotenv()
+from configs.logger import get_logger
+from src.observability.metrics import percentile
+
+logger = get_logger(__name__)
+
+DEFAULT_EMBEDDING_API_ENDPOINT = "hieuailearning/BAAI_bge_m3_api"
+
+
+class EmbeddingClient:
+    """Thread-safe embedding client that merges concurrent queries."""
+
+    def __init__(
+        self,
+        endpoint=DEFAULT_EMBEDDING_API_ENDPOINT,
+        max_batch_size=16,
+        max_wait_ms=10,
+        timeout=30,
+        api_name="/predict",
+        batch_mode="concurrent",
+        batch_api_name="/predict_batch",
+        max_concurrent_batches=4,
+        hedge_percentile=95,
+        hedge_min_delay_ms=50,
+        hedge_default_delay_ms=1000,
+    ):
+        self.endpoint = endpoint
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms / 1000)
+        self.timeout = timeout
+        self.api_name = api_name
+        if batch_mode not in ("concurrent", "endpoint"):
+            raise ValueError(f"Unknown embedding batch mode: {batch_mode}")
+        self.batch_mode = batch_mode
+        self.batch_api_name = batch_api_name
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._closed = False
+        self._dispatcher = ThreadPoolExecutor(
+            max_workers=max(1, max_concurrent_batches),
+            thread_name_prefix="embedding-dispatch",
+        )
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay_ms / 1000
+        self.hedge_default_delay = hedge_default_delay_ms / 1000
+        # Updated from the dispatcher pool, the batcher thread and callers
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=500)
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "batched_items": 0,
+            "upstream_calls": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+        }
+
+    def _get_client(self):
+        with self._client_lock:
+            if self._client is None:
+                # pylint: disable=import-outside-toplevel
+                from gradio_client import Client
+
+                start_time = time.time()
+                self._client = Client(self.endpoint, verbose=False)
+                logger.info(
+                    "Embedding client connected to %s in %.2fs (batch mode: %s)",
+                    self.endpoint,
+                    time.time() - start_time,
+                    (
+                        f"one call to {self.batch_api_name}"
+                        if self.batch_mode == "endpoint"
+                        else f"concurrent {self.api_name} calls"
+                    ),
+                )
+            return self._client
+
+    def connect(self):
+        """Open the upstream connection now instead of on the first request."""
+        self._get_client()
+
+    def reset(self):
+        """Drop the underlying connection so the next call reconnects."""
+        with self._client_lock:
+            self._client = None
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, text):
+        """
+        Queue a text for embedding.
+
+        Args:
+            text (str): Input text to embed
+
+        Returns:
+            concurrent.futures.Future: Resolves to the embedding vector
+        """
+        if self._closed:
+            raise RuntimeError("Embedding client is closed")
+        future = Future()
+        self._queue.put((text, future))
+        self._ensure_worker()
+        return future
+
+    def embed(self, text, timeout=None):
+        """Embed a single text, blocking until its batch has been answered."""
+        return self.submit(text).result(timeout=timeout or self.timeout)
+
+    async def aembed(self, text, timeout=None):
+        """Embed a single text without blocking the event loop."""
+        return await asyncio.wait_for(
+            asyncio.wrap_future(self.submit(text)), timeout=timeout or self.timeout
+        )
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging: the recent latency percentile."""
+        with self._stats_lock:
+            latencies = list(self._latencies)
+        if len(latencies) < 20:
+            return self.hedge_default_delay
+        return max(
+            self.hedge_min_delay,
+            percentile(latencies, self.hedge_percentile),
+        )
+
+    def _settle(self, futures):
+        """
+        Check the request and its hedge.
+
+        Returns:
+            tuple: (True, vector) once one succeeded, (False, None) while one is
+            still running; raises the last error when all failed
+        """
+        error = None
+        for future in futures:
+            if not future.done():
+                continue
+            if future.exception() is None:
+                if future is not futures[0]:
+                    self._count("hedge_wins")
+                return True, future.result()
+            error = future.exception()
+        if all(future.done() for future in futures):
+            raise error
+        return False, None
+
+    def embed_hedged(self, text, timeout=None):
+        """
+        Embed a text, sending a duplicate request if the first one is slow.
+
+        Args:
+            text (str): Input text to embed
+            timeout (float): Overall timeout in seconds
+
+        Returns:
+            list: Embedding vector from whichever request answered first
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        futures = [self.submit(text)]
+        try:
+            if not wait(futures, timeout=self.hedge_delay()).done:
+                futures.append(self.submit(text))
+                self._count("hedges")
+            while True:
+                settled, vector = self._settle(futures)
+                if settled:
+                    return vector
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Embedding request timed out")
+                wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def aembed_hedged(self, text, timeout=None):
+        """Async version of embed_hedged."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        futures = [self.submit(text)]
+        waiters = [asyncio.wrap_future(futures[0])]
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=self.hedge_delay())
+            if not done:
+                futures.append(self.submit(text))
+                waiters.append(asyncio.wrap_future(futures[1]))
+                self._count("hedges")
+            while True:
+                settled, vector = self._settle(futures)
+                if settled:
+                    return vector
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError("Embedding request timed out")
+                await asyncio.wait(
+                    [w for w in waiters if not w.done()],
+                    timeout=remaining,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+        finally:
+            for future in futures:
+                future.cancel()
+            # Errors are reported through _settle; mark the loser's as retrieved
+            for waiter in waiters:
+                waiter.add_done_callback(lambda w: w.cancelled() or w.exception())
+
+    def embed_many(self, texts, timeout=None):
+        """Embed several texts; they are batched together with other callers."""
+        futures = [self.submit(text) for text in texts]
+        return [f.result(timeout=timeout or self.timeout) for f in futures]
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        """Return request/batch/hedge counters."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["hedge_delay_ms"] = round(self.hedge_delay() * 1000, 1)
+        stats["avg_batch_size"] = (
+            stats["batched_items"] / stats["batches"] if stats["batches"] else 0.0
+        )
+        return stats
+
+    def close(self):
+        """Stop the batching thread after the queue drains."""
+        self._closed = True
+        self._queue.put(None)
+        self._dispatcher.shutdown(wait=False)
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [
+                (text, future)
+                for text, future in self._collect_batch(first)
+                if future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+            # Slow batches must not hold back the next ones (or their hedges)
+            self._dispatcher.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        with self._stats_lock:
+            self._stats["requests"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["batched_items"] += len(unique_texts)
+        start_time = time.monotonic()
+        try:
+            vectors = dict(zip(unique_texts, self._embed_batch(unique_texts)))
+        except Exception as e:  # pylint: disable=broad-except
+            self.reset()
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._stats_lock:
+            self._latencies.append(time.monotonic() - start_time)
+        for text, future in batch:
+            future.set_result(vectors[text])
+
+    def _embed_batch(self, texts):
+        """
+        Send one batch upstream.
+
+        In "endpoint" mode the whole list goes in a single predict call to
+        ``batch_api_name``; in "concurrent" mode the texts are submitted as
+        concurrent jobs on the shared client connection.
+        """
+        client = self._get_client()
+        start_time = time.time()
+        if self.batch_mode == "endpoint" and len(texts) > 1:
+            self._count("upstream_calls")
+            vectors = client.predict(texts, api_name=self.batch_api_name)
+        else:
+            self._count("upstream_calls", len(texts))
+            jobs = [
+                client.submit(text_input=text, api_name=self.api_name) for text in texts
+            ]
+            vectors = [job.result(timeout=self.timeout) for job in jobs]
+        if len(vectors) != len(texts):
+            raise ValueError(
+                f"Embedding API returned {len(vectors)} vectors for {len(texts)} texts"
+            )
+        logger.info(
+            "Embedded batch of %d texts in %.3fs", len(texts), time.time() - start_time
+        )
+        return vectors
+
+
+_EMBEDDING_CLIENT = None
+_EMBEDDING_CLIENT_LOCK = threading.Lock()
+
+
+def get_embedding_client():
+    """Get the process-wide embedding client configured from environment variables."""
+    # pylint: disable=global-statement
+    global _EMBEDDING_CLIENT
+    with _EMBEDDING_CLIENT_LOCK:
+        if _EMBEDDING_CLIENT is None:
+            _EMBEDDING_CLIENT = EmbeddingClient(
+                endpoint=os.getenv(
+                    "EMBEDDING_API_ENDPOINT", DEFAULT_EMBEDDING_API_ENDPOINT
+                ),
+                max_batch_size=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "16")),
+                max_wait_ms=float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "10")),
+                timeout=float(os.getenv("EMBEDDING_API_TIMEOUT", "30")),
+                batch_mode=os.getenv("EMBEDDING_BATCH_MODE", "concurrent").lower(),
+                batch_api_name=os.getenv("EMBEDDING_BATCH_ENDPOINT", "/predict_batch"),
+                max_concurrent_batches=int(
+                    os.getenv("EMBEDDING_MAX_CONCURRENT_BATCHES", "4")
+                ),
+                hedge_percentile=float(os.getenv("EMBEDDING_HEDGE_PERCENTILE", "95")),
+                hedge_min_delay_ms=float(
+                    os.getenv("EMBEDDING_HEDGE_MIN_DELAY_MS", "50")
+                ),
+            )
+        return _EMBEDDING_CLIENT
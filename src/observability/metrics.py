@@ -0,0 +1,333 @@
+"""
+Minimal Prometheus metrics (text exposition format 0.0.4).
+
+A small in-process registry of counters, gauges and histograms with labels,
+so the service can expose ``/metrics`` without adding a dependency. Updates
+are a dict lookup and a few additions under a lock, cheap enough to leave on
+in production. Component statistics that already exist (bulkheads, caches,
+circuit breaker, ...) are exported through collector callbacks evaluated at
+scrape time.
+"""
+
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from starlette.routing import Match
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)  # fmt: skip
+SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+)  # fmt: skip
+
+
+def percentile(values, q):
+    """
+    Percentile with linear interpolation (numpy's default), without numpy.
+
+    Args:
+        values (list): Samples
+        q (float): Percentile in [0, 100]
+
+    Returns:
+        float: The percentile, 0.0 when there are no samples
+    """
+    if len(values) < 2:
+        return float(values[0]) if values else 0.0
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low = math.floor(position)
+    high = min(low + 1, len(values) - 1)
+    return float(values[low] + (values[high] - values[low]) * (position - low))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def expose(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def expose(self):
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._values.items()]
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(float(total))}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Holds metrics and scrape-time collectors."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(
+            Histogram, name, documentation, labelnames, buckets=buckets
+        )
+
+    def register_collector(self, collector):
+        """
+        Add a scrape-time collector.
+
+        Args:
+            collector (callable): Returns an iterable of
+                (name, kind, documentation, labels dict, value)
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def expose(self):
+        """Render every metric in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        # Samples of one metric must be contiguous in the text format, while
+        # collectors yield them component by component
+        families = {}
+        for collector in collectors:
+            for name, kind, documentation, labels, value in collector():
+                if name not in families:
+                    families[name] = [
+                        f"# HELP {name} {documentation}",
+                        f"# TYPE {name} {kind}",
+                    ]
+                labels = labels or {}
+                families[name].append(
+                    f"{name}{_format_labels(labels.keys(), labels.values())} "
+                    f"{_format_value(value)}"
+                )
+        for family in families.values():
+            lines.extend(family)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total",
+    "HTTP requests by endpoint and status",
+    ("endpoint", "status"),
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("endpoint",)
+)
+HTTP_RESPONSE_SIZE = REGISTRY.histogram(
+    "http_response_size_bytes",
+    "HTTP response body size",
+    ("endpoint",),
+    buckets=SIZE_BUCKETS,
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "HTTP requests being served", ("endpoint",)
+)
+ERRORS = REGISTRY.counter(
+    "errors_total", "Errors by endpoint and type", ("endpoint", "type")
+)
+STAGE_LATENCY = REGISTRY.histogram(
+    "stage_duration_seconds", "Pipeline stage latency", ("stage",)
+)
+STAGE_IN_FLIGHT = REGISTRY.gauge(
+    "stage_in_flight", "Pipeline stage calls in progress", ("stage",)
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "stage_errors_total", "Pipeline stage errors by type", ("stage", "type")
+)
+
+
+@contextmanager
+def observe_stage(stage):
+    """
+    Time a pipeline stage (embed, vector_query, prompt_build, llm, format, ...).
+
+    Usable around sync and async code; exceptions are counted by type and re-raised.
+    """
+    start_time = time.perf_counter()
+    STAGE_IN_FLIGHT.inc(stage=stage)
+    try:
+        yield
+    except GeneratorExit:
+        # A streaming consumer stopped early; not an error of the stage
+        raise
+    except BaseException as e:
+        STAGE_ERRORS.inc(stage=stage, type=type(e).__name__)
+        raise
+    finally:
+        STAGE_IN_FLIGHT.dec(stage=stage)
+        STAGE_LATENCY.observe(time.perf_counter() - start_time, stage=stage)
+
+
+def mark_error(request, error_type):
+    """Label the error of a request answered by an exception handler."""
+    request.state.error_type = error_type
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request count, latency, response size, in-flight
+    and errors per route.
+
+    Written as plain ASGI (not BaseHTTPMiddleware) so streaming responses pass
+    through untouched; the latency of a stream covers the whole stream.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def _route_path(scope):
+        # Label by route template ("/retrieve/batch"), never the raw path, so
+        # metrics keep a bounded cardinality
+        for route in getattr(scope.get("app"), "routes", []):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "unmatched")
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start_time = time.perf_counter()
+        endpoint = self._route_path(scope)
+        status = {"code": 500}
+        size = {"bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                size["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(endpoint=endpoint)
+        error_type = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            error_type = type(e).__name__
+            raise
+        finally:
+            HTTP_IN_FLIGHT.dec(endpoint=endpoint)
+            HTTP_REQUESTS.inc(endpoint=endpoint, status=status["code"])
+            HTTP_LATENCY.observe(time.perf_counter() - start_time, endpoint=endpoint)
+            HTTP_RESPONSE_SIZE.observe(size["bytes"], endpoint=endpoint)
+            error_type = error_type or scope.get("state", {}).get("error_type")
+            if error_type is None and status["code"] >= 500:
+                error_type = "internal_error"
+            if error_type is not None:
+                ERRORS.inc(endpoint=endpoint, type=error_type)
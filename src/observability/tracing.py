@@ -0,0 +1,216 @@
+"""
+Trace spans for request steps and outbound calls.
+
+Built on the OpenTelemetry SDK (installed with chromadb). Spans use a tracer
+provider of our own, so the global provider (which chromadb may configure
+for its own telemetry) is left alone. The current span lives in a
+contextvar, so it follows ``asyncio`` tasks, ``asyncio.wait_for`` and
+``asyncio.to_thread`` without extra code.
+
+Configuration:
+
+- ENABLE_TRACING: "true" to record spans (default: false)
+- TRACE_SAMPLE_RATIO: fraction of traces kept, decided once per root span
+- TRACE_EXPORTER: "file" (JSON lines in TRACE_FILE), "otlp" (gRPC to
+  OTEL_EXPORTER_OTLP_ENDPOINT, e.g. a local collector) or "console"
+
+When tracing is off, or OpenTelemetry is missing, ``start_span`` returns a
+no-op span and costs about as much as an empty ``with`` block, and
+OpenTelemetry is never imported.
+"""
+
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger
+
+logger = get_logger(__name__)
+
+TRACE_FILE = "logs/traces.jsonl"
+SERVICE_NAME = "ai-legal-assistant"
+
+
+class _NoopSpan:
+    """Stand-in span used when a request is not traced."""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def is_recording(self):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class JsonFileSpanExporter:
+    """
+    Append finished spans to a file, one JSON object per line.
+
+    Implements the SpanExporter interface without subclassing it, so that
+    OpenTelemetry is only imported when tracing is enabled.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def export(self, spans):
+        # pylint: disable=import-outside-toplevel
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        lines = []
+        for span in spans:
+            context = span.get_span_context()
+            lines.append(
+                json.dumps(
+                    {
+                        "trace_id": f"{context.trace_id:032x}",
+                        "span_id": f"{context.span_id:016x}",
+                        "parent_id": (
+                            f"{span.parent.span_id:016x}" if span.parent else None
+                        ),
+                        "name": span.name,
+                        "start_ns": span.start_time,
+                        "duration_ms": round(
+                            (span.end_time - span.start_time) / 1e6, 3
+                        ),
+                        "status": span.status.status_code.name,
+                        "attributes": dict(span.attributes or {}),
+                        "events": [
+                            {"name": e.name, "attributes": dict(e.attributes or {})}
+                            for e in span.events
+                        ],
+                    },
+                    ensure_ascii=False,
+                    default=str,
+                )
+            )
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.warning("Could not write spans to %s: %s", self.path, e)
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis=30000):  # pylint: disable=unused-argument
+        return True
+
+
+def _build_exporter(kind):
+    # pylint: disable=import-outside-toplevel
+    if kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        return OTLPSpanExporter()
+    if kind == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        return ConsoleSpanExporter()
+    path = os.getenv("TRACE_FILE", TRACE_FILE)
+    if not os.path.isabs(path):
+        path = os.path.join(root, path)
+    return JsonFileSpanExporter(path)
+
+
+_TRACER = None
+_TRACER_LOCK = threading.Lock()
+
+
+def get_tracer():
+    """
+    Get the process-wide tracer configured from the environment.
+
+    Returns:
+        Tracer or None: None when tracing is disabled or unavailable
+    """
+    # pylint: disable=global-statement
+    global _TRACER
+    if _TRACER is not None:
+        return _TRACER or None
+    with _TRACER_LOCK:
+        if _TRACER is None:
+            if os.getenv("ENABLE_TRACING", "false").lower() != "true":
+                _TRACER = False
+                return None
+            try:
+                # pylint: disable=import-outside-toplevel
+                from opentelemetry.sdk.resources import Resource
+                from opentelemetry.sdk.trace import TracerProvider
+                from opentelemetry.sdk.trace.export import BatchSpanProcessor
+                from opentelemetry.sdk.trace.sampling import (
+                    ParentBased,
+                    TraceIdRatioBased,
+                )
+            except ImportError:
+                logger.warning("ENABLE_TRACING is set but OpenTelemetry is missing")
+                _TRACER = False
+                return None
+            ratio = float(os.getenv("TRACE_SAMPLE_RATIO", "0.1"))
+            kind = os.getenv("TRACE_EXPORTER", "file").lower()
+            provider = TracerProvider(
+                resource=Resource.create({"service.name": SERVICE_NAME}),
+                sampler=ParentBased(TraceIdRatioBased(ratio)),
+            )
+            # Spans are exported in batches from a background thread, so the
+            # request path only appends to an in-memory queue
+            provider.add_span_processor(BatchSpanProcessor(_build_exporter(kind)))
+            _TRACER = provider.get_tracer(__name__)
+            logger.info("Tracing enabled (exporter=%s, sample_ratio=%s)", kind, ratio)
+    return _TRACER or None
+
+
+@contextmanager
+def start_span(name, **attributes):
+    """
+    Run a block inside a child span of the current span.
+
+    Exceptions are recorded on the span and re-raised.
+
+    Args:
+        name (str): Span name, e.g. "agent.retrieve" or "chroma.query"
+        **attributes: Span attributes (str, bool, int, float or lists of them)
+
+    Yields:
+        Span: The span (a no-op span when tracing is off or not sampled)
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+    with tracer.start_as_current_span(name) as span:
+        if span.is_recording():
+            span.set_attributes({k: v for k, v in attributes.items() if v is not None})
+        yield span
+
+
+def current_trace_id():
+    """Return the hex trace id of the current sampled span, or None."""
+    if get_tracer() is None:
+        return None
+    # pylint: disable=import-outside-toplevel
+    from opentelemetry import trace
+
+    context = trace.get_current_span().get_span_context()
+    if not context.is_valid or not context.trace_flags.sampled:
+        return None
+    return f"{context.trace_id:032x}"
@@ -0,0 +1,139 @@
+"""
+BM25 lexical index over chunk documents.
+
+The index is built offline into memory-mapped files (see bm25_index.py, which
+holds the numpy code and is imported on first use) so startup costs almost
+nothing. It serves three purposes:
+
+- a fast lexical-only retrieval mode,
+- a hybrid mode fused with vector results by reciprocal-rank fusion,
+- the fallback when the embedding API is slow or down.
+
+Vietnamese is tokenized into syllables (words are space separated syllables)
+plus syllable bigrams for compounds such as "hàng hải". Query syllables typed
+without diacritics are expanded to the accented forms present in the index.
+"""
+
+import argparse
+import os
+import re
+import sys
+import threading
+import unicodedata
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger, setup_logging
+from src.retrieval.records import LOCAL_SNAPSHOT_PATH, load_chunk_records
+
+logger = get_logger(__name__)
+
+BM25_INDEX_PATH = os.path.join(root, "data/processed/bm25_index")
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = {
+    "và", "của", "là", "có", "được", "các", "những", "cho", "với", "trong",
+    "theo", "này", "khi", "thì", "để", "một", "gì", "nào", "không", "về",
+}  # fmt: skip
+
+
+def tokenize(text):
+    """
+    Split text into lowercase syllables and syllable bigrams.
+
+    Args:
+        text (str): Input text
+
+    Returns:
+        list: Tokens (bigrams are joined with "_")
+    """
+    text = unicodedata.normalize("NFC", str(text or "")).casefold()
+    syllables = [t for t in _TOKEN_RE.findall(text) if t not in _STOPWORDS]
+    bigrams = [f"{a}_{b}" for a, b in zip(syllables, syllables[1:])]
+    return syllables + bigrams
+
+
+def reciprocal_rank_fusion(vector_results, lexical_results, n_results=5, k=RRF_K):
+    """
+    Fuse single-query vector and BM25 result dicts by reciprocal rank.
+
+    Args:
+        vector_results (dict): collection.query-shaped dict (first query only)
+        lexical_results (dict): BM25Index.query dict (first query only)
+        n_results (int): Number of fused results
+        k (int): RRF constant
+
+    Returns:
+        dict: Fused results in RRF order. Distances are the chunks' vector
+        distances (1.0, i.e. similarity 0, for lexical-only hits) and the
+        RRF values are in ``fused_scores``
+    """
+    fused = {}
+    fields = {}
+    distances = {}
+    for results in (vector_results, lexical_results):
+        for rank, chunk_id in enumerate(results["ids"][0]):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+            if chunk_id not in fields:
+                fields[chunk_id] = (
+                    results["metadatas"][0][rank] if results["metadatas"] else None,
+                    results["documents"][0][rank] if results["documents"] else None,
+                )
+    if vector_results["distances"]:
+        distances = dict(zip(vector_results["ids"][0], vector_results["distances"][0]))
+    ranked = sorted(fused, key=fused.get, reverse=True)[:n_results]
+    return {
+        "ids": [ranked],
+        "distances": [[distances.get(c, 1.0) for c in ranked]],
+        "metadatas": [[fields[c][0] for c in ranked]],
+        "documents": [[fields[c][1] for c in ranked]],
+        "embeddings": None,
+        "fused_scores": [[fused[c] for c in ranked]],
+    }
+
+
+_BM25_INDEX = None
+_BM25_INDEX_LOADED = False
+_BM25_INDEX_LOCK = threading.Lock()
+
+
+def get_bm25_index():
+    """Get the process-wide BM25 index, or None when it has not been built."""
+    # pylint: disable=global-statement
+    global _BM25_INDEX, _BM25_INDEX_LOADED
+    if _BM25_INDEX_LOADED:
+        return _BM25_INDEX
+    with _BM25_INDEX_LOCK:
+        if not _BM25_INDEX_LOADED:
+            path = os.getenv("BM25_INDEX_PATH", BM25_INDEX_PATH)
+            if not os.path.isabs(path):
+                path = os.path.join(root, path)
+            if os.path.exists(os.path.join(path, "records.jsonl")):
+                # pylint: disable=import-outside-toplevel
+                from src.retrieval.bm25_index import BM25Index
+
+                _BM25_INDEX = BM25Index.load(path)
+            else:
+                logger.info("BM25 index not found at %s, lexical search disabled", path)
+            _BM25_INDEX_LOADED = True
+    return _BM25_INDEX
+
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Build the BM25 lexical index")
+    parser.add_argument("--source", choices=["local", "chroma"], default="chroma")
+    parser.add_argument("--snapshot", default=LOCAL_SNAPSHOT_PATH)
+    parser.add_argument("--output", default=BM25_INDEX_PATH)
+    args = parser.parse_args()
+
+    # pylint: disable=import-outside-toplevel
+    from src.retrieval.bm25_index import build_bm25_index
+
+    all_ids, all_documents, all_metadatas = load_chunk_records(
+        args.source, args.snapshot
+    )
+    print(build_bm25_index(all_ids, all_documents, all_metadatas, args.output))
@@ -0,0 +1,267 @@
+"""
+On-disk BM25 index: offline build and memory-mapped scoring.
+
+Postings (doc ids and term frequencies), document lengths and term stats are
+flat NumPy arrays; terms (sorted) and records (JSON lines) are blobs with an
+offsets array. Everything is opened with mmap, and a record is decoded only
+when it is returned. The module needs numpy, so the app imports it on first
+use through ``src.retrieval.bm25.get_bm25_index``.
+"""
+
+import bisect
+import json
+import mmap
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger
+from src.retrieval.bm25 import BM25_B, BM25_INDEX_PATH, BM25_K1, tokenize
+from src.retrieval.citation import fold_text
+
+logger = get_logger(__name__)
+
+
+class _MappedBlob:
+    """Random access to the items of a blob file through mmap and an offsets array."""
+
+    def __init__(self, path, offsets):
+        self._data = b""
+        if os.path.getsize(path):
+            with open(path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return self._data[int(self._offsets[i]) : int(self._offsets[i + 1])]
+
+
+def _write_blob(path, items):
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    with open(path, "wb") as f:
+        for i, item in enumerate(items):
+            f.write(item)
+            offsets[i + 1] = offsets[i] + len(item)
+    np.save(f"{path}.offsets.npy", offsets)
+
+
+def _load_blob(path):
+    return _MappedBlob(path, np.load(f"{path}.offsets.npy", mmap_mode="r"))
+
+
+def build_bm25_index(ids, documents, metadatas, path=BM25_INDEX_PATH):
+    """
+    Build the BM25 index and write it to ``path``.
+
+    Args:
+        ids (list): Chunk ids
+        documents (list): Chunk contents
+        metadatas (list): Chunk metadata dicts
+        path (str): Output directory
+
+    Returns:
+        dict: Build summary
+    """
+    start_time = time.time()
+    postings = {}
+    doc_lengths = np.empty(len(ids), dtype=np.float32)
+    for doc_id, document in enumerate(documents):
+        counts = Counter(tokenize(document))
+        doc_lengths[doc_id] = sum(counts.values())
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc_id, tf))
+
+    # Terms sorted by their UTF-8 bytes so lookups can bisect the mapped blob
+    terms = sorted(postings, key=lambda t: t.encode("utf-8"))
+    term_postings = np.empty((len(terms), 2), dtype=np.int64)  # offset, df
+    term_idfs = np.empty(len(terms), dtype=np.float32)
+    posting_docs = []
+    posting_tfs = []
+    offset = 0
+    n_docs = len(ids)
+    for term_id, term in enumerate(terms):
+        entries = postings[term]
+        df = len(entries)
+        term_postings[term_id] = (offset, df)
+        term_idfs[term_id] = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        posting_docs.extend(doc for doc, _ in entries)
+        posting_tfs.extend(tf for _, tf in entries)
+        offset += df
+
+    # Map diacritic-free syllables to the accented forms seen in the corpus
+    fold_map = {}
+    for term in terms:
+        if "_" not in term:
+            folded = fold_text(term)
+            if folded != term:
+                fold_map.setdefault(folded, []).append(term)
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "postings_docs.npy"), np.asarray(posting_docs, np.int32))
+    np.save(os.path.join(path, "postings_tfs.npy"), np.asarray(posting_tfs, np.float32))
+    np.save(os.path.join(path, "doc_lengths.npy"), doc_lengths)
+    np.save(os.path.join(path, "term_postings.npy"), term_postings)
+    np.save(os.path.join(path, "term_idfs.npy"), term_idfs)
+    _write_blob(
+        os.path.join(path, "terms.bin"), [term.encode("utf-8") for term in terms]
+    )
+    _write_blob(
+        os.path.join(path, "records.jsonl"),
+        [
+            (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+            for record in zip(ids, documents, metadatas)
+        ],
+    )
+    with open(os.path.join(path, "fold_map.json"), "w", encoding="utf-8") as f:
+        json.dump(fold_map, f, ensure_ascii=False)
+    summary = {
+        "documents": n_docs,
+        "terms": len(terms),
+        "postings": offset,
+        "build_seconds": round(time.time() - start_time, 3),
+    }
+    logger.info("BM25 index written to %s: %s", path, summary)
+    return summary
+
+
+class BM25Index:
+    """BM25 scorer over memory-mapped postings, vocabulary and records."""
+
+    def __init__(
+        self, terms, term_postings, term_idfs, fold_map, docs, tfs, doc_lengths, records
+    ):
+        self.terms = terms
+        self.term_postings = term_postings
+        self.term_idfs = term_idfs
+        self.fold_map = fold_map
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        self.records = records
+
+    @classmethod
+    def load(cls, path=BM25_INDEX_PATH):
+        start_time = time.time()
+        with open(os.path.join(path, "fold_map.json"), encoding="utf-8") as f:
+            fold_map = json.load(f)
+        index = cls(
+            _load_blob(os.path.join(path, "terms.bin")),
+            np.load(os.path.join(path, "term_postings.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "term_idfs.npy"), mmap_mode="r"),
+            fold_map,
+            np.load(os.path.join(path, "postings_docs.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "postings_tfs.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "doc_lengths.npy")),
+            _load_blob(os.path.join(path, "records.jsonl")),
+        )
+        logger.info(
+            "BM25 index loaded: %d docs, %d terms in %.3fs",
+            len(index.records),
+            len(index.terms),
+            time.time() - start_time,
+        )
+        return index
+
+    def count(self):
+        return len(self.records)
+
+    def record(self, doc_id):
+        """Decode one (id, document, metadata) record."""
+        return json.loads(self.records[doc_id])
+
+    def _term_id(self, term):
+        key = term.encode("utf-8")
+        term_id = bisect.bisect_left(self.terms, key)
+        if term_id < len(self.terms) and self.terms[term_id] == key:
+            return term_id
+        return None
+
+    def _query_terms(self, text):
+        """Group the indexed term ids of each query token (accented expansions)."""
+        groups = []
+        for token in tokenize(text):
+            term_id = self._term_id(token)
+            if term_id is not None:
+                groups.append([term_id])
+            elif "_" not in token:
+                expanded = [self._term_id(t) for t in self.fold_map.get(token, [])]
+                expanded = [t for t in expanded if t is not None]
+                if expanded:
+                    groups.append(expanded)
+        return groups
+
+    def _scores(self, groups):
+        scores = np.zeros(self.count(), dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths / self.avg_length)
+        for term_id in (t for group in groups for t in group):
+            offset, df = (int(v) for v in self.term_postings[term_id])
+            idf = float(self.term_idfs[term_id])
+            docs = np.asarray(self.docs[offset : offset + df])
+            tfs = np.asarray(self.tfs[offset : offset + df])
+            scores[docs] += idf * tfs * (BM25_K1 + 1) / (tfs + norm[docs])
+        return scores
+
+    def _max_score(self, groups):
+        # Each term contributes at most idf * (k1 + 1) as its frequency grows;
+        # an accent-free token counts once, for its rarest accented form
+        return sum(max(float(self.term_idfs[t]) for t in g) for g in groups) * (
+            BM25_K1 + 1
+        )
+
+    def scores(self, text):
+        """Return BM25 scores of every document for a query."""
+        return self._scores(self._query_terms(text))
+
+    def query(self, query_texts, n_results=5, include=None, **_):
+        """
+        Answer a text query in the collection.query result shape.
+
+        BM25 scores are not cosine similarities, so every distance is 1.0
+        (similarity 0) and callers never mistake a lexical hit for a confident
+        vector match. The relevance goes in ``lexical_scores`` as
+        ``score / max_score``, where ``max_score`` is the score a document
+        would reach by containing every query term many times.
+        """
+        if isinstance(query_texts, str):
+            query_texts = [query_texts]
+        include = include or ["metadatas", "documents", "distances"]
+        results = {
+            "ids": [],
+            "distances": [] if "distances" in include else None,
+            "metadatas": [] if "metadatas" in include else None,
+            "documents": [] if "documents" in include else None,
+            "embeddings": None,
+            "lexical_scores": [],
+        }
+        for text in query_texts:
+            groups = self._query_terms(text)
+            scores = self._scores(groups)
+            matched = np.flatnonzero(scores)
+            k = min(n_results, len(matched))
+            if k:
+                top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+                top = top[np.argsort(-scores[top])]
+            else:
+                top = np.empty(0, dtype=np.int64)
+            records = [self.record(i) for i in top]
+            results["ids"].append([r[0] for r in records])
+            if results["distances"] is not None:
+                results["distances"].append([1.0] * len(top))
+            max_score = self._max_score(groups) if k else 1.0
+            results["lexical_scores"].append(
+                [min(1.0, float(scores[i]) / max_score) for i in top]
+            )
+            if results["metadatas"] is not None:
+                results["metadatas"].append([r[2] for r in records])
+            if results["documents"] is not None:
+                results["documents"].append([r[1] for r in records])
+        return results
@@ -0,0 +1,316 @@
+"""
+Direct lookup for questions that cite a law article explicitly.
+
+Questions such as "Chương II điều 29 bộ luật hàng hải nói gì?" name the law,
+chapter and article, so the matching chunks can be resolved from a
+precomputed metadata index (title, chapter_title, section_title, see
+docs/schema.md) without embedding the question or running a vector search.
+Semantic search stays the fallback when nothing matches.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger, setup_logging
+from src.retrieval.records import LOCAL_SNAPSHOT_PATH, load_chunk_records
+
+logger = get_logger(__name__)
+
+CITATION_INDEX_PATH = os.path.join(root, "data/processed/citation_index.json")
+
+_ROMAN = {"i": 1, "v": 5, "x": 10, "l": 50, "c": 100, "d": 500, "m": 1000}
+_ARTICLE_RE = re.compile(r"\bdieu\s+(\d+)")
+_CHAPTER_RE = re.compile(r"\bchuong\s+([ivxlcdm]+|\d+)\b")
+_CLAUSE_RE = re.compile(r"\bkhoan\s+(\d+)")
+_LAW_RE = re.compile(
+    r"\b(?:bo\s+)?(luat\s+.+?)(?=\s+(?:dieu|chuong|khoan|muc)\b|[?.,;:!]|$)"
+)
+# Trailing question words that are not part of a law title
+_LAW_SUFFIX_RE = re.compile(
+    r"\s+(?:noi gi|quy dinh gi|quy dinh the nao|quy dinh ra sao|la gi|gom nhung gi"
+    r"|nhu the nao|ra sao|the nao|gi|nao|ve|thi|co)$"
+)
+
+
+def fold_text(text):
+    """Lowercase and strip Vietnamese diacritics ("Điều" -> "dieu")."""
+    text = unicodedata.normalize("NFD", str(text or "")).replace("đ", "d")
+    text = text.replace("Đ", "D")
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    return " ".join(text.casefold().split())
+
+
+def parse_number(token):
+    """Parse an arabic or roman numeral, returning None when it is neither."""
+    token = token.strip().lower()
+    if token.isdigit():
+        return int(token)
+    if not token or any(c not in _ROMAN for c in token):
+        return None
+    total = 0
+    for i, c in enumerate(token):
+        value = _ROMAN[c]
+        if i + 1 < len(token) and _ROMAN[token[i + 1]] > value:
+            total -= value
+        else:
+            total += value
+    return total
+
+
+def _clause_re(clause):
+    # A clause opens a line with its number ("2. Người lao động ...")
+    return re.compile(rf"(?:^|\n)\s*{clause}\s*[.)]\s")
+
+
+def _law_key(title):
+    key = fold_text(title)
+    return key[3:] if key.startswith("bo ") else key
+
+
+@dataclass
+class Citation:
+    article: int
+    law: str | None = None
+    chapter: int | None = None
+    clause: int | None = None
+
+
+def parse_citation(question):
+    """
+    Recognize "Chương / Điều / Khoản / <law title>" patterns in a question.
+
+    Args:
+        question (str): Raw question
+
+    Returns:
+        Citation | None: Parsed citation, or None when no article is named
+    """
+    folded = fold_text(question)
+    article = _ARTICLE_RE.search(folded)
+    if article is None:
+        return None
+    citation = Citation(article=int(article.group(1)))
+    chapter = _CHAPTER_RE.search(folded)
+    if chapter:
+        citation.chapter = parse_number(chapter.group(1))
+    clause = _CLAUSE_RE.search(folded)
+    if clause:
+        citation.clause = int(clause.group(1))
+    law = _LAW_RE.search(folded)
+    if law:
+        name = law.group(1)
+        while True:
+            stripped = _LAW_SUFFIX_RE.sub("", name)
+            if stripped == name:
+                break
+            name = stripped
+        citation.law = name.strip() or None
+    return citation
+
+
+def _article_number(section_title):
+    if isinstance(section_title, int):
+        return section_title
+    folded = fold_text(section_title)
+    match = _ARTICLE_RE.search(folded) or re.match(r"(\d+)", folded)
+    return int(match.group(1)) if match else None
+
+
+def _chapter_number(chapter_title):
+    if isinstance(chapter_title, int):
+        return chapter_title
+    match = _CHAPTER_RE.search(fold_text(chapter_title))
+    return parse_number(match.group(1)) if match else None
+
+
+def build_citation_index(ids, documents, metadatas, path=CITATION_INDEX_PATH):
+    """
+    Build the (law, article) -> chunks index from chunk metadata and save it.
+
+    Args:
+        ids (list): Chunk ids
+        documents (list): Chunk contents
+        metadatas (list): Chunk metadata dicts (title, chapter_title, section_title)
+        path (str): Output JSON file
+
+    Returns:
+        dict: Build summary
+    """
+    laws = {}
+    articles = {}
+    chunks = {}
+    for chunk_id, document, metadata in zip(ids, documents, metadatas):
+        metadata = metadata or {}
+        article = _article_number(metadata.get("section_title", ""))
+        title = metadata.get("title")
+        if article is None or not title:
+            continue
+        law = _law_key(title)
+        laws[law] = title
+        articles.setdefault(f"{law}|{article}", []).append(chunk_id)
+        chunks[chunk_id] = {
+            "document": document,
+            "metadata": metadata,
+            "chapter": _chapter_number(metadata.get("chapter_title", "")),
+        }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"laws": laws, "articles": articles, "chunks": chunks},
+            f,
+            ensure_ascii=False,
+        )
+    summary = {"laws": len(laws), "articles": len(articles), "chunks": len(chunks)}
+    logger.info("Citation index written to %s: %s", path, summary)
+    return summary
+
+
+class CitationIndex:
+    """In-memory (law, article) -> chunks map loaded from the JSON index."""
+
+    def __init__(self, laws, articles, chunks):
+        self.laws = laws
+        self.articles = articles
+        self.chunks = chunks
+
+    @classmethod
+    def load(cls, path=CITATION_INDEX_PATH):
+        start_time = time.time()
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        logger.info(
+            "Citation index loaded: %d laws, %d articles in %.3fs",
+            len(data["laws"]),
+            len(data["articles"]),
+            time.time() - start_time,
+        )
+        return cls(data["laws"], data["articles"], data["chunks"])
+
+    def resolve_law(self, name):
+        """Find the indexed law whose title contains the cited name."""
+        if not name:
+            return None
+        key = _law_key(name)
+        matches = [law for law in self.laws if key in law]
+        if not matches:
+            # "luat dat dai 2013" should still match a title without the year
+            key = re.sub(r"\s+(?:nam\s+)?\d{4}$", "", key)
+            matches = [law for law in self.laws if key in law]
+        if not matches:
+            return None
+        # Shortest title is the most specific match ("luat hinh su" vs "... to tung ...")
+        return min(matches, key=len)
+
+    def lookup(self, citation, n_results=5):
+        """
+        Return the chunks for a citation in the collection.query result shape.
+
+        Args:
+            citation (Citation): Parsed citation
+            n_results (int): Maximum number of chunks
+
+        Returns:
+            dict | None: Query-shaped results, or None when nothing matches
+        """
+        law = self.resolve_law(citation.law)
+        if law is None:
+            return None
+        chunk_ids = self.articles.get(f"{law}|{citation.article}", [])
+        if citation.chapter is not None:
+            in_chapter = [
+                c for c in chunk_ids if self.chunks[c]["chapter"] == citation.chapter
+            ]
+            # Article numbers are unique within a law, so a chapter mismatch
+            # in the question should not hide the article
+            chunk_ids = in_chapter or chunk_ids
+        if citation.clause is not None:
+            # Chunks holding the cited clause go first, the rest of the article
+            # stays as context (clause splits do not always follow chunk borders)
+            pattern = _clause_re(citation.clause)
+            chunk_ids = sorted(
+                chunk_ids,
+                key=lambda c: pattern.search(self.chunks[c]["document"] or "") is None,
+            )
+        chunk_ids = chunk_ids[:n_results]
+        if not chunk_ids:
+            return None
+        return {
+            "ids": [chunk_ids],
+            "distances": [[0.0] * len(chunk_ids)],
+            "metadatas": [[self.chunks[c]["metadata"] for c in chunk_ids]],
+            "documents": [[self.chunks[c]["document"] for c in chunk_ids]],
+            "embeddings": None,
+        }
+
+
+_CITATION_INDEX = None
+_CITATION_INDEX_LOADED = False
+_CITATION_INDEX_LOCK = threading.Lock()
+
+
+def get_citation_index():
+    """Get the process-wide citation index, or None when it is disabled or missing."""
+    # pylint: disable=global-statement
+    global _CITATION_INDEX, _CITATION_INDEX_LOADED
+    if _CITATION_INDEX_LOADED:
+        return _CITATION_INDEX
+    with _CITATION_INDEX_LOCK:
+        if not _CITATION_INDEX_LOADED:
+            enabled = os.getenv("ENABLE_CITATION_LOOKUP", "true").lower() == "true"
+            path = os.getenv("CITATION_INDEX_PATH", CITATION_INDEX_PATH)
+            if not os.path.isabs(path):
+                path = os.path.join(root, path)
+            if enabled and os.path.exists(path):
+                _CITATION_INDEX = CitationIndex.load(path)
+            elif enabled:
+                logger.info("Citation index not found at %s, lookup disabled", path)
+            _CITATION_INDEX_LOADED = True
+    return _CITATION_INDEX
+
+
+def lookup_citation(question, n_results=5):
+    """
+    Answer a question directly from the citation index when it names an article.
+
+    Args:
+        question (str): Raw question
+        n_results (int): Maximum number of chunks
+
+    Returns:
+        dict | None: Query-shaped results, or None to fall back to semantic search
+    """
+    index = get_citation_index()
+    if index is None:
+        return None
+    citation = parse_citation(question)
+    if citation is None:
+        return None
+    results = index.lookup(citation, n_results)
+    if results is not None:
+        logger.info("Citation lookup hit: %s", citation)
+    return results
+
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(
+        description="Build the citation index from chunk metadata"
+    )
+    parser.add_argument("--source", choices=["local", "chroma"], default="chroma")
+    parser.add_argument("--snapshot", default=LOCAL_SNAPSHOT_PATH)
+    parser.add_argument("--output", default=CITATION_INDEX_PATH)
+    args = parser.parse_args()
+
+    all_ids, all_documents, all_metadatas = load_chunk_records(
+        args.source, args.snapshot
+    )
+    print(build_citation_index(all_ids, all_documents, all_metadatas, args.output))
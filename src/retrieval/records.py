@@ -0,0 +1,46 @@
+"""
+Load every chunk (ids, documents, metadatas) for building offline indexes.
+"""
+
+import json
+import os
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+
+LOCAL_SNAPSHOT_PATH = os.path.join(root, "data/processed/local_index")
+EXPORT_BATCH_SIZE = 500
+
+
+def load_chunk_records(source="chroma", snapshot_dir=LOCAL_SNAPSHOT_PATH):
+    """
+    Read all chunks from Chroma Cloud or from a local snapshot.
+
+    Args:
+        source (str): "chroma" or "local"
+        snapshot_dir (str): Snapshot directory used when source is "local"
+
+    Returns:
+        tuple: (ids, documents, metadatas)
+    """
+    if source == "local":
+        with open(os.path.join(snapshot_dir, "records.json"), encoding="utf-8") as f:
+            records = json.load(f)
+        return records["ids"], records["documents"], records["metadatas"]
+
+    # pylint: disable=import-outside-toplevel
+    from src.store_vector.init_index import init_chroma_index
+
+    _, collection = init_chroma_index()
+    ids, documents, metadatas = [], [], []
+    for offset in range(0, collection.count(), EXPORT_BATCH_SIZE):
+        batch = collection.get(
+            include=["documents", "metadatas"],
+            limit=EXPORT_BATCH_SIZE,
+            offset=offset,
+        )
+        ids.extend(batch["ids"])
+        documents.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+    return ids, documents, metadatas
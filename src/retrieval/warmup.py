@@ -0,0 +1,188 @@
+"""
+Cache priming from historical questions.
+
+Right after a deploy every cache is cold, so the first users pay for the
+embedding API and the vector search. The most frequent questions are mined
+from the application logs (JSON lines or the older text format, including
+rotated files) or from an exported query file, and run through the
+embedding and retrieval stages with bounded parallelism. This fills the
+embedding and retrieval caches of the process that runs it and the shared
+result cache (src/cache/shared.py) read by every other worker.
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger, setup_logging
+from src.embedding.cache import normalize_query
+
+logger = get_logger(__name__)
+
+# Rotated backups (app.log.1, ...) are read as well
+DEFAULT_LOG_FILES = "logs/app.log*,logs/agent.log*"
+
+# The one log message per request that carries the user's question:
+# "The question is ..." for /retrieve and /rag (app/retrieve.py, app/rag.py),
+# "Question: ..." for /agent (app/agent.py). The agent's tools log the same
+# question again ("Question: ..., number of chunks: N" / "..., N chunks",
+# services/tools.py); those lines are skipped so agent questions count once.
+_QUESTION_RES = (
+    re.compile(r"^The question is (?P<question>.+)$"),
+    re.compile(
+        r"^Question: (?!.*(?:, number of chunks: \d+|, \d+ chunks)$)(?P<question>.+)$"
+    ),
+)
+
+
+def _log_message(line):
+    """Message of a log line, in JSON (LOG_FORMAT=json) or text format."""
+    if line.startswith("{"):
+        try:
+            return json.loads(line).get("message", "")
+        except ValueError:
+            return ""
+    # "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    parts = line.split(" - ", 3)
+    return parts[3] if len(parts) == 4 else ""
+
+
+def extract_questions(path):
+    """
+    Yield the questions recorded in a file.
+
+    ``.jsonl`` files hold one ``{"question": ...}`` object per line, ``.txt``
+    files one question per line; anything else is read as an application log.
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".txt"):
+                yield line
+                continue
+            if path.endswith(".jsonl"):
+                try:
+                    question = json.loads(line).get("question")
+                except ValueError:
+                    continue
+                if question:
+                    yield question
+                continue
+            message = _log_message(line)
+            for pattern in _QUESTION_RES:
+                match = pattern.match(message)
+                if match:
+                    yield match.group("question").strip()
+                    break
+
+
+def resolve_paths(patterns):
+    """Expand comma-separated glob patterns (relative to the project root)."""
+    paths = []
+    for pattern in patterns.split(","):
+        pattern = pattern.strip()
+        if not pattern:
+            continue
+        if not os.path.isabs(pattern):
+            pattern = os.path.join(root, pattern)
+        paths.extend(sorted(glob.glob(pattern)))
+    return paths
+
+
+def load_top_questions(paths, top_n=50, min_count=1):
+    """
+    Most frequent questions across files, counted by their normalized form.
+
+    Args:
+        paths (list): Log or query files
+        top_n (int): Number of questions to keep
+        min_count (int): Skip questions seen fewer times than this
+
+    Returns:
+        list: (question, count) pairs, most frequent first; each question
+        is its most common spelling
+    """
+    counts = Counter()
+    spellings = defaultdict(Counter)
+    for path in paths:
+        try:
+            for question in extract_questions(path):
+                key = normalize_query(question)
+                counts[key] += 1
+                spellings[key][question] += 1
+        except OSError as e:
+            logger.warning("Could not read questions from %s: %s", path, e)
+    return [
+        (spellings[key].most_common(1)[0][0], count)
+        for key, count in counts.most_common(top_n)
+        if count >= min_count
+    ]
+
+
+async def warm_query_caches(questions, concurrency=4, n_results=5):
+    """
+    Run questions through embedding and retrieval, at most ``concurrency`` at once.
+
+    Failures are logged and counted; they do not stop the other questions.
+
+    Args:
+        questions (list): Question strings
+        concurrency (int): Maximum questions in flight
+        n_results (int): top_k used for the retrieval call
+
+    Returns:
+        dict: questions, succeeded, failed and elapsed_s
+    """
+    # Mining the logs alone does not need the retrieval stack
+    # pylint: disable=import-outside-toplevel
+    from src.store_vector.search_embeddings import search_relevant_embeddings_async
+
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    failed = 0
+
+    async def warm(question):
+        nonlocal failed
+        async with semaphore:
+            try:
+                await search_relevant_embeddings_async(question, n_results)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                failed += 1
+                logger.warning("Warm-up query failed for %r: %s", question[:80], e)
+
+    start_time = time.time()
+    await asyncio.gather(*(warm(question) for question in questions))
+    stats = {
+        "questions": len(questions),
+        "succeeded": len(questions) - failed,
+        "failed": failed,
+        "elapsed_s": round(time.time() - start_time, 3),
+    }
+    logger.info("Query cache warm-up: %s", stats)
+    return stats
+
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(description="List the most frequent questions")
+    parser.add_argument("--logs", default=DEFAULT_LOG_FILES)
+    parser.add_argument("--top-n", type=int, default=20)
+    args = parser.parse_args()
+
+    for top_question, top_count in load_top_questions(
+        resolve_paths(args.logs), args.top_n
+    ):
+        print(f"{top_count:6d}  {top_question}")
@@ -1,7 +1,6 @@
 import os
 import sys
 
-import chromadb
 from dotenv import load_dotenv
 
 root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -9,7 +8,6 @@ sys.path.insert(0, str(root))
 load_dotenv()
 from configs.logger import get_logger, setup_logging
 
-setup_logging()
 logger = get_logger(__name__)
 
 CHROMA_DB_PATH = os.path.join(root, "data/processed/vector_store")
@@ -24,32 +22,46 @@ INDEX_CONFIG = {
 }
 
 
-def init_chroma_index():
-    # print(f"Kiểm tra thư mục lưu trữ Chroma tại: {CHROMA_DB_PATH}")
+CHROMA_HOST = "api.trychroma.com"
+CHROMA_TENANT = "eacc7fce-0948-49c8-a52b-5ed4969db763"
+CHROMA_DATABASE = "AI legal assistant ChromaDB"
+COLLECTION_METADATA = {
+    "hnsw:space": "cosine",  # Độ đo cosine cho tìm kiếm văn bản
+    "hnsw:construction_ef": 200,  # Tăng exploration khi xây dựng để đảm bảo độ chính xác cao
+    "hnsw:M": 32,  # Tăng số kết nối để cải thiện chất lượng index
+    "hnsw:search_ef": 50,  # Tăng exploration khi tìm kiếm để cân bằng tốc độ và độ chính xác
+    "hnsw:num_threads": 8,  # Sử dụng 8 luồng để tăng tốc xử lý
+    "hnsw:resize_factor": 1.5,  # Tỷ lệ tăng trưởng lớn để hỗ trợ mở rộng dữ liệu
+    "hnsw:batch_size": 200,  # Batch size lớn hơn để xử lý dữ liệu nhanh
+    "hnsw:sync_threshold": 1000,  # Đồng bộ sau mỗi 1000 vector để giảm I/O
+}
+
+
+def _client_kwargs():
     chroma_token = os.getenv("x-chromadb-token")
     if chroma_token is None:
         raise ValueError("Environment variable 'x-chromadb-token' is not set.")
-    client = chromadb.HttpClient(
-        ssl=True,
-        host="api.trychroma.com",
-        tenant="eacc7fce-0948-49c8-a52b-5ed4969db763",
-        database="AI legal assistant ChromaDB",
-        headers={"x-chroma-token": chroma_token},
-    )
+    return {
+        "ssl": True,
+        "host": CHROMA_HOST,
+        "tenant": CHROMA_TENANT,
+        "database": CHROMA_DATABASE,
+        "headers": {"x-chroma-token": chroma_token},
+    }
+
+
+def init_chroma_index():
+    # chromadb takes ~0.3s to import; only pay for it when connecting
+    # pylint: disable=import-outside-toplevel
+    import chromadb
+
+    # print(f"Kiểm tra thư mục lưu trữ Chroma tại: {CHROMA_DB_PATH}")
+    client = chromadb.HttpClient(**_client_kwargs())
     logger.info("Client ChromaDB created successfully.")
     logger.info("Kiểm tra hoặc tạo collection: '%s'...", COLLECTION_NAME)
     collection = client.get_or_create_collection(
         name=COLLECTION_NAME,
-        metadata={
-            "hnsw:space": "cosine",  # Độ đo cosine cho tìm kiếm văn bản
-            "hnsw:construction_ef": 200,  # Tăng exploration khi xây dựng để đảm bảo độ chính xác cao
-            "hnsw:M": 32,  # Tăng số kết nối để cải thiện chất lượng index
-            "hnsw:search_ef": 50,  # Tăng exploration khi tìm kiếm để cân bằng tốc độ và độ chính xác
-            "hnsw:num_threads": 8,  # Sử dụng 8 luồng để tăng tốc xử lý
-            "hnsw:resize_factor": 1.5,  # Tỷ lệ tăng trưởng lớn để hỗ trợ mở rộng dữ liệu
-            "hnsw:batch_size": 200,  # Batch size lớn hơn để xử lý dữ liệu nhanh
-            "hnsw:sync_threshold": 1000,  # Đồng bộ sau mỗi 1000 vector để giảm I/O
-        },
+        metadata=COLLECTION_METADATA,
     )
     logger.info("Collection '%s' đã sẵn sàng.", COLLECTION_NAME)
     # print("\n--- Cấu hình Index của ChromaDB ---")
@@ -58,7 +70,28 @@ def init_chroma_index():
     return client, collection
 
 
+async def init_chroma_index_async():
+    """
+    Async counterpart of init_chroma_index using Chroma's async HTTP client.
+
+    Returns:
+        tuple: (AsyncClientAPI, AsyncCollection)
+    """
+    # pylint: disable=import-outside-toplevel
+    import chromadb
+
+    client = await chromadb.AsyncHttpClient(**_client_kwargs())
+    logger.info("Async client ChromaDB created successfully.")
+    collection = await client.get_or_create_collection(
+        name=COLLECTION_NAME,
+        metadata=COLLECTION_METADATA,
+    )
+    logger.info("Async collection '%s' đã sẵn sàng.", COLLECTION_NAME)
+    return client, collection
+
+
 if __name__ == "__main__":
+    setup_logging()
     chroma_client, legal_collection = init_chroma_index()
     print(f"Số lượng documents: {legal_collection.count()}")
     results = legal_collection.peek(limit=5)  # Lấy 5 item đầu tiên
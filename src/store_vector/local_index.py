@@ -0,0 +1,237 @@
+"""
+In-process vector search over a local snapshot of the Chroma collection.
+
+The snapshot is exported once from Chroma Cloud (ids, embeddings, documents,
+metadatas) and then served with exact cosine search over a memory-mapped
+float32/float16 matrix, so retrieval needs no network round trip and can run
+air-gapped. ``LocalVectorIndex.query`` returns the same dict shape as
+``collection.query``.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger, setup_logging
+
+logger = get_logger(__name__)
+
+LOCAL_INDEX_PATH = os.path.join(root, "data/processed/local_index")
+SUPPORTED_DTYPES = ("float32", "float16")
+EXPORT_BATCH_SIZE = 500
+# Rows scored per block when the matrix is stored as float16
+SCORE_BLOCK_SIZE = 2048
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def export_collection_snapshot(
+    collection, snapshot_dir=LOCAL_INDEX_PATH, dtype="float32"
+):
+    """
+    Export a Chroma collection into a local snapshot directory.
+
+    Args:
+        collection: Chroma collection to read from
+        snapshot_dir (str): Output directory
+        dtype (str): Storage dtype for the vectors ("float32" or "float16")
+
+    Returns:
+        dict: The snapshot manifest
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"dtype must be one of {SUPPORTED_DTYPES}, got {dtype}")
+    start_time = time.time()
+    total = collection.count()
+    ids, documents, metadatas, vectors = [], [], [], []
+    for offset in range(0, total, EXPORT_BATCH_SIZE):
+        batch = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=EXPORT_BATCH_SIZE,
+            offset=offset,
+        )
+        ids.extend(batch["ids"])
+        documents.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+        vectors.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        logger.info("Exported %d/%d vectors", len(ids), total)
+
+    if not ids:
+        raise ValueError("Collection is empty, nothing to export")
+
+    matrix = _normalize_rows(np.vstack(vectors)).astype(dtype)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    np.save(os.path.join(snapshot_dir, "embeddings.npy"), matrix)
+    with open(os.path.join(snapshot_dir, "records.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {"ids": ids, "documents": documents, "metadatas": metadatas},
+            f,
+            ensure_ascii=False,
+        )
+    manifest = {
+        "collection_name": collection.name,
+        "count": len(ids),
+        "dimension": int(matrix.shape[1]),
+        "dtype": dtype,
+        "created_at": time.time(),
+    }
+    with open(os.path.join(snapshot_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(
+        "Snapshot of %d vectors written to %s in %.2fs",
+        len(ids),
+        snapshot_dir,
+        time.time() - start_time,
+    )
+    return manifest
+
+
+class LocalVectorIndex:
+    """Exact cosine search over a memory-mapped, L2-normalized matrix."""
+
+    def __init__(self, matrix, ids, documents, metadatas, manifest=None):
+        self.matrix = matrix
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.manifest = manifest or {}
+        self.name = self.manifest.get("collection_name", "local")
+
+    @classmethod
+    def load(cls, snapshot_dir=LOCAL_INDEX_PATH):
+        """
+        Load a snapshot written by export_collection_snapshot.
+
+        Args:
+            snapshot_dir (str): Snapshot directory
+
+        Returns:
+            LocalVectorIndex: The loaded index
+        """
+        start_time = time.time()
+        matrix = np.load(os.path.join(snapshot_dir, "embeddings.npy"), mmap_mode="r")
+        with open(os.path.join(snapshot_dir, "records.json"), encoding="utf-8") as f:
+            records = json.load(f)
+        manifest = {}
+        manifest_path = os.path.join(snapshot_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        if matrix.shape[0] != len(records["ids"]):
+            raise ValueError(
+                f"Snapshot is inconsistent: {matrix.shape[0]} vectors "
+                f"for {len(records['ids'])} ids"
+            )
+        logger.info(
+            "Local index loaded: %d x %d %s in %.3fs",
+            matrix.shape[0],
+            matrix.shape[1],
+            matrix.dtype,
+            time.time() - start_time,
+        )
+        return cls(
+            matrix, records["ids"], records["documents"], records["metadatas"], manifest
+        )
+
+    def count(self):
+        return len(self.ids)
+
+    def _scores(self, queries):
+        if self.matrix.dtype == np.float32:
+            return queries @ self.matrix.T
+        scores = np.empty((queries.shape[0], self.matrix.shape[0]), dtype=np.float32)
+        for start in range(0, self.matrix.shape[0], SCORE_BLOCK_SIZE):
+            block = np.asarray(
+                self.matrix[start : start + SCORE_BLOCK_SIZE], dtype=np.float32
+            )
+            scores[:, start : start + SCORE_BLOCK_SIZE] = queries @ block.T
+        return scores
+
+    def search(self, query_embeddings, n_results=5):
+        """
+        Score queries against every vector and return the top-k rows.
+
+        Args:
+            query_embeddings: One embedding or a list of embeddings
+            n_results (int): Number of results per query
+
+        Returns:
+            tuple: (indices, similarities), each of shape (n_queries, k)
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+        queries = _normalize_rows(queries)
+        k = min(n_results, self.count())
+        scores = self._scores(queries)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return (
+            np.take_along_axis(top, order, axis=1),
+            np.take_along_axis(top_scores, order, axis=1),
+        )
+
+    def query(self, query_embeddings, n_results=5, include=None, **_):
+        """
+        Answer a query the way ``collection.query`` does.
+
+        Args:
+            query_embeddings: One embedding or a list of embeddings
+            n_results (int): Number of results per query
+            include (list): Fields to return, defaults to Chroma's defaults
+
+        Returns:
+            dict: ids, distances, metadatas, documents, embeddings
+        """
+        include = include or ["metadatas", "documents", "distances"]
+        indices, similarities = self.search(query_embeddings, n_results)
+        return self.build_results(indices, similarities, include)
+
+    def build_results(self, indices, similarities, include):
+        """Turn row indices and similarities into a Chroma-style result dict."""
+        results = {
+            "ids": [[self.ids[i] for i in row] for row in indices],
+            "distances": None,
+            "metadatas": None,
+            "documents": None,
+            "embeddings": None,
+        }
+        if "distances" in include:
+            results["distances"] = (1.0 - similarities).astype(float).tolist()
+        if "metadatas" in include:
+            results["metadatas"] = [[self.metadatas[i] for i in row] for row in indices]
+        if "documents" in include:
+            results["documents"] = [[self.documents[i] for i in row] for row in indices]
+        if "embeddings" in include:
+            results["embeddings"] = [
+                np.asarray(self.matrix[row], dtype=np.float32).tolist()
+                for row in indices
+            ]
+        return results
+
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(
+        description="Export the Chroma Cloud collection into a local snapshot"
+    )
+    parser.add_argument("--output", default=LOCAL_INDEX_PATH)
+    parser.add_argument("--dtype", default="float32", choices=SUPPORTED_DTYPES)
+    args = parser.parse_args()
+
+    # pylint: disable=import-outside-toplevel
+    from src.store_vector.init_index import init_chroma_index
+
+    _, legal_collection = init_chroma_index()
+    print(export_collection_snapshot(legal_collection, args.output, args.dtype))
@@ -0,0 +1,373 @@
+"""
+Compressed vector storage for the local retrieval engine.
+
+Two codecs are provided on top of a local snapshot (see local_index.py):
+
+- ``int8``: per-dimension scalar quantization, 4x smaller than float32.
+- ``pq``: product quantization, ``m`` uint8 codes per vector (64 bytes for
+  m=64 instead of 4 KB for a 1024-dim float32 vector).
+
+Search is two-pass: the compressed codes give a fast approximate ranking,
+then a shortlist of ``rerank_factor * k`` candidates is re-scored exactly
+with the full-precision rows read from the memory-mapped snapshot on disk.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(root))
+from configs.logger import get_logger, setup_logging
+from src.store_vector.local_index import (
+    LOCAL_INDEX_PATH,
+    SCORE_BLOCK_SIZE,
+    LocalVectorIndex,
+    _normalize_rows,
+)
+
+logger = get_logger(__name__)
+
+QUANTIZATION_METHODS = ("int8", "pq")
+
+
+class ScalarQuantizer:
+    """Per-dimension int8 scalar quantizer."""
+
+    method = "int8"
+
+    def __init__(self, vmin=None, scale=None):
+        self.vmin = vmin
+        self.scale = scale
+
+    def fit(self, matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        self.vmin = matrix.min(axis=0)
+        vmax = matrix.max(axis=0)
+        self.scale = np.maximum(vmax - self.vmin, 1e-12) / 255.0
+        return self
+
+    def encode(self, matrix):
+        codes = np.empty(matrix.shape, dtype=np.int8)
+        for start in range(0, matrix.shape[0], SCORE_BLOCK_SIZE):
+            block = np.asarray(matrix[start : start + SCORE_BLOCK_SIZE], np.float32)
+            q = np.rint((block - self.vmin) / self.scale) - 128
+            codes[start : start + SCORE_BLOCK_SIZE] = np.clip(q, -128, 127)
+        return codes
+
+    def scores(self, codes, queries):
+        # x ~= (code + 128) * scale + vmin, so x.q = code.(scale*q) + (128*scale + vmin).q
+        scaled = queries * self.scale
+        offset = queries @ (128.0 * self.scale + self.vmin)
+        out = np.empty((queries.shape[0], codes.shape[0]), dtype=np.float32)
+        for start in range(0, codes.shape[0], SCORE_BLOCK_SIZE):
+            block = codes[start : start + SCORE_BLOCK_SIZE].astype(np.float32)
+            out[:, start : start + SCORE_BLOCK_SIZE] = scaled @ block.T
+        return out + offset[:, np.newaxis]
+
+    def nbytes(self):
+        return self.vmin.nbytes + self.scale.nbytes
+
+    def save(self, path):
+        np.savez(path, vmin=self.vmin, scale=self.scale)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["vmin"], data["scale"])
+
+
+class ProductQuantizer:
+    """Product quantizer with 256 centroids (one uint8 code) per subspace."""
+
+    method = "pq"
+
+    def __init__(self, n_subspaces=64, n_centroids=256, centroids=None):
+        self.n_subspaces = n_subspaces
+        self.n_centroids = n_centroids
+        # Shape (n_subspaces, n_centroids, sub_dim)
+        self.centroids = centroids
+
+    def fit(self, matrix, n_iter=15, sample_size=20000, seed=0):
+        rng = np.random.default_rng(seed)
+        matrix = np.asarray(matrix)
+        if matrix.shape[0] > sample_size:
+            matrix = matrix[np.sort(rng.choice(matrix.shape[0], sample_size, False))]
+        matrix = np.asarray(matrix, dtype=np.float32)
+        dim = matrix.shape[1]
+        if dim % self.n_subspaces:
+            raise ValueError(
+                f"Dimension {dim} is not divisible by n_subspaces={self.n_subspaces}"
+            )
+        sub_dim = dim // self.n_subspaces
+        n_centroids = min(self.n_centroids, matrix.shape[0])
+        centroids = np.empty((self.n_subspaces, n_centroids, sub_dim), np.float32)
+        for j in range(self.n_subspaces):
+            sub = matrix[:, j * sub_dim : (j + 1) * sub_dim]
+            centroids[j] = self._kmeans(sub, n_centroids, n_iter, rng)
+        self.centroids = centroids
+        return self
+
+    @staticmethod
+    def _kmeans(points, k, n_iter, rng):
+        centers = points[rng.choice(points.shape[0], k, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = ProductQuantizer._nearest(points, centers)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, assign, points)
+            counts = np.bincount(assign, minlength=k)
+            filled = counts > 0
+            centers[filled] = sums[filled] / counts[filled, np.newaxis]
+            # Re-seed empty clusters from random points
+            if not filled.all():
+                empty = np.flatnonzero(~filled)
+                centers[empty] = points[rng.choice(points.shape[0], len(empty))]
+        return centers
+
+    @staticmethod
+    def _nearest(points, centers):
+        dists = (
+            (points**2).sum(axis=1, keepdims=True)
+            - 2 * points @ centers.T
+            + (centers**2).sum(axis=1)
+        )
+        return dists.argmin(axis=1)
+
+    def encode(self, matrix):
+        sub_dim = self.centroids.shape[2]
+        codes = np.empty((matrix.shape[0], self.n_subspaces), dtype=np.uint8)
+        for start in range(0, matrix.shape[0], SCORE_BLOCK_SIZE):
+            block = np.asarray(matrix[start : start + SCORE_BLOCK_SIZE], np.float32)
+            for j in range(self.n_subspaces):
+                sub = block[:, j * sub_dim : (j + 1) * sub_dim]
+                codes[start : start + SCORE_BLOCK_SIZE, j] = self._nearest(
+                    sub, self.centroids[j]
+                )
+        return codes
+
+    def scores(self, codes, queries):
+        # Asymmetric distance: lookup table of query-subvector . centroid
+        sub_dim = self.centroids.shape[2]
+        subs = queries.reshape(queries.shape[0], self.n_subspaces, sub_dim)
+        lut = np.einsum("qjd,jcd->qjc", subs, self.centroids)
+        columns = np.arange(self.n_subspaces)
+        out = np.empty((queries.shape[0], codes.shape[0]), dtype=np.float32)
+        for start in range(0, codes.shape[0], SCORE_BLOCK_SIZE):
+            block = codes[start : start + SCORE_BLOCK_SIZE]
+            for qi in range(queries.shape[0]):
+                out[qi, start : start + SCORE_BLOCK_SIZE] = lut[qi][columns, block].sum(
+                    axis=1
+                )
+        return out
+
+    def nbytes(self):
+        return self.centroids.nbytes
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids)
+
+    @classmethod
+    def load(cls, path):
+        centroids = np.load(path)["centroids"]
+        return cls(centroids.shape[0], centroids.shape[1], centroids)
+
+
+def _quantizer_class(method):
+    if method == "int8":
+        return ScalarQuantizer
+    if method == "pq":
+        return ProductQuantizer
+    raise ValueError(
+        f"Unknown quantization method {method}, use {QUANTIZATION_METHODS}"
+    )
+
+
+def build_quantized_index(snapshot_dir=LOCAL_INDEX_PATH, method="int8", **kwargs):
+    """
+    Train a quantizer on a local snapshot and write its codes next to it.
+
+    Args:
+        snapshot_dir (str): Snapshot written by export_collection_snapshot
+        method (str): "int8" or "pq"
+        **kwargs: Passed to the quantizer (e.g. n_subspaces for pq)
+
+    Returns:
+        dict: Build summary
+    """
+    start_time = time.time()
+    matrix = np.load(os.path.join(snapshot_dir, "embeddings.npy"), mmap_mode="r")
+    quantizer = _quantizer_class(method)(**kwargs).fit(matrix)
+    codes = quantizer.encode(matrix)
+    np.save(os.path.join(snapshot_dir, f"codes_{method}.npy"), codes)
+    quantizer.save(os.path.join(snapshot_dir, f"quantizer_{method}.npz"))
+    summary = {
+        "method": method,
+        "count": int(codes.shape[0]),
+        "code_bytes": int(codes.nbytes),
+        "quantizer_bytes": int(quantizer.nbytes()),
+        "full_bytes": int(matrix.shape[0] * matrix.shape[1] * 4),
+        "build_seconds": round(time.time() - start_time, 3),
+    }
+    logger.info("Built %s codes for %d vectors: %s", method, codes.shape[0], summary)
+    return summary
+
+
+class QuantizedVectorIndex(LocalVectorIndex):
+    """
+    Approximate first pass over compressed codes, exact re-scoring of a shortlist.
+
+    Only the codes stay resident; full-precision rows are read from the
+    memory-mapped snapshot for the shortlisted candidates.
+    """
+
+    def __init__(
+        self,
+        matrix,
+        ids,
+        documents,
+        metadatas,
+        manifest,
+        quantizer,
+        codes,
+        rerank_factor=4,
+    ):
+        super().__init__(matrix, ids, documents, metadatas, manifest)
+        self.quantizer = quantizer
+        self.codes = codes
+        self.rerank_factor = max(1, rerank_factor)
+
+    @classmethod
+    def load(cls, snapshot_dir=LOCAL_INDEX_PATH, method="int8", rerank_factor=4):
+        """
+        Load a snapshot together with codes built by build_quantized_index.
+
+        Args:
+            snapshot_dir (str): Snapshot directory
+            method (str): "int8" or "pq"
+            rerank_factor (int): Shortlist size as a multiple of n_results
+
+        Returns:
+            QuantizedVectorIndex: The loaded index
+        """
+        base = LocalVectorIndex.load(snapshot_dir)
+        quantizer = _quantizer_class(method).load(
+            os.path.join(snapshot_dir, f"quantizer_{method}.npz")
+        )
+        codes = np.load(os.path.join(snapshot_dir, f"codes_{method}.npy"))
+        logger.info(
+            "Loaded %s codes (%.1f MB resident)", method, codes.nbytes / 1024 / 1024
+        )
+        return cls(
+            base.matrix,
+            base.ids,
+            base.documents,
+            base.metadatas,
+            base.manifest,
+            quantizer,
+            codes,
+            rerank_factor,
+        )
+
+    def resident_bytes(self):
+        """Bytes kept in memory for the first pass."""
+        return int(self.codes.nbytes + self.quantizer.nbytes())
+
+    def search(self, query_embeddings, n_results=5):
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+        queries = _normalize_rows(queries)
+        k = min(n_results, self.count())
+        shortlist_size = min(k * self.rerank_factor, self.count())
+
+        approx = self.quantizer.scores(self.codes, queries)
+        shortlist = np.argpartition(-approx, shortlist_size - 1, axis=1)[
+            :, :shortlist_size
+        ]
+
+        indices = np.empty((queries.shape[0], k), dtype=np.int64)
+        similarities = np.empty((queries.shape[0], k), dtype=np.float32)
+        for qi, candidates in enumerate(shortlist):
+            # Sorted row order keeps the mmap reads sequential
+            candidates = np.sort(candidates)
+            exact = np.asarray(self.matrix[candidates], np.float32) @ queries[qi]
+            order = np.argsort(-exact)[:k]
+            indices[qi] = candidates[order]
+            similarities[qi] = exact[order]
+        return indices, similarities
+
+
+def evaluate_quantization(
+    snapshot_dir=LOCAL_INDEX_PATH, method="int8", n_queries=200, k=10, rerank_factor=4
+):
+    """
+    Compare a quantized index with exact search on the same queries.
+
+    Queries are stored vectors with a small amount of noise added, so the
+    comparison needs no embedding API.
+
+    Returns:
+        dict: recall@k, latency and memory of both indexes
+    """
+    exact_index = LocalVectorIndex.load(snapshot_dir)
+    quantized_index = QuantizedVectorIndex.load(snapshot_dir, method, rerank_factor)
+    rng = np.random.default_rng(0)
+    rows = rng.choice(exact_index.count(), min(n_queries, exact_index.count()), False)
+    queries = np.asarray(exact_index.matrix[np.sort(rows)], np.float32)
+    queries = queries + rng.normal(0, 0.02, queries.shape).astype(np.float32)
+
+    def timed(index):
+        start_time = time.perf_counter()
+        result = [index.search(q, k)[0][0] for q in queries]
+        return result, (time.perf_counter() - start_time) / len(queries) * 1000
+
+    exact_ids, exact_ms = timed(exact_index)
+    approx_ids, approx_ms = timed(quantized_index)
+    recall = np.mean(
+        [len(set(a) & set(e)) / len(e) for a, e in zip(approx_ids, exact_ids)]
+    )
+    full_bytes = int(exact_index.matrix.shape[0] * exact_index.matrix.shape[1] * 4)
+    report = {
+        "method": method,
+        "k": k,
+        "n_queries": len(queries),
+        "rerank_factor": rerank_factor,
+        f"recall@{k}": round(float(recall), 4),
+        "exact_ms_per_query": round(exact_ms, 3),
+        "quantized_ms_per_query": round(approx_ms, 3),
+        "baseline_float32_bytes": full_bytes,
+        "quantized_resident_bytes": quantized_index.resident_bytes(),
+        "compression_ratio": round(full_bytes / quantized_index.resident_bytes(), 2),
+    }
+    logger.info("Quantization report: %s", report)
+    return report
+
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Build or evaluate quantized codes")
+    parser.add_argument("command", choices=["build", "eval"])
+    parser.add_argument("--snapshot", default=LOCAL_INDEX_PATH)
+    parser.add_argument("--method", default="int8", choices=QUANTIZATION_METHODS)
+    parser.add_argument("--subspaces", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        options = {"n_subspaces": args.subspaces} if args.method == "pq" else {}
+        print(json.dumps(build_quantized_index(args.snapshot, args.method, **options)))
+    else:
+        print(
+            json.dumps(
+                evaluate_quantization(
+                    args.snapshot, args.method, args.queries, args.k, args.rerank
+                ),
+                indent=2,
+            )
+        )
@@ -1,9 +1,14 @@
+import asyncio
+import hashlib
+import json
 import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 from dotenv import load_dotenv
-from gradio_client import Client
 
 load_dotenv()
 
@@ -11,14 +16,84 @@ root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)
 sys.path.insert(0, str(root))
 
 from configs.logger import get_logger, setup_logging
-from src.store_vector.init_index import init_chroma_index
+from src.cache.shared import get_shared_cache
+from src.concurrency.bulkhead import get_bulkhead
+from src.concurrency.circuit_breaker import get_circuit_breaker
+from src.concurrency.singleflight import get_single_flight
+from src.embedding.cache import get_embedding_cache, normalize_query
+from src.embedding.client import DEFAULT_EMBEDDING_API_ENDPOINT, get_embedding_client
+from src.observability.metrics import observe_stage
+from src.observability.tracing import start_span
+from src.retrieval.bm25 import get_bm25_index, reciprocal_rank_fusion
+from src.retrieval.citation import lookup_citation
+from src.store_vector.init_index import (
+    COLLECTION_NAME,
+    init_chroma_index,
+    init_chroma_index_async,
+)
 
-setup_logging()
 logger = get_logger(__name__)
-collection = init_chroma_index()[1]
+
+# "chroma" (Chroma Cloud) hoặc "local" (snapshot in-process, xem local_index.py)
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "chroma").strip().lower()
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "data/processed/local_index")
+if not os.path.isabs(LOCAL_INDEX_PATH):
+    LOCAL_INDEX_PATH = os.path.join(root, LOCAL_INDEX_PATH)
+# "none", "int8" hoặc "pq" (xem quantization.py)
+LOCAL_INDEX_QUANTIZATION = os.getenv("LOCAL_INDEX_QUANTIZATION", "none").lower()
+LOCAL_INDEX_RERANK_FACTOR = int(os.getenv("LOCAL_INDEX_RERANK_FACTOR", "4"))
+# "vector", "hybrid" (vector + BM25, reciprocal-rank fusion) hoặc "lexical" (chỉ BM25)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector").strip().lower()
+# Quá thời gian này (ms) mà chưa có embedding thì trả kết quả BM25; 0 = không giới hạn
+EMBEDDING_LATENCY_BUDGET_MS = float(os.getenv("EMBEDDING_LATENCY_BUDGET_MS", "0"))
+_budget_executor = ThreadPoolExecutor(
+    max_workers=8, thread_name_prefix="embedding-budget"
+)
+
+# Chroma Cloud: phiên bản collection (số bản ghi + metadata) được đọc lại sau mỗi TTL
+COLLECTION_VERSION_TTL = float(os.getenv("COLLECTION_VERSION_TTL", "60"))
+
+# Trường Chroma trả về mặc định; distances luôn cần để tính điểm
+DEFAULT_INCLUDE = ("metadatas", "documents", "distances")
+
+_collection = None
+_collection_lock = threading.Lock()
+
+
+def get_collection():
+    """
+    Get the collection used for retrieval, created on first use.
+
+    Returns a LocalVectorIndex when RETRIEVAL_BACKEND=local, otherwise the
+    Chroma Cloud collection. Both expose the same ``query`` signature.
+    """
+    # pylint: disable=global-statement
+    global _collection
+    with _collection_lock:
+        if _collection is None:
+            if RETRIEVAL_BACKEND == "local" and LOCAL_INDEX_QUANTIZATION != "none":
+                # pylint: disable=import-outside-toplevel
+                from src.store_vector.quantization import QuantizedVectorIndex
+
+                _collection = QuantizedVectorIndex.load(
+                    LOCAL_INDEX_PATH,
+                    LOCAL_INDEX_QUANTIZATION,
+                    LOCAL_INDEX_RERANK_FACTOR,
+                )
+            elif RETRIEVAL_BACKEND == "local":
+                # pylint: disable=import-outside-toplevel
+                from src.store_vector.local_index import LocalVectorIndex
+
+                _collection = LocalVectorIndex.load(LOCAL_INDEX_PATH)
+            else:
+                _collection = init_chroma_index()[1]
+        return _collection
+
 
 # Cấu hình API embedding
-EMBEDDING_API_ENDPOINT = "hieuailearning/BAAI_bge_m3_api"
+EMBEDDING_API_ENDPOINT = os.getenv(
+    "EMBEDDING_API_ENDPOINT", DEFAULT_EMBEDDING_API_ENDPOINT
+)
 
 # Backup models configuration for reference (không sử dụng nữa)
 # DEFAULT_MODEL = "BAAI/bge-m3"
@@ -44,14 +119,21 @@ def get_embedding_from_api(text, max_retries=3, timeout=30):
         list: Embedding vector
 
     Raises:
+        CircuitOpenError: If the embedding API circuit is open
         Exception: If all retry attempts fail
     """
-    import time
-
+    breaker = get_circuit_breaker("embedding_api")
     for attempt in range(max_retries):
+        # Fails fast while the API is known to be down; callers fall back
+        breaker.before_call()
         try:
-            client = Client(EMBEDDING_API_ENDPOINT)
-            embedding = client.predict(text_input=text, api_name="/predict")
+            # Shared long-lived client; concurrent queries are merged into one
+            # batch, and a slow request is hedged with a duplicate
+            with start_span(
+                "embedding.request", text_length=len(text), attempt=attempt + 1
+            ):
+                embedding = get_embedding_client().embed_hedged(text, timeout=timeout)
+            breaker.record_success()
             logger.info(
                 "Successfully got embedding from API (attempt %d) for text length: %d",
                 attempt + 1,
@@ -60,6 +142,7 @@ def get_embedding_from_api(text, max_retries=3, timeout=30):
             return embedding
 
         except Exception as e:
+            breaker.record_failure()
             logger.warning(
                 "Attempt %d failed to get embedding from API: %s", attempt + 1, str(e)
             )
@@ -77,56 +160,639 @@ def get_embedding_from_api(text, max_retries=3, timeout=30):
                 )
 
 
-def search_relevant_embeddings(text, n_results=5, model_name=None):
+def get_query_embedding(text):
     """
-    Search for relevant embeddings using API-based embedding.
+    Get the embedding for a query, served from the embedding cache when possible.
 
     Args:
         text (str): Query text
-        n_results (int): Number of results to return
-        model_name (str): Deprecated, kept for compatibility
 
     Returns:
-        dict: Search results with cosine similarities
+        list: Embedding vector
     """
-    start_time = time.time()
+    cache = get_embedding_cache(namespace=EMBEDDING_API_ENDPOINT)
+    with observe_stage("embed"):
+        if cache is None:
+            return get_embedding_from_api(text)
+        return cache.get_or_compute(text, get_embedding_from_api)
 
-    # Get embedding from API
-    embedding_from_text = get_embedding_from_api(text)
 
-    start_query_time = time.time()
-    results = collection.query(
-        query_embeddings=embedding_from_text,
-        n_results=n_results,
-        # where={"source": "article"},        # Tùy chọn: Lọc theo metadata (AND logic)
-        # where_document={"$contains":"leave"} # Tùy chọn: Lọc theo nội dung document
+def peek_query_embedding(text):
+    """Return the cached embedding of a query without calling the API (or None)."""
+    cache = get_embedding_cache(namespace=EMBEDDING_API_ENDPOINT)
+    return cache.peek(text) if cache is not None else None
+
+
+_chroma_version = None
+_chroma_version_checked_at = 0.0
+_chroma_version_lock = threading.Lock()
+
+
+def _claim_version_refresh():
+    """True for the one caller that should re-read the Chroma collection version."""
+    # pylint: disable=global-statement
+    global _chroma_version_checked_at
+    with _chroma_version_lock:
+        now = time.time()
+        if (
+            _chroma_version is not None
+            and now - _chroma_version_checked_at < COLLECTION_VERSION_TTL
+        ):
+            return False
+        _chroma_version_checked_at = now
+        return True
+
+
+def _set_chroma_version(count, metadata):
+    # pylint: disable=global-statement
+    global _chroma_version
+    metadata_digest = hashlib.sha1(
+        json.dumps(metadata or {}, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:12]
+    version = f"chroma:{COLLECTION_NAME}:{count}:{metadata_digest}"
+    if _chroma_version is None:
+        logger.info(
+            "Collection version %s, derived from the record count and metadata "
+            "(set COLLECTION_VERSION after updating records in place)",
+            version,
+        )
+    elif version != _chroma_version:
+        logger.info("Collection changed (%s), cached results are invalidated", version)
+    _chroma_version = version
+
+
+def _chroma_version_failed(error):
+    # pylint: disable=global-statement
+    global _chroma_version
+    logger.warning("Could not read the collection version: %s", error)
+    if _chroma_version is None:
+        _chroma_version = f"chroma:{COLLECTION_NAME}"
+
+
+def get_collection_version():
+    """
+    Identity of the data behind retrieval, used to invalidate cached results
+    and answers.
+
+    COLLECTION_VERSION overrides it. The local backend uses its snapshot
+    timestamp; Chroma Cloud the collection's record count and metadata,
+    re-read at most every COLLECTION_VERSION_TTL seconds.
+    """
+    version = os.getenv("COLLECTION_VERSION")
+    if version:
+        return version
+    if RETRIEVAL_BACKEND == "local":
+        return f"local:{get_collection().manifest.get('created_at', 0)}"
+    if _claim_version_refresh():
+        try:
+            collection = get_collection()
+            _set_chroma_version(collection.count(), collection.metadata)
+        except Exception as e:  # pylint: disable=broad-except
+            _chroma_version_failed(e)
+    return _chroma_version
+
+
+async def get_collection_version_async():
+    """Async version of get_collection_version, using the async Chroma client."""
+    if os.getenv("COLLECTION_VERSION") or RETRIEVAL_BACKEND == "local":
+        return get_collection_version()
+    if _claim_version_refresh():
+        try:
+            collection = await get_async_collection()
+            _set_chroma_version(await collection.count(), collection.metadata)
+        except Exception as e:  # pylint: disable=broad-except
+            _chroma_version_failed(e)
+    return _chroma_version
+
+
+async def get_embedding_from_api_async(text, max_retries=3, timeout=30):
+    """
+    Async version of get_embedding_from_api; waits with asyncio.sleep between retries.
+
+    Args:
+        text (str): Input text to embed
+        max_retries (int): Maximum number of retry attempts
+        timeout (int): Request timeout in seconds
+
+    Returns:
+        list: Embedding vector
+
+    Raises:
+        BulkheadFullError: If the embedding stage is saturated
+        CircuitOpenError: If the embedding API circuit is open
+        Exception: If all retry attempts fail
+    """
+    async with get_bulkhead("embedding").slot():
+        return await _embed_with_retries_async(text, max_retries, timeout)
+
+
+async def _embed_with_retries_async(text, max_retries=3, timeout=30):
+    breaker = get_circuit_breaker("embedding_api")
+    for attempt in range(max_retries):
+        breaker.before_call()
+        try:
+            with start_span(
+                "embedding.request", text_length=len(text), attempt=attempt + 1
+            ):
+                embedding = await get_embedding_client().aembed_hedged(
+                    text, timeout=timeout
+                )
+            breaker.record_success()
+            logger.info(
+                "Successfully got embedding from API (attempt %d) for text length: %d",
+                attempt + 1,
+                len(text),
+            )
+            return embedding
+
+        except Exception as e:
+            breaker.record_failure()
+            logger.warning(
+                "Attempt %d failed to get embedding from API: %s", attempt + 1, str(e)
+            )
+
+            if attempt < max_retries - 1:
+                wait_time = (attempt + 1) * 1
+                logger.info("Retrying in %d seconds...", wait_time)
+                await asyncio.sleep(wait_time)
+            else:
+                logger.error(
+                    "All %d attempts failed to get embedding from API", max_retries
+                )
+                raise Exception(
+                    f"Failed to get embedding after {max_retries} attempts: {str(e)}"
+                )
+
+
+async def get_query_embedding_async(text, admitted=False):
+    """
+    Async version of get_query_embedding.
+
+    Concurrent calls for the same normalized question share one cache lookup
+    and embedding call (single-flight), whatever their n_results.
+
+    Args:
+        text (str): Query text
+        admitted (bool): The caller already holds an embedding bulkhead slot
+            (batch search takes one slot for the whole batch)
+    """
+    return await get_single_flight("embedding").do(
+        normalize_query(text), _get_query_embedding_async, text, admitted
     )
-    end_query_time = time.time()
 
+
+async def _get_query_embedding_async(text, admitted=False):
+    compute = _embed_with_retries_async if admitted else get_embedding_from_api_async
+    cache = get_embedding_cache(namespace=EMBEDDING_API_ENDPOINT)
+    with observe_stage("embed"):
+        if cache is None:
+            return await compute(text)
+        return await cache.aget_or_compute(text, compute)
+
+
+_async_collection = None
+_async_collection_lock = None
+
+
+async def get_async_collection():
+    """Get the shared async Chroma collection, connecting on first use."""
+    # pylint: disable=global-statement
+    global _async_collection, _async_collection_lock
+    if _async_collection is not None:
+        return _async_collection
+    if _async_collection_lock is None:
+        _async_collection_lock = asyncio.Lock()
+    async with _async_collection_lock:
+        if _async_collection is None:
+            _async_collection = (await init_chroma_index_async())[1]
+    return _async_collection
+
+
+def _project(results, include):
+    """Drop the fields that were not requested, like Chroma does."""
+    if results is None:
+        return None
+    results = dict(results)
+    for key in ("metadatas", "documents", "embeddings"):
+        if key not in include:
+            results[key] = None
+    return results
+
+
+def _lexical_results(text, n_results, include=DEFAULT_INCLUDE):
+    bm25_index = get_bm25_index()
+    if bm25_index is None:
+        return None
+    return _project(bm25_index.query(query_texts=[text], n_results=n_results), include)
+
+
+def _get_query_embedding_within_budget(text):
+    """
+    Get the query embedding, or None when the BM25 fallback should answer instead
+    (embedding slower than EMBEDDING_LATENCY_BUDGET_MS, or failed).
+    """
+    if get_bm25_index() is None:
+        return get_query_embedding(text)
+    try:
+        if EMBEDDING_LATENCY_BUDGET_MS > 0:
+            # The call keeps running in the background and still fills the cache
+            future = _budget_executor.submit(get_query_embedding, text)
+            return future.result(timeout=EMBEDDING_LATENCY_BUDGET_MS / 1000)
+        return get_query_embedding(text)
+    except FutureTimeoutError:
+        logger.warning(
+            "Embedding exceeded %.0fms budget, using lexical search",
+            EMBEDDING_LATENCY_BUDGET_MS,
+        )
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning("Embedding failed (%s), using lexical search", e)
+    return None
+
+
+async def _get_query_embedding_within_budget_async(text, admitted=False):
+    """Async version of _get_query_embedding_within_budget."""
+    if get_bm25_index() is None:
+        return await get_query_embedding_async(text, admitted)
+    try:
+        if EMBEDDING_LATENCY_BUDGET_MS > 0:
+            # shield: the embedding call survives the timeout and still fills the cache
+            return await asyncio.wait_for(
+                asyncio.shield(get_query_embedding_async(text, admitted)),
+                timeout=EMBEDDING_LATENCY_BUDGET_MS / 1000,
+            )
+        return await get_query_embedding_async(text, admitted)
+    except asyncio.TimeoutError:
+        logger.warning(
+            "Embedding exceeded %.0fms budget, using lexical search",
+            EMBEDDING_LATENCY_BUDGET_MS,
+        )
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning("Embedding failed (%s), using lexical search", e)
+    return None
+
+
+def _normalize_include(include):
+    """
+    Chroma ``include`` list as a hashable tuple that always has distances.
+
+    None means the default fields; an empty list means distances only
+    (ids always come back).
+    """
+    if include is None:
+        return DEFAULT_INCLUDE
+    return tuple(sorted(set(include) | {"distances"}))
+
+
+def _retrieval_cache(include):
+    """Shared result cache for a search, or None when results are not cached."""
+    if "embeddings" in include:
+        # Vectors would make entries ~50x larger than the chunks they describe
+        return None
+    return get_shared_cache()
+
+
+def _retrieval_cache_parts(text, n_results, include):
+    return [
+        normalize_query(text),
+        n_results,
+        list(include),
+        RETRIEVAL_MODE,
+        RETRIEVAL_BACKEND,
+    ]
+
+
+def _cache_value(results):
+    return {
+        key: results.get(key)
+        for key in ("ids", "distances", "metadatas", "documents", "fused_scores")
+    }
+
+
+def _enhance_results(results):
     # Tính cosine similarity từ distances (ChromaDB trả về cosine distances)
     # Cosine similarity = 1 - cosine distance
-    logger.info(
-        "Time to run with retrieving is %f",
-        float(end_query_time - start_query_time),
-    )
     cosine_similarities = []
     if results["distances"] and len(results["distances"][0]) > 0:
         cosine_similarities = [1 - distance for distance in results["distances"][0]]
     # Tạo dictionary mới với cosine similarities
-    enhanced_results = {
+    return {
         "ids": results["ids"],
         "distances": results["distances"],
         "metadatas": results["metadatas"],
         "documents": results["documents"],
-        "embeddings": results["embeddings"],
+        "embeddings": results.get("embeddings"),
         "cosine_similarities": [cosine_similarities],
+        # Ranking scores of hybrid (RRF) and lexical results, not similarities
+        "fused_scores": results.get("fused_scores"),
+        "lexical_scores": results.get("lexical_scores"),
     }
+
+
+def search_relevant_embeddings(text, n_results=5, model_name=None, include=None):
+    """
+    Search for relevant embeddings using API-based embedding.
+
+    Vector and hybrid results are kept in the shared result cache (see
+    src/cache/shared.py), keyed by the normalized question and the
+    collection version, so every worker process reuses them.
+
+    Args:
+        text (str): Query text
+        n_results (int): Number of results to return
+        model_name (str): Deprecated, kept for compatibility
+        include (list): Chroma fields to fetch ("metadatas", "documents",
+            "embeddings"; distances are always fetched). Defaults to
+            DEFAULT_INCLUDE
+
+    Returns:
+        dict: Search results with cosine similarities
+    """
+    start_time = time.time()
+    include = _normalize_include(include)
+
+    # Câu hỏi trích dẫn rõ điều luật: trả về trực tiếp, không cần embedding
+    direct_results = lookup_citation(text, n_results)
+    if direct_results is not None:
+        return _enhance_results(_project(direct_results, include))
+
+    if RETRIEVAL_MODE == "lexical":
+        lexical_results = _lexical_results(text, n_results, include)
+        if lexical_results is not None:
+            return _enhance_results(lexical_results)
+
+    # Kết quả đã được worker khác tính (cùng câu hỏi, cùng collection)
+    cache = _retrieval_cache(include)
+    if cache is not None:
+        cache_parts = _retrieval_cache_parts(text, n_results, include)
+        version = get_collection_version()
+        cached_results = cache.get("retrieval", cache_parts, version)
+        if cached_results is not None:
+            return _enhance_results(cached_results)
+
+    # Get embedding from cache or API
+    embedding_from_text = _get_query_embedding_within_budget(text)
+    if embedding_from_text is None:
+        return _enhance_results(_lexical_results(text, n_results, include))
+
+    hybrid = RETRIEVAL_MODE == "hybrid" and get_bm25_index() is not None
+    start_query_time = time.time()
+    with (
+        observe_stage("vector_query"),
+        start_span("chroma.query", n_results=n_results * 2 if hybrid else n_results),
+    ):
+        results = get_collection().query(
+            query_embeddings=embedding_from_text,
+            n_results=n_results * 2 if hybrid else n_results,
+            include=list(include),
+            # where={"source": "article"},        # Tùy chọn: Lọc theo metadata (AND logic)
+            # where_document={"$contains":"leave"} # Tùy chọn: Lọc theo nội dung document
+        )
+    end_query_time = time.time()
+    if hybrid:
+        results = reciprocal_rank_fusion(
+            results, _lexical_results(text, n_results * 2, include), n_results
+        )
+    if cache is not None:
+        cache.set("retrieval", cache_parts, _cache_value(results), version)
+
+    logger.info(
+        "Time to run with retrieving is %f",
+        float(end_query_time - start_query_time),
+    )
+    enhanced_results = _enhance_results(results)
+    end_time = time.time()
+    logger.info("Time to run search_embeddings is %f", float(end_time - start_time))
+    return enhanced_results
+
+
+async def _query_collection_async(query_embeddings, n_results, include=DEFAULT_INCLUDE):
+    with (
+        observe_stage("vector_query"),
+        start_span(
+            "chroma.query",
+            n_results=n_results,
+            # One flat vector or a list of vectors (batch search)
+            query_count=(
+                len(query_embeddings)
+                if query_embeddings and isinstance(query_embeddings[0], (list, tuple))
+                else 1
+            ),
+            backend=RETRIEVAL_BACKEND,
+        ),
+    ):
+        return await _query_collection_in_slot(query_embeddings, n_results, include)
+
+
+async def _query_collection_in_slot(query_embeddings, n_results, include):
+    async with get_bulkhead("vector_query").slot():
+        if RETRIEVAL_BACKEND == "local":
+            # Exact search is CPU-bound (a few ms); keep it off the event loop
+            return await asyncio.to_thread(
+                get_collection().query,
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                include=list(include),
+            )
+        async_collection = await get_async_collection()
+        # Only the requested fields are fetched and deserialized
+        return await async_collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            include=list(include),
+        )
+
+
+async def search_relevant_embeddings_async(text, n_results=5, include=None):
+    """
+    Async-native search: awaits the embedding client and Chroma's async HTTP client
+    so concurrent requests interleave on the event loop.
+
+    Identical in-flight searches (same normalized question, n_results and
+    include) are coalesced into one; the shared result must not be mutated.
+
+    Args:
+        text (str): Query text
+        n_results (int): Number of results to return
+        include (list): Chroma fields to fetch, see search_relevant_embeddings
+
+    Returns:
+        dict: Search results with cosine similarities (same shape as
+        search_relevant_embeddings)
+    """
+    include = _normalize_include(include)
+    return await get_single_flight("retrieval").do(
+        (normalize_query(text), n_results, include),
+        _search_relevant_embeddings_async,
+        text,
+        n_results,
+        include,
+    )
+
+
+async def _search_relevant_embeddings_async(text, n_results, include):
+    start_time = time.time()
+
+    direct_results = lookup_citation(text, n_results)
+    if direct_results is not None:
+        return _enhance_results(_project(direct_results, include))
+
+    if RETRIEVAL_MODE == "lexical" and get_bm25_index() is not None:
+        return _enhance_results(
+            await asyncio.to_thread(_lexical_results, text, n_results, include)
+        )
+
+    cache = _retrieval_cache(include)
+    if cache is not None:
+        cache_parts = _retrieval_cache_parts(text, n_results, include)
+        version = await get_collection_version_async()
+        cached_results = await cache.aget("retrieval", cache_parts, version)
+        if cached_results is not None:
+            return _enhance_results(cached_results)
+
+    embedding_from_text = await _get_query_embedding_within_budget_async(text)
+    if embedding_from_text is None:
+        # BM25 fallback results are not cached: the next request may embed in time
+        return _enhance_results(
+            await asyncio.to_thread(_lexical_results, text, n_results, include)
+        )
+
+    hybrid = RETRIEVAL_MODE == "hybrid" and get_bm25_index() is not None
+    n_candidates = n_results * 2 if hybrid else n_results
+    start_query_time = time.time()
+    results = await _query_collection_async(embedding_from_text, n_candidates, include)
+    end_query_time = time.time()
+    if hybrid:
+        lexical_results = await asyncio.to_thread(
+            _lexical_results, text, n_candidates, include
+        )
+        results = reciprocal_rank_fusion(results, lexical_results, n_results)
+    if cache is not None:
+        await cache.aset("retrieval", cache_parts, _cache_value(results), version)
+    logger.info(
+        "Time to run with retrieving is %f",
+        float(end_query_time - start_query_time),
+    )
+    enhanced_results = _enhance_results(results)
     end_time = time.time()
     logger.info("Time to run search_embeddings is %f", float(end_time - start_time))
     return enhanced_results
 
 
+def _slice_query(results, i, n_results):
+    return {
+        key: [results[key][i][:n_results]] if results.get(key) else None
+        for key in ("ids", "distances", "metadatas", "documents", "embeddings")
+    }
+
+
+async def search_relevant_embeddings_batch_async(texts, n_results_list, include=None):
+    """
+    Search many queries at once: embeddings are requested together (merged into
+    one upstream batch by the embedding client) and the collection is queried
+    once with all query embeddings.
+
+    Each query goes through the same selection as search_relevant_embeddings
+    (citation lookup, RETRIEVAL_MODE, shared result cache, BM25 fallback when
+    its embedding is over budget or fails).
+
+    Args:
+        texts (list): Query texts
+        n_results_list (list): Number of results for each query
+        include (list): Chroma fields to fetch, see search_relevant_embeddings
+
+    Returns:
+        list: One entry per query, in input order: a result dict (same shape
+        as search_relevant_embeddings), or the exception that failed that
+        query when there is no fallback for it
+    """
+    start_time = time.time()
+    include = _normalize_include(include)
+    cache = _retrieval_cache(include)
+    version = await get_collection_version_async() if cache is not None else None
+    lexical_only = RETRIEVAL_MODE == "lexical" and get_bm25_index() is not None
+    outputs = [None] * len(texts)
+    pending = []
+    for i, (text, n_results) in enumerate(zip(texts, n_results_list)):
+        direct_results = lookup_citation(text, n_results)
+        if direct_results is not None:
+            outputs[i] = _enhance_results(_project(direct_results, include))
+            continue
+        if lexical_only:
+            outputs[i] = _enhance_results(
+                await asyncio.to_thread(_lexical_results, text, n_results, include)
+            )
+            continue
+        if cache is not None:
+            cached_results = await cache.aget(
+                "retrieval", _retrieval_cache_parts(text, n_results, include), version
+            )
+            if cached_results is not None:
+                outputs[i] = _enhance_results(cached_results)
+                continue
+        pending.append(i)
+
+    embedded = []
+    if pending:
+        async with get_bulkhead("embedding").slot():
+            embeddings = await asyncio.gather(
+                *(
+                    _get_query_embedding_within_budget_async(texts[i], admitted=True)
+                    for i in pending
+                ),
+                return_exceptions=True,
+            )
+        for i, embedding in zip(pending, embeddings):
+            if isinstance(embedding, BaseException):
+                # No BM25 index to fall back on; the other queries go ahead
+                logger.warning("Embedding failed for batch query %d: %s", i, embedding)
+                outputs[i] = embedding
+            elif embedding is None:
+                outputs[i] = _enhance_results(
+                    await asyncio.to_thread(
+                        _lexical_results, texts[i], n_results_list[i], include
+                    )
+                )
+            else:
+                embedded.append((i, embedding))
+
+    if embedded:
+        hybrid = RETRIEVAL_MODE == "hybrid" and get_bm25_index() is not None
+        max_results = max(n_results_list[i] for i, _ in embedded)
+        if hybrid:
+            max_results *= 2
+        results = await _query_collection_async(
+            [embedding for _, embedding in embedded], max_results, include
+        )
+        for row, (i, _) in enumerate(embedded):
+            n_results = n_results_list[i]
+            if hybrid:
+                item = _slice_query(results, row, n_results * 2)
+                lexical_results = await asyncio.to_thread(
+                    _lexical_results, texts[i], n_results * 2, include
+                )
+                item = reciprocal_rank_fusion(item, lexical_results, n_results)
+            else:
+                item = _slice_query(results, row, n_results)
+            if cache is not None:
+                await cache.aset(
+                    "retrieval",
+                    _retrieval_cache_parts(texts[i], n_results, include),
+                    _cache_value(item),
+                    version,
+                )
+            outputs[i] = _enhance_results(item)
+
+    logger.info(
+        "Batch search of %d queries (%d embedded) took %f",
+        len(texts),
+        len(embedded),
+        float(time.time() - start_time),
+    )
+    return outputs
+
+
 if __name__ == "__main__":
+    setup_logging()
     test_text = "Chương I điều 2 bộ luật hình sự."
 
     # Test với API embedding
@@ -0,0 +1,105 @@
+"""Test environment: offline backends, no disk caches, no network."""
+
+import os
+import sys
+
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, str(root))
+
+# Read at import time by the modules under test, so set before they load
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["SHARED_CACHE_BACKEND"] = "none"
+os.environ["ENABLE_EMBEDDING_CACHE"] = "false"
+os.environ["ENABLE_ANSWER_CACHE"] = "false"
+os.environ["RETRIEVAL_BACKEND"] = "chroma"
+os.environ["RETRIEVAL_MODE"] = "vector"
+os.environ.setdefault("x-chromadb-token", "test")
+
+
+class RecordingCollection:
+    """Async Chroma collection stand-in that records each query."""
+
+    def __init__(self):
+        self.includes = []
+        self.query_counts = []
+
+    async def query(self, query_embeddings, n_results=5, include=None, **_):
+        self.includes.append(tuple(include))
+        count = len(query_embeddings) if isinstance(query_embeddings[0], list) else 1
+        self.query_counts.append(count)
+        row_ids = [f"chunk-{i}" for i in range(n_results)]
+        return {
+            "ids": [row_ids] * count,
+            "distances": [[0.1 * (i + 1) for i in range(n_results)]] * count,
+            "metadatas": (
+                [[{"i": i} for i in range(n_results)]] * count
+                if "metadatas" in include
+                else None
+            ),
+            "documents": (
+                [[f"doc {i}" for i in range(n_results)]] * count
+                if "documents" in include
+                else None
+            ),
+            "embeddings": None,
+        }
+
+
+class FakeLexicalIndex:
+    """BM25 index stand-in returning ``lexical-*`` ids."""
+
+    def __init__(self):
+        self.queries = []
+
+    def query(self, query_texts, n_results=5):
+        self.queries.append(query_texts[0])
+        row_ids = [f"lexical-{i}" for i in range(n_results)]
+        return {
+            "ids": [row_ids],
+            "distances": [[1.0] * n_results],
+            "metadatas": [[{}] * n_results],
+            "documents": [[f"lexical doc {i}" for i in range(n_results)]],
+            "embeddings": None,
+            "lexical_scores": [[0.5] * n_results],
+        }
+
+
+@pytest.fixture
+def retrieval_stub(monkeypatch):
+    """
+    Offline retrieval: a RecordingCollection, a fixed embedding (or the
+    exception/None mapped to a question in ``stub.embeddings``) and no
+    citation matches or BM25 index unless ``stub.use_lexical_index()``.
+    """
+    # pylint: disable=import-outside-toplevel
+    from src.store_vector import search_embeddings
+
+    class Stub:
+        def __init__(self):
+            self.collection = RecordingCollection()
+            self.lexical_index = FakeLexicalIndex()
+            self.embeddings = {}
+
+        def use_lexical_index(self):
+            monkeypatch.setattr(
+                search_embeddings, "get_bm25_index", lambda: self.lexical_index
+            )
+
+    stub = Stub()
+
+    async def get_async_collection():
+        return stub.collection
+
+    async def embed(text, admitted=False):  # pylint: disable=unused-argument
+        outcome = stub.embeddings.get(text, [0.1, 0.2, 0.3])
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(search_embeddings, "get_async_collection", get_async_collection)
+    monkeypatch.setattr(search_embeddings, "get_query_embedding_async", embed)
+    monkeypatch.setattr(search_embeddings, "lookup_citation", lambda *_: None)
+    monkeypatch.setattr(search_embeddings, "get_bm25_index", lambda: None)
+    return stub
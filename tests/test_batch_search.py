@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import retrieve
+from src.store_vector import search_embeddings
+
+
+def _search(texts, n_results_list):
+    return asyncio.run(
+        search_embeddings.search_relevant_embeddings_batch_async(texts, n_results_list)
+    )
+
+
+def test_lexical_mode_skips_embedding_and_vector_query(retrieval_stub, monkeypatch):
+    retrieval_stub.use_lexical_index()
+    monkeypatch.setattr(search_embeddings, "RETRIEVAL_MODE", "lexical")
+    outputs = _search(["một", "hai"], [2, 3])
+    assert retrieval_stub.collection.query_counts == []
+    assert retrieval_stub.lexical_index.queries == ["một", "hai"]
+    assert [len(output["ids"][0]) for output in outputs] == [2, 3]
+
+
+def test_failed_embedding_falls_back_to_bm25(retrieval_stub):
+    retrieval_stub.use_lexical_index()
+    retrieval_stub.embeddings["chậm"] = ConnectionError("embedding API down")
+    outputs = _search(["nhanh", "chậm"], [2, 2])
+    # Only the embedded question reaches the collection
+    assert retrieval_stub.collection.query_counts == [1]
+    assert outputs[0]["ids"][0] == ["chunk-0", "chunk-1"]
+    assert outputs[1]["ids"][0] == ["lexical-0", "lexical-1"]
+
+
+def test_failed_embedding_without_fallback_fails_only_its_question(retrieval_stub):
+    error = ConnectionError("embedding API down")
+    retrieval_stub.embeddings["hỏng"] = error
+    outputs = _search(["một", "hỏng", "hai"], [1, 1, 1])
+    assert outputs[1] is error
+    assert outputs[0]["ids"][0] == ["chunk-0"]
+    assert retrieval_stub.collection.query_counts == [2]
+
+
+def test_batch_endpoint_reports_per_question_errors(retrieval_stub):
+    retrieval_stub.embeddings["hỏng"] = ConnectionError("embedding API down")
+    app = FastAPI()
+    app.include_router(retrieve.router)
+    for stream in (False, True):
+        response = TestClient(app).post(
+            "/retrieve/batch",
+            json={
+                "items": [{"question": "một"}, {"question": "hỏng"}],
+                "stream": stream,
+            },
+        )
+        assert response.status_code == 200
+        lines = (
+            [json.loads(line) for line in response.text.splitlines()]
+            if stream
+            else response.json()
+        )
+        assert "results" in lines[0]
+        assert lines[1]["error"]["type"] == "upstream_unavailable"
+
+
+def test_stream_reports_errors_for_a_failed_chunk(retrieval_stub, monkeypatch):
+    async def query(*_, **__):
+        raise asyncio.TimeoutError()
+
+    monkeypatch.setattr(retrieval_stub.collection, "query", query)
+    monkeypatch.setattr(retrieve, "BATCH_CHUNK_SIZE", 2)
+    app = FastAPI()
+    app.include_router(retrieve.router)
+    response = TestClient(app).post(
+        "/retrieve/batch",
+        json={"items": [{"question": f"câu {i}"} for i in range(3)], "stream": True},
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert {line["error"]["type"] for line in lines} == {"upstream_unavailable"}
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from src.retrieval.bm25 import reciprocal_rank_fusion
+from src.retrieval.bm25_index import BM25Index, build_bm25_index
+from src.store_vector import search_embeddings
+
+DOCUMENTS = [
+    "Điều 1. Thế chấp tàu biển phải được đăng ký.",
+    "Điều 2. Người lao động được nghỉ hằng năm.",
+    "Điều 3. Tàu biển Việt Nam phải mang cờ quốc tịch.",
+]
+
+
+def _index(tmp_path):
+    ids = [f"c{i}" for i in range(len(DOCUMENTS))]
+    metadatas = [{"section_title": i + 1} for i in range(len(DOCUMENTS))]
+    build_bm25_index(ids, DOCUMENTS, metadatas, str(tmp_path))
+    return BM25Index.load(str(tmp_path))
+
+
+def test_records_are_read_back_from_the_mapped_files(tmp_path):
+    index = _index(tmp_path)
+    results = index.query("thế chấp tàu biển", n_results=2)
+    assert results["ids"] == [["c0", "c2"]]
+    assert results["documents"][0][0] == DOCUMENTS[0]
+    assert results["metadatas"][0] == [{"section_title": 1}, {"section_title": 3}]
+    assert index.query("hợp đồng bảo hiểm")["ids"] == [[]]
+
+
+def test_unaccented_query_matches_accented_terms(tmp_path):
+    results = _index(tmp_path).query("nguoi lao dong nghi", n_results=1)
+    assert results["ids"] == [["c1"]]
+
+
+def test_lexical_scores_reflect_query_coverage(tmp_path):
+    index = _index(tmp_path)
+    full = index.query("thế chấp tàu biển", n_results=1)
+    partial = index.query("thế chấp tàu biển, người lao động", n_results=1)
+    # BM25 hits carry no cosine similarity
+    assert full["distances"] == partial["distances"] == [[1.0]]
+    assert 0.0 < partial["lexical_scores"][0][0] < full["lexical_scores"][0][0] < 1.0
+
+
+def test_fusion_keeps_vector_distances():
+    vector = {
+        "ids": [["weak", "both"]],
+        "distances": [[0.7, 0.75]],
+        "metadatas": None,
+        "documents": None,
+    }
+    lexical = {
+        "ids": [["lexical", "both"]],
+        "distances": [[1.0, 1.0]],
+        "metadatas": None,
+        "documents": None,
+    }
+    fused = reciprocal_rank_fusion(vector, lexical, n_results=3)
+    assert fused["ids"] == [["both", "weak", "lexical"]]
+    assert fused["distances"] == [[0.75, 0.7, 1.0]]
+    assert fused["fused_scores"][0][0] > fused["fused_scores"][0][1]
+
+
+def test_hybrid_search_reports_the_weak_vector_match(retrieval_stub, monkeypatch):
+    async def query(query_embeddings, n_results=5, include=None, **_):
+        return {
+            "ids": [["chunk-0"]],
+            "distances": [[0.8]],
+            "metadatas": [[{}]],
+            "documents": [["doc 0"]],
+            "embeddings": None,
+        }
+
+    retrieval_stub.use_lexical_index()
+    monkeypatch.setattr(retrieval_stub.collection, "query", query)
+    monkeypatch.setattr(search_embeddings, "RETRIEVAL_MODE", "hybrid")
+    results = asyncio.run(search_embeddings.search_relevant_embeddings_async("tàu"))
+    similarities = dict(zip(results["ids"][0], results["cosine_similarities"][0]))
+    assert similarities["chunk-0"] == pytest.approx(0.2)
+    assert similarities["lexical-0"] == 0.0
+    assert max(similarities.values()) < 0.5
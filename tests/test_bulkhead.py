@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from src.concurrency.bulkhead import Bulkhead, BulkheadFullError
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_bulkhead_rejects_429_when_queue_is_full():
+    async def scenario():
+        bulkhead = Bulkhead("test", max_concurrent=1, max_queue=1, queue_timeout=5)
+        await bulkhead.acquire()
+        queued = asyncio.create_task(bulkhead.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(BulkheadFullError) as error:
+            await bulkhead.acquire()
+        bulkhead.release()
+        await queued
+        return error.value, bulkhead.stats()
+
+    error, stats = _run(scenario())
+    assert (error.stage, error.status_code) == ("test", 429)
+    assert error.retry_after >= 1
+    assert (stats["admitted"], stats["rejected_full"], stats["active"]) == (2, 1, 1)
+
+
+def test_bulkhead_rejects_503_when_wait_times_out():
+    async def scenario():
+        bulkhead = Bulkhead("test", max_concurrent=1, max_queue=4, queue_timeout=0.01)
+        await bulkhead.acquire()
+        with pytest.raises(BulkheadFullError) as error:
+            await bulkhead.acquire()
+        bulkhead.release()
+        return error.value, bulkhead.stats()
+
+    error, stats = _run(scenario())
+    assert error.status_code == 503
+    assert (stats["rejected_timeout"], stats["queued"], stats["active"]) == (1, 0, 0)
@@ -0,0 +1,51 @@
+import pytest
+
+from src.retrieval.citation import Citation, CitationIndex, parse_citation
+
+
+@pytest.mark.parametrize(
+    "question, expected",
+    [
+        (
+            "Chương II điều 29 bộ luật hàng hải nói gì?",
+            Citation(article=29, law="luat hang hai", chapter=2),
+        ),
+        (
+            "Khoản 2 Điều 35 Luật Lao động quy định gì?",
+            Citation(article=35, law="luat lao dong", clause=2),
+        ),
+        (
+            "chuong 3 dieu 12 khoan 1 luat dat dai 2013",
+            Citation(article=12, law="luat dat dai 2013", chapter=3, clause=1),
+        ),
+        ("Điều 5 quy định gì?", Citation(article=5)),
+        ("Luật lao động nói gì về thử việc?", None),
+    ],
+)
+def test_parse_citation(question, expected):
+    assert parse_citation(question) == expected
+
+
+def _index():
+    metadata = {"title": "Bộ luật Lao động", "section_title": 35}
+    documents = {
+        "c1": "Điều 35.\n1. Người lao động ...",
+        "c2": "2. Người sử dụng lao động ...",
+        "c3": "3. Trường hợp 2. khác ...",
+    }
+    return CitationIndex(
+        laws={"luat lao dong": "Bộ luật Lao động"},
+        articles={"luat lao dong|35": list(documents)},
+        chunks={
+            chunk_id: {"document": document, "metadata": metadata, "chapter": 3}
+            for chunk_id, document in documents.items()
+        },
+    )
+
+
+def test_lookup_puts_the_cited_clause_first():
+    index = _index()
+    results = index.lookup(parse_citation("khoản 2 điều 35 luật lao động"))
+    assert results["ids"] == [["c2", "c1", "c3"]]
+    results = index.lookup(parse_citation("Điều 35 Bộ luật Lao động"))
+    assert results["ids"] == [["c1", "c2", "c3"]]
@@ -0,0 +1,49 @@
+import asyncio
+
+from app import rag
+from services import tools
+
+
+class FlakyRouter:
+    """Model router whose first call fails with a network error."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def generate(self, prompt, question, scores, timeout=60):
+        self.calls.append((question, scores, timeout))
+        if len(self.calls) == 1:
+            raise ConnectionError("reset by peer")
+        return "Theo điều 29 ...", "fast"
+
+
+def _patch(monkeypatch, module):
+    router, stored = FlakyRouter(), []
+
+    async def lookup_answer(*_):
+        return None, "key"
+
+    async def store_answer(cache_key, answer, seconds):
+        stored.append((cache_key, answer))
+
+    monkeypatch.setattr(module, "get_model_router", lambda: router)
+    monkeypatch.setattr(module, "lookup_answer", lookup_answer)
+    monkeypatch.setattr(module, "store_answer", store_answer)
+    return router, stored
+
+
+def test_rag_retry_goes_through_the_router_and_is_cached(monkeypatch):
+    router, stored = _patch(monkeypatch, rag)
+    answer = asyncio.run(rag.ask_LLM(["Điều 29 ..."], "điều 29?", [0.9]))
+    assert answer == "Theo điều 29 ..."
+    assert router.calls == [("điều 29?", [0.9], 60), ("điều 29?", [0.9], 15)]
+    assert stored == [("key", answer)]
+
+
+def test_generate_answer_retry_goes_through_the_router_and_is_cached(monkeypatch):
+    router, stored = _patch(monkeypatch, tools)
+    data = tools.GenerateInput(question="điều 29?", chunks=["Điều 29 ..."])
+    output = asyncio.run(tools.generate_answer(data))
+    assert output.answer == "Theo điều 29 ..."
+    assert [call[2] for call in router.calls] == [60, 15]
+    assert stored == [("key", output.answer)]
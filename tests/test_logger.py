@@ -0,0 +1,29 @@
+import logging
+from decimal import Decimal
+
+import numpy as np
+
+from configs.logger import AsyncQueueHandler
+
+
+def _message(msg, *args, limit=20):
+    handler = AsyncQueueHandler([], dispatcher=None, max_field_chars=limit)
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+    return handler.prepare(record).msg
+
+
+def test_numeric_arguments_keep_their_format():
+    message = _message(
+        "%d chunks, score %.2f, %s, %d",
+        np.int64(3),
+        np.float32(0.5),
+        Decimal("1.5"),
+        True,
+    )
+    assert message == "3 chunks, score 0.50, 1.5, 1"
+
+
+def test_long_text_and_containers_are_capped():
+    assert _message("%s", "x" * 50) == "x" * 20 + "...(+30 chars)"
+    assert _message("%s", list(range(50))).endswith("chars)")
+    assert _message("%r", [1, 2]) == "[1, 2]"
@@ -0,0 +1,64 @@
+import numpy as np
+
+from src.store_vector.local_index import LocalVectorIndex, _normalize_rows
+from src.store_vector.quantization import (
+    ProductQuantizer,
+    QuantizedVectorIndex,
+    ScalarQuantizer,
+)
+
+N_ROWS, DIM, K = 2000, 64, 10
+
+
+def _synthetic_matrix(seed=0):
+    # Clustered rows look more like real embeddings than isotropic noise
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(40, DIM))
+    rows = centers[rng.integers(0, len(centers), N_ROWS)]
+    rows = rows + rng.normal(scale=0.5, size=(N_ROWS, DIM))
+    return _normalize_rows(rows.astype(np.float32)), rng
+
+
+def _queries(matrix, rng, n_queries=50):
+    rows = rng.choice(matrix.shape[0], n_queries, replace=False)
+    noise = rng.normal(0, 0.02, (n_queries, DIM)).astype(np.float32)
+    return _normalize_rows(matrix[rows] + noise)
+
+
+def _recall(matrix, quantizer, queries):
+    ids = [str(i) for i in range(matrix.shape[0])]
+    exact = LocalVectorIndex(matrix, ids, ids, [{}] * len(ids))
+    approx = QuantizedVectorIndex(
+        matrix, ids, ids, [{}] * len(ids), {}, quantizer, quantizer.encode(matrix)
+    )
+    exact_top = exact.search(queries, K)[0]
+    approx_top = approx.search(queries, K)[0]
+    return np.mean([len(set(a) & set(e)) / K for a, e in zip(approx_top, exact_top)])
+
+
+def test_int8_round_trip_error_is_within_half_a_step():
+    matrix, rng = _synthetic_matrix()
+    quantizer = ScalarQuantizer().fit(matrix)
+    codes = quantizer.encode(matrix)
+    decoded = (codes.astype(np.float32) + 128) * quantizer.scale + quantizer.vmin
+    assert np.all(np.abs(decoded - matrix) <= quantizer.scale / 2 + 1e-6)
+
+    queries = _queries(matrix, rng)
+    exact = queries @ matrix.T
+    approx = quantizer.scores(codes, queries)
+    # |q.(x - x')| <= sum(|q_i| * scale_i / 2)
+    bound = np.abs(queries) @ (quantizer.scale / 2) + 1e-5
+    assert np.all(np.abs(approx - exact) <= bound[:, np.newaxis])
+
+
+def test_int8_recall_matches_exact_search():
+    matrix, rng = _synthetic_matrix()
+    quantizer = ScalarQuantizer().fit(matrix)
+    assert _recall(matrix, quantizer, _queries(matrix, rng)) >= 0.99
+
+
+def test_pq_recall_with_rerank():
+    matrix, rng = _synthetic_matrix()
+    quantizer = ProductQuantizer(n_subspaces=16).fit(matrix, n_iter=10)
+    assert quantizer.encode(matrix).shape == (N_ROWS, 16)
+    assert _recall(matrix, quantizer, _queries(matrix, rng)) >= 0.9
@@ -0,0 +1,94 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import retrieve
+from src.store_vector import search_embeddings
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(retrieve.router)
+    return TestClient(app)
+
+
+def test_ids_and_scores_fetch_distances_only(retrieval_stub):
+    response = _client().post(
+        "/retrieve",
+        json={
+            "question": "quyền lợi người lao động",
+            "top_k": 2,
+            "fields": ["ids", "scores"],
+        },
+    )
+    assert response.status_code == 200
+    assert retrieval_stub.collection.includes == [("distances",)]
+    assert set(response.json()[0]) == {"chunk_id", "distance", "score"}
+
+
+def test_default_fields_fetch_documents_and_metadata(retrieval_stub):
+    response = _client().post("/retrieve", json={"question": "thế chấp tàu biển"})
+    assert response.status_code == 200
+    assert retrieval_stub.collection.includes == [
+        ("distances", "documents", "metadatas")
+    ]
+    assert response.json()[0]["content"] == "doc 0"
+
+
+def test_batch_ids_and_scores_fetch_distances_only(retrieval_stub):
+    response = _client().post(
+        "/retrieve/batch",
+        json={
+            "items": [
+                {"question": "câu hỏi một", "top_k": 2, "fields": ["ids"]},
+                {"question": "câu hỏi hai", "top_k": 3, "fields": ["ids", "scores"]},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert retrieval_stub.collection.includes == [("distances",)]
+    assert [len(item["results"]) for item in response.json()] == [2, 3]
+
+
+CITATION_HIT = {
+    "ids": [["article-29"]],
+    "distances": [[0.0]],
+    "metadatas": [[{"section_title": 29}]],
+    "documents": [["Điều 29. ..."]],
+    "embeddings": None,
+}
+
+
+def _ids_and_scores(question):
+    response = _client().post(
+        "/retrieve", json={"question": question, "fields": ["ids", "scores"]}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_citation_hit_honours_the_projection(retrieval_stub, monkeypatch):
+    monkeypatch.setattr(search_embeddings, "lookup_citation", lambda *_: CITATION_HIT)
+    results = asyncio.run(
+        search_embeddings.search_relevant_embeddings_async(
+            "điều 29 bộ luật hàng hải", include=[]
+        )
+    )
+    assert results["ids"] == [["article-29"]]
+    assert results["documents"] is None and results["metadatas"] is None
+    assert _ids_and_scores("điều 29 bộ luật hàng hải") == [
+        {"chunk_id": "article-29", "distance": 0.0, "score": 1.0}
+    ]
+    assert retrieval_stub.collection.includes == []
+
+
+def test_lexical_results_honour_the_projection(retrieval_stub, monkeypatch):
+    retrieval_stub.use_lexical_index()
+    monkeypatch.setattr(search_embeddings, "RETRIEVAL_MODE", "lexical")
+    results = asyncio.run(
+        search_embeddings.search_relevant_embeddings_batch_async(["tàu"], [2], [])
+    )[0]
+    assert results["ids"] == [["lexical-0", "lexical-1"]]
+    assert results["documents"] is None and results["metadatas"] is None
+    assert set(_ids_and_scores("tàu")[0]) == {"chunk_id", "distance", "score"}
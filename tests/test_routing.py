@@ -0,0 +1,23 @@
+from services.routing import ModelRouter, ModelTier
+
+CITED = "Điều 29 bộ luật hàng hải nói gì?"
+
+
+def _tier(question, scores):
+    router = ModelRouter(ModelTier("fast", "fast-model"), ModelTier("pro", "pro-model"))
+    tier, features = router.choose_tier(question, scores)
+    return tier.name, features["easiness"]
+
+
+def test_citation_alone_is_not_easy():
+    assert _tier(CITED, [0.45, 0.44])[0] == "pro"
+    assert _tier(CITED, [])[0] == "pro"
+
+
+def test_citation_with_a_confident_match_is_easy():
+    assert _tier(CITED, [0.7, 0.68])[0] == "fast"
+
+
+def test_uncited_question_needs_a_strong_and_clear_match():
+    assert _tier("thế chấp tàu biển", [0.85, 0.8])[0] == "fast"
+    assert _tier("thế chấp tàu biển", [0.85, 0.85])[0] == "pro"
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from src.concurrency.singleflight import SingleFlight
+
+
+class Upstream:
+    def __init__(self, result="ok", error=None):
+        self.calls = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+        self.result = result
+        self.error = error
+
+    async def __call__(self, key):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return f"{self.result}:{key}"
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_callers_share_one_upstream_call():
+    async def scenario():
+        flight, upstream = SingleFlight("test"), Upstream()
+        tasks = [asyncio.create_task(flight.do("q", upstream, "q")) for _ in range(5)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        results = await asyncio.gather(*tasks)
+        return upstream.calls, results, flight.stats()
+
+    calls, results, stats = _run(scenario())
+    assert calls == 1
+    assert results == ["ok:q"] * 5
+    assert (stats["leaders"], stats["coalesced"], stats["in_flight"]) == (1, 4, 0)
+
+
+def test_exception_is_shared_by_every_caller():
+    async def scenario():
+        flight, upstream = SingleFlight("test"), Upstream(error=ValueError("boom"))
+        tasks = [asyncio.create_task(flight.do("q", upstream, "q")) for _ in range(3)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return upstream.calls, results
+
+    calls, results = _run(scenario())
+    assert calls == 1
+    assert len({id(r) for r in results}) == 1
+    assert isinstance(results[0], ValueError)
+
+
+def test_leader_cancellation_does_not_cancel_followers():
+    async def scenario():
+        flight, upstream = SingleFlight("test"), Upstream()
+        leader = asyncio.create_task(flight.do("q", upstream, "q"))
+        follower = asyncio.create_task(flight.do("q", upstream, "q"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return upstream, await follower
+
+    upstream, result = _run(scenario())
+    assert result == "ok:q"
+    assert upstream.calls == 1 and not upstream.cancelled
+
+
+def test_work_is_cancelled_when_every_caller_leaves():
+    async def scenario():
+        flight, upstream = SingleFlight("test"), Upstream()
+        tasks = [asyncio.create_task(flight.do("q", upstream, "q")) for _ in range(2)]
+        await asyncio.sleep(0)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0)
+        return upstream, flight.stats()
+
+    upstream, stats = _run(scenario())
+    assert upstream.cancelled
+    assert stats["cancelled"] == 1 and stats["in_flight"] == 0
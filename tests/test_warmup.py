@@ -0,0 +1,23 @@
+from src.retrieval.warmup import load_top_questions
+
+AGENT_REQUEST = [
+    "2025-01-01 10:00:00,000 - app.agent - INFO - Question: thế chấp tàu biển",
+    "2025-01-01 10:00:00,100 - services.tools - INFO - "
+    "Question: thế chấp tàu biển, number of chunks: 5",
+    "2025-01-01 10:00:01,000 - services.tools - INFO - "
+    "Question: thế chấp tàu biển, 5 chunks",
+]
+RAG_REQUEST = [
+    '{"message": "The question is quyền lợi người lao động", "name": "app.rag"}',
+]
+
+
+def test_each_request_counts_its_question_once(tmp_path):
+    log_file = tmp_path / "app.log"
+    log_file.write_text(
+        "\n".join(AGENT_REQUEST * 2 + RAG_REQUEST * 3) + "\n", encoding="utf-8"
+    )
+    assert load_top_questions([str(log_file)]) == [
+        ("quyền lợi người lao động", 3),
+        ("thế chấp tàu biển", 2),
+    ]